@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/backfill.py -- 브랜드 설정 변경 시 저장된 이력 재분류
+
+brand_mask와 mall(정규화 이름)은 수집 시점의 브랜드 설정으로 정해진다. ⚙️ 설정에서
+별칭·경쟁사를 바꾸면 과거 행은 예전 분류로 남고, 지난 날짜는 다시 수집할 수도 없다.
+
+backfill_brands()는 이력 DataFrame에서 brand_ver(설정 버전, BrandMatcher.version)가
+현재와 다른 행만 골라 원래 쇼핑몰 이름으로 brand_mask·mall을 한 번에 다시 계산한다.
+- 원래 이름 = mall_raw (없거나 빈 값이면 mall -- 예전 시트 행은 정규화된 이름밖에 없음)
+- 고유 이름당 1회만 매칭 (BrandMatcher.mask_series/label_series, factorize + take)
+- 처리한 행에는 brand_ver를 기록 → 같은 설정으로 다시 돌리면 아무 행도 건드리지 않음
+- mall 이름이 없는 행(Notion 요약 등)은 대상이 아님
+"""
+
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils.brand import LEGACY_FLAGS, BrandMatcher
+
+log = logging.getLogger(__name__)
+
+VERSION_COL = "brand_ver"
+
+
+def raw_malls(df: pd.DataFrame) -> pd.Series:
+    """행별 정규화 전 쇼핑몰 이름 (mall_raw 우선, 비었으면 mall). category 컬럼도 object로 돌려줌."""
+    if "mall" not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+    mall = df["mall"].astype(object)
+    if "mall_raw" not in df.columns:
+        return mall
+    raw = df["mall_raw"].astype(object)
+    return raw.where(raw.notna() & (raw != ""), mall)
+
+
+def _assign(out: pd.DataFrame, col: str, rows: pd.Series, values) -> None:
+    """out.loc[rows, col] = values -- category 컬럼(history/schema.py)이면 새 값을 범주에 먼저 추가"""
+    if isinstance(out[col].dtype, pd.CategoricalDtype):
+        new = pd.Index(pd.Series(values).dropna().unique()).difference(out[col].cat.categories)
+        if len(new):
+            out[col] = out[col].cat.add_categories(new)
+    out.loc[rows, col] = values
+
+
+def stale_rows(df: pd.DataFrame, matcher: BrandMatcher) -> pd.Series:
+    """재분류 대상 -- 쇼핑몰 이름이 있고 brand_ver가 현재 설정 버전과 다른 행"""
+    if df.empty or "mall" not in df.columns:
+        return pd.Series(False, index=df.index)
+    has_name = raw_malls(df).notna()
+    if VERSION_COL not in df.columns:
+        return has_name
+    return has_name & (df[VERSION_COL] != matcher.version)
+
+
+def backfill_brands(df: pd.DataFrame, matcher: BrandMatcher) -> tuple[pd.DataFrame, int]:
+    """
+    오래된 설정 버전 행의 brand_mask·mall·mall_raw를 현재 설정으로 다시 계산 → (새 df, 처리 행 수).
+    처리할 행이 없으면 df를 그대로 돌려준다. 예전 is_* 불리언 열은 brand_mask와 어긋나므로 뺀다.
+    """
+    stale = stale_rows(df, matcher)
+    n = int(stale.sum())
+    if not n:
+        return df, 0
+    out = df.drop(columns=[col for col, _ in LEGACY_FLAGS if col in df.columns])
+    raw = raw_malls(out)[stale]
+    mall = matcher.label_series(raw)
+    if "brand_mask" in out.columns:
+        out["brand_mask"] = pd.to_numeric(out["brand_mask"], errors="coerce").fillna(0).astype("int64")
+    else:
+        out["brand_mask"] = np.int64(0)
+    out.loc[stale, "brand_mask"] = matcher.mask_series(raw)
+    if "mall_raw" not in out.columns:
+        out["mall_raw"] = ""
+    _assign(out, "mall_raw", stale, raw.where(raw != mall, ""))
+    _assign(out, "mall", stale, mall)
+    if VERSION_COL not in out.columns:
+        out[VERSION_COL] = ""
+    _assign(out, VERSION_COL, stale, matcher.version)
+    log.info(f"[backfill] 브랜드 설정 {matcher.version}: {n}/{len(out)}행 재분류")
+    return out, n
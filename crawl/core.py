@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/core.py -- 순위 수집 공통 코어
+
+main_automation.run_automation, streamlit_app._sched_run_crawl, Run & Sync가
+각자 갖고 있던 "검색량 조회 → 쇼핑 검색 → 브랜드 분류 → 행 생성" 로직을 하나로 합친다.
+
+    cfg = CrawlConfig.from_env()
+    for res in iter_keyword_results(keywords, cfg):   # 키워드 순서대로
+        ...res.records (RankRecord 목록), res.best_rank ...
+
+경로별 차이는 설정으로만 표현한다.
+- keep        : "brand" = 상위 top_n위 + 자사/경쟁사 행만 (기본, 딥 페이지 조기 종료 가능)
+                "all"   = depth까지 전체 행
+- placeholder : 검색 결과가 없을 때 rank 999 행으로 검색량만 남길지
+
+HTTP는 utils/http.py 공유 세션(재시도·서킷 브레이커), 속도 제한은 utils/ratelimit.py 버킷,
+검색량은 utils/volume.py VolumeResolver(+ 디스크 캐시)를 그대로 쓴다.
+브랜드 분류는 utils/brand.py BrandMatcher (설정별 1회 컴파일, 쇼핑몰 이름당 1회 스캔).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from crawl.records import NO_RANK, KeywordResult, RankRecord
+from utils.brand import (
+    DEFAULT_COMPETITORS, DEFAULT_MY_BRAND_1, DEFAULT_MY_BRAND_2,
+    BrandMatcher, get_matcher,
+)
+from utils import http
+from utils.ratelimit import search_limiter
+from utils.vol_cache import get_volume_cache
+from utils.volume import VolumeResolver
+
+log = logging.getLogger(__name__)
+
+SHOP_URL = "https://openapi.naver.com/v1/search/shop.json"
+SHOP_PAGE_SIZE = 100
+MAX_DEPTH = 1000  # 쇼핑 검색 API start 상한
+
+KEEP_BRAND = "brand"
+KEEP_ALL = "all"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def today_kst() -> str:
+    return (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=9)).strftime("%Y-%m-%d")
+
+
+@dataclass
+class CrawlConfig:
+    naver_client_id: str = ""
+    naver_client_secret: str = ""
+    ad_api_key: str = ""
+    ad_secret_key: str = ""
+    ad_customer_id: str = ""
+    brand1: str = DEFAULT_MY_BRAND_1
+    brand2: str = DEFAULT_MY_BRAND_2
+    competitors: str = DEFAULT_COMPETITORS
+    depth: int = SHOP_PAGE_SIZE
+    concurrency: int = 4
+    keep: str = KEEP_BRAND
+    top_n: int = 3
+    placeholder: bool = False
+    extra_headers: dict = field(default_factory=dict)
+    timeout: float = 10
+
+    def __post_init__(self):
+        self.depth = min(MAX_DEPTH, max(SHOP_PAGE_SIZE, int(self.depth)))
+        self.concurrency = max(1, int(self.concurrency))
+
+    @classmethod
+    def from_env(cls, **overrides) -> "CrawlConfig":
+        """GitHub Actions / 로컬 실행용 -- main_automation과 같은 환경변수 이름"""
+        cfg = dict(
+            naver_client_id=os.getenv("NAVER_CLIENT_ID", ""),
+            naver_client_secret=os.getenv("NAVER_CLIENT_SECRET", ""),
+            ad_api_key=os.getenv("NAVER_AD_API_KEY", ""),
+            ad_secret_key=os.getenv("NAVER_AD_SECRET_KEY", ""),
+            ad_customer_id=os.getenv("NAVER_CUSTOMER_ID", ""),
+            brand1=os.getenv("MY_BRAND_1", DEFAULT_MY_BRAND_1),
+            brand2=os.getenv("MY_BRAND_2", DEFAULT_MY_BRAND_2),
+            competitors=os.getenv("COMPETITORS", DEFAULT_COMPETITORS),
+            depth=_env_int("RANK_DEPTH", SHOP_PAGE_SIZE),
+            concurrency=_env_int("CRAWL_CONCURRENCY", 4),
+        )
+        cfg.update(overrides)
+        return cls(**cfg)
+
+    @classmethod
+    def from_user_keys(cls, keys: dict, **overrides) -> "CrawlConfig":
+        """Streamlit 사용자 설정(st.session_state.user_keys) 기준"""
+        cfg = dict(
+            naver_client_id=keys.get("naver_client_id", ""),
+            naver_client_secret=keys.get("naver_client_secret", ""),
+            ad_api_key=keys.get("naver_ad_api_key", ""),
+            ad_secret_key=keys.get("naver_ad_secret_key", ""),
+            ad_customer_id=keys.get("naver_customer_id", ""),
+            brand1=keys.get("my_brand_1", DEFAULT_MY_BRAND_1),
+            brand2=keys.get("my_brand_2", DEFAULT_MY_BRAND_2),
+            competitors=keys.get("competitors", DEFAULT_COMPETITORS),
+        )
+        cfg.update(overrides)
+        return cls(**cfg)
+
+    def new_volume_resolver(self) -> VolumeResolver:
+        return VolumeResolver(self.ad_api_key, self.ad_secret_key, self.ad_customer_id,
+                              extra_headers=self.extra_headers, cache=get_volume_cache())
+
+
+# ── 쇼핑 검색 ────────────────────────────────────────────────────────────────
+def search_shop_page(kw: str, cfg: CrawlConfig, start: int = 1) -> list[dict]:
+    """쇼핑 검색 결과 1페이지 (start위부터 최대 100개). 오류는 호출 측으로 전파."""
+    headers = {**cfg.extra_headers,
+               "X-Naver-Client-Id": cfg.naver_client_id,
+               "X-Naver-Client-Secret": cfg.naver_client_secret}
+    res = http.get(SHOP_URL, headers=headers,
+                   params={"query": kw, "display": SHOP_PAGE_SIZE, "start": start, "sort": "sim"},
+                   timeout=cfg.timeout, limiter=search_limiter)
+    res.raise_for_status()
+    return res.json().get('items', [])
+
+
+def iter_shop_pages(kw: str, cfg: CrawlConfig) -> Iterator[tuple[int, list[dict]]]:
+    """
+    (시작 순위, items) 페이지를 cfg.depth까지 차례로 yield.
+    호출 측이 순회를 멈추면 다음 페이지는 요청하지 않는다.
+    첫 페이지 오류는 호출 측으로 전파(키워드 실패), 이후 페이지 오류는 거기까지만 사용.
+    """
+    if not (cfg.naver_client_id and cfg.naver_client_secret):
+        return
+    for start in range(1, cfg.depth + 1, SHOP_PAGE_SIZE):
+        try:
+            items = search_shop_page(kw, cfg, start)
+        except Exception as e:
+            if start == 1:
+                raise
+            log.warning(f"[crawl] '{kw}' 검색 오류 (start={start}): {type(e).__name__}: {e}")
+            return
+        if items:
+            yield start, items
+        if len(items) < SHOP_PAGE_SIZE:
+            return  # 마지막 페이지
+
+
+# ── 키워드 수집 ──────────────────────────────────────────────────────────────
+def crawl_keyword(kw: str, cfg: CrawlConfig, resolver: VolumeResolver,
+                  matcher: BrandMatcher, date: str) -> KeywordResult:
+    """
+    키워드 1개 수집. 페이지를 받는 즉시 분류하고, keep="brand"이면
+    추적 브랜드 그룹이 모두 나온 시점에 남은 깊이는 조회하지 않는다.
+    """
+    vol, clk, ctr = resolver.get(kw)
+    res = KeywordResult(kw, vol, clk, ctr)
+    remaining = set(matcher.brand_ids)  # 조기 종료 판정 -- 자사 2그룹 + 경쟁사 그룹
+    early_stop = cfg.keep == KEEP_BRAND
+
+    try:
+        for start, items in iter_shop_pages(kw, cfg):
+            res.pages += 1
+            for r, item in enumerate(items, start):
+                raw_mall = item.get('mallName', '')
+                c = matcher.classify(raw_mall)
+                if remaining:
+                    remaining.difference_update(c["ids"])
+                if cfg.keep == KEEP_ALL or r <= cfg.top_n or c["tracked"]:
+                    res.records.append(RankRecord(
+                        date=date, keyword=kw, vol=vol, click=clk, ctr=ctr, rank=r,
+                        mall=c["mall"],
+                        title=item.get('title', '').replace("<b>", "").replace("</b>", ""),
+                        price=item.get('lprice', 0), link=item.get('link', ''),
+                        brand_mask=c["mask"],
+                        mall_raw=raw_mall if c["mall"] != raw_mall else "",
+                    ))
+            if early_stop and not remaining:
+                break  # 추적 브랜드 전부 발견 → 다음 페이지 불필요
+    except Exception as e:
+        res.error = f"{type(e).__name__}: {e}"
+        log.warning(f"[crawl] '{kw}' 검색 오류: {res.error}")
+
+    if not res.pages and cfg.placeholder:
+        # 순위 결과 없어도 검색량 저장 (미노출 키워드 vol 표시용)
+        res.records.append(RankRecord(
+            date=date, keyword=kw, vol=vol, click=clk, ctr=ctr, rank=NO_RANK,
+            mall="", title="", price=0, link=""))
+    return res
+
+
+def iter_keyword_results(keywords, cfg: CrawlConfig, resolver: VolumeResolver | None = None,
+                         date: str | None = None, on_result=None) -> Iterator[KeywordResult]:
+    """
+    키워드 단위 병렬 수집 결과를 입력 순서대로 yield.
+    검색/검색광고 API는 각자의 토큰 버킷 속도로 동시에 소진된다.
+    on_result(res)는 키워드가 끝나는 즉시 워커 스레드에서 호출된다 (체크포인트 기록용).
+    """
+    keywords = list(keywords)
+    date = date or today_kst()
+    matcher = get_matcher(cfg.brand1, cfg.brand2, cfg.competitors)
+    if resolver is None:
+        resolver = cfg.new_volume_resolver()
+    resolver.prime(keywords)
+
+    def _one(kw):
+        try:
+            res = crawl_keyword(kw, cfg, resolver, matcher, date)
+        except Exception as e:
+            log.warning(f"[crawl] '{kw}' 오류: {type(e).__name__}: {e}")
+            res = KeywordResult(kw, error=f"{type(e).__name__}: {e}")
+        if on_result is not None:
+            on_result(res)
+        return res
+
+    with ThreadPoolExecutor(max_workers=cfg.concurrency) as executor:
+        yield from executor.map(_one, keywords)
+
+
+def crawl_keywords(keywords, cfg: CrawlConfig, resolver: VolumeResolver | None = None,
+                   date: str | None = None) -> Iterator[RankRecord]:
+    """RankRecord 단위 스트림 (키워드 순서, 키워드 안에서는 순위 순)"""
+    for res in iter_keyword_results(keywords, cfg, resolver, date):
+        yield from res.records
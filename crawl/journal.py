@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/journal.py -- 일일 수집 체크포인트 (JSONL)
+
+키워드 1개 수집이 끝날 때마다 그 결과를 날짜별 파일에 한 줄씩 append + fsync 한다.
+러너가 중간에 죽거나 업로드가 실패해도 이미 끝난 키워드는 파일에 남아 있으므로
+--resume 실행이 남은 키워드만 수집하고, 아직 올라가지 않은 행만 업로드한다.
+
+파일: CRAWL_JOURNAL_DIR(기본: 저장소 루트/.crawl_journal)/<YYYY-MM-DD>.jsonl
+      샤드 실행은 <YYYY-MM-DD>.<shard-i-of-n>.jsonl (crawl/shard.py)
+줄 형식:
+    {"type": "keyword",  "keyword": ..., "vol": ..., "click": ..., "ctr": ...,
+     "pages": ..., "records": [RankRecord dict, ...]}
+    {"type": "uploaded", "sink": "apps_script", "keywords": [...], "key": 청크 idem 키}
+
+마지막 줄이 쓰다 만 상태(러너 강제 종료)여도 그 줄만 무시하고 읽는다.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import os
+import threading
+
+from crawl.records import KeywordResult, RankRecord
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BASE_DIR, ".crawl_journal")
+KEEP_DAYS = 7  # 이보다 오래된 저널 파일은 열 때 정리
+
+
+class CrawlJournal:
+    """하루치 수집 저널. 스레드 안전 (수집 워커가 동시에 record 해도 됨)."""
+
+    def __init__(self, date: str, directory: str | None = None, shard: str = ""):
+        self.date = date
+        self.shard = shard
+        self.dir = directory or os.getenv("CRAWL_JOURNAL_DIR") or DEFAULT_DIR
+        self.path = os.path.join(self.dir, f"{date}.{shard}.jsonl" if shard else f"{date}.jsonl")
+        self._lock = threading.Lock()
+        self._results: dict[str, KeywordResult] = {}   # 키워드 → 마지막 기록
+        self._uploaded: dict[str, set[str]] = {}       # 싱크 → 업로드 완료 키워드
+        os.makedirs(self.dir, exist_ok=True)
+        self._load()
+
+    # ── 읽기 ─────────────────────────────────────────────────────────────────
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        bad = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    bad += 1
+                    continue
+                self._apply(entry)
+        if bad:
+            log.warning(f"[journal] 손상된 줄 {bad}개 무시 ({self.path})")
+
+    def _apply(self, entry: dict) -> None:
+        if entry.get("type") == "keyword":
+            kw = entry["keyword"]
+            self._results[kw] = KeywordResult(
+                kw, entry.get("vol", 0), entry.get("click", 0), entry.get("ctr", 0),
+                records=[RankRecord.from_dict(r) for r in entry.get("records", [])],
+                pages=entry.get("pages", 0))
+        elif entry.get("type") == "uploaded":
+            self._uploaded.setdefault(entry.get("sink", ""), set()).update(entry.get("keywords", []))
+
+    @property
+    def done_keywords(self) -> set[str]:
+        return set(self._results)
+
+    def pending(self, keywords) -> list[str]:
+        """keywords 중 오늘 아직 수집이 끝나지 않은 것 (입력 순서 유지)"""
+        return [kw for kw in keywords if kw not in self._results]
+
+    def results(self, keywords=None) -> list[KeywordResult]:
+        """기록된 결과 -- keywords를 주면 그 순서대로, 기록된 것만"""
+        if keywords is None:
+            return list(self._results.values())
+        return [self._results[kw] for kw in keywords if kw in self._results]
+
+    def records(self, keywords=None) -> list[RankRecord]:
+        return [r for res in self.results(keywords) for r in res.records]
+
+    def not_uploaded(self, sink: str, keywords=None) -> list[str]:
+        """수집은 끝났지만 sink로 아직 올라가지 않은 키워드"""
+        sent = self._uploaded.get(sink, set())
+        done = keywords if keywords is not None else list(self._results)
+        return [kw for kw in done if kw in self._results and kw not in sent]
+
+    # ── 쓰기 ─────────────────────────────────────────────────────────────────
+    def _append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def record(self, res: KeywordResult) -> None:
+        """키워드 1개 수집 완료 -- 오류로 끝난 결과는 기록하지 않음 (다음 --resume에서 재시도)"""
+        if res.error:
+            return
+        self._append({
+            "type": "keyword", "keyword": res.keyword,
+            "vol": res.vol, "click": res.click, "ctr": res.ctr, "pages": res.pages,
+            "records": [r.to_dict() for r in res.records],
+        })
+
+    def mark_uploaded(self, sink: str, keywords, key: str = "") -> None:
+        """keywords 업로드 완료 표시 (key: 업로드 청크 idempotency 키, 추적용)"""
+        keywords = list(keywords)
+        if keywords:
+            entry = {"type": "uploaded", "sink": sink, "keywords": keywords}
+            if key:
+                entry["key"] = key
+            self._append(entry)
+
+    def reset(self) -> int:
+        """
+        오늘 수집 기록을 비우고 처음부터 (--resume 없이 실행할 때) → 남긴 업로드 표시 키워드 수.
+        업로드 표시(uploaded 줄)는 남긴다 -- 같은 날 다시 실행해도 이미 올라간 키워드를 또 보내
+        시트에 중복 행이 생기지 않게.
+        """
+        with self._lock:
+            kept = []
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            if json.loads(line).get("type") == "uploaded":
+                                kept.append(line if line.endswith("\n") else line + "\n")
+                        except ValueError:
+                            continue
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(kept)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            self._results.clear()
+            return len({kw for sent in self._uploaded.values() for kw in sent})
+
+    def purge_old(self, keep_days: int = KEEP_DAYS) -> int:
+        """keep_days일보다 오래된 날짜 파일 삭제 → 삭제 개수"""
+        cutoff = (dt.date.fromisoformat(self.date) - dt.timedelta(days=keep_days)).isoformat()
+        removed = 0
+        for name in os.listdir(self.dir):
+            if name.endswith(".jsonl") and name[:10] < cutoff:  # 샤드 파일도 날짜 접두어 기준
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
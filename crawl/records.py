@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/records.py -- 순위 수집 결과 레코드
+
+Apps Script(auto_daily) CSV, Notion, Slack, 로컬 파일이 모두 같은 컬럼을 쓰므로
+필드 순서가 곧 CSV 컬럼 순서다. 필드를 추가할 때는 맨 뒤에 붙일 것.
+
+브랜드 소속은 brand_mask 정수 1개 (utils/brand.py 레지스트리 비트).
+예전 시트 형식(is_db/is_bit/is_da/is_hr/is_dv 불리언 5열)은 to_legacy_df()로 펼친다.
+mall_raw는 정규화 전 쇼핑몰 이름 (mall과 같으면 빈 값) -- 브랜드 설정이 바뀌었을 때
+crawl/backfill.py가 이 이름으로 mall·brand_mask를 다시 계산한다.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field, fields
+
+import pandas as pd
+
+from utils.brand import LEGACY_FLAGS, MINE_MASK, has_brand
+
+NO_RANK = 999  # 순위 밖 / 검색 결과 없음
+
+
+@dataclass
+class RankRecord:
+    """검색 결과 1행 (키워드 × 순위)"""
+    date: str
+    keyword: str
+    vol: int
+    click: float
+    ctr: float
+    rank: int
+    mall: str
+    title: str
+    price: str | int
+    link: str
+    brand_mask: int = 0
+    mall_raw: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RankRecord":
+        """to_dict() 역변환 -- 예전 is_* 불리언 형식(저널 등)도 brand_mask로 읽음"""
+        d = dict(d)
+        legacy = 0
+        for col, bit in LEGACY_FLAGS:
+            if d.pop(col, False):
+                legacy |= bit
+        d.setdefault("brand_mask", legacy)
+        return cls(**d)
+
+
+RECORD_COLUMNS = [f.name for f in fields(RankRecord)]
+# 예전 시트 컬럼 순서 (link까지 + 불리언 5열, brand_mask 이후 필드 없음)
+LEGACY_COLUMNS = RECORD_COLUMNS[:RECORD_COLUMNS.index("brand_mask")] + [col for col, _ in LEGACY_FLAGS]
+
+
+@dataclass
+class KeywordResult:
+    """키워드 1개 수집 결과 -- 검색량 + 보존된 레코드"""
+    keyword: str
+    vol: int = 0
+    click: float = 0
+    ctr: float = 0
+    records: list[RankRecord] = field(default_factory=list)
+    pages: int = 0
+    error: str = ""
+
+    @property
+    def best_rank(self) -> int:
+        """자사(브랜드1/2) 최고 순위, 없으면 NO_RANK"""
+        return min((r.rank for r in self.records if r.brand_mask & MINE_MASK), default=NO_RANK)
+
+
+def records_to_df(records) -> pd.DataFrame:
+    """RankRecord 목록 → 기존 수집 DataFrame과 같은 컬럼 구성"""
+    rows = [r.to_dict() for r in records]
+    return pd.DataFrame(rows, columns=RECORD_COLUMNS)
+
+
+def to_legacy_df(df: pd.DataFrame) -> pd.DataFrame:
+    """brand_mask → 예전 is_* 불리언 5열 (구버전 Apps Script 시트 형식, LEGACY_COLUMNS 순서)"""
+    out = df.copy(deep=False)
+    for col, bit in LEGACY_FLAGS:
+        out[col] = has_brand(out["brand_mask"], bit)
+    return out[LEGACY_COLUMNS]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/shard.py -- keywords.txt를 여러 워커로 나눠 수집 (샤드)
+
+키워드의 소속 샤드 = md5(키워드) % 샤드 수. 파이썬 hash()와 달리 프로세스·머신이 달라도
+같은 값이므로, 병렬 잡 N개가 --shard-index만 바꿔 실행하면 겹침·누락 없이 나뉜다.
+키워드가 추가·삭제되어도 나머지 키워드의 샤드는 바뀌지 않는다.
+
+샤드 실행은 업로드/알림 없이 자기 저널(<날짜>.shard-<i>-of-<n>.jsonl)에만 기록하고,
+--merge 실행이 샤드 저널을 오늘 저널(<날짜>.jsonl)로 합친 뒤 업로드·알림을 1회 수행한다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+
+from crawl.journal import CrawlJournal
+
+log = logging.getLogger(__name__)
+
+
+def shard_of(keyword: str, count: int) -> int:
+    """키워드 → 샤드 번호 (0 ~ count-1)"""
+    digest = hashlib.md5(keyword.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def select_shard(keywords, index: int, count: int) -> list[str]:
+    """keywords 중 index번 샤드에 속하는 것 (입력 순서 유지)"""
+    return [kw for kw in keywords if shard_of(kw, count) == index]
+
+
+def shard_name(index: int, count: int) -> str:
+    return f"shard-{index}-of-{count}"
+
+
+def shard_journal(date: str, index: int, count: int, directory: str | None = None) -> CrawlJournal:
+    return CrawlJournal(date, directory, shard=shard_name(index, count))
+
+
+def merge_shards(journal: CrawlJournal, keywords, count: int) -> tuple[int, list[int]]:
+    """
+    샤드 저널 count개를 journal(오늘 저널)로 합침 → (새로 합친 키워드 수, 파일이 없는 샤드 번호).
+
+    키워드 단위로 중복 제거 -- 이미 오늘 저널에 있는 키워드(앞선 병합/단일 실행분)는
+    건너뛰고, 여러 샤드에 같은 키워드가 있으면 먼저 나온 샤드 것만 쓴다.
+    그래서 병합을 여러 번 실행해도 행이 늘지 않고, 업로드 완료 표시도 그대로 유지된다.
+    """
+    imported, missing = 0, []
+    for i in range(count):
+        part = shard_journal(journal.date, i, count, journal.dir)
+        if not os.path.exists(part.path):
+            missing.append(i)
+            continue
+        new = [res for res in part.results(keywords) if res.keyword not in journal.done_keywords]
+        for res in new:
+            journal.record(res)
+        imported += len(new)
+        log.info(f"[SHARD] {shard_name(i, count)}: 키워드 {len(part.done_keywords)}개 중 {len(new)}개 병합")
+    return imported, missing
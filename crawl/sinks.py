@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] crawl/sinks.py -- 수집 결과 저장/전송 대상
+
+모든 싱크는 write(data, date) -> (success, message) 하나만 구현한다.
+data는 RankRecord 목록 또는 같은 컬럼의 DataFrame 둘 다 받는다.
+
+- AppsScriptSink : Apps Script 웹앱(type=auto_daily)으로 CSV 청크 POST → Google Sheets
+- NotionSink     : integrations.notion_sync.save_to_notion (자사 키워드 요약)
+- SlackSink      : integrations.slack_notify.send_slack (일일 요약 + 급변 알림)
+- FileSink       : 로컬 .json({"timestamp","count","data"}) 또는 .csv
+
+Notion/Slack 모듈은 write() 안에서 import -- GitHub Actions(pandas, requests만 설치)에서도
+crawl 패키지를 그대로 쓸 수 있게 한다.
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+import requests
+
+from crawl.records import records_to_df, to_legacy_df
+from utils import http
+from utils.brand import MINE_MASK, brand_mask_series, has_brand
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def as_df(data) -> pd.DataFrame:
+    if isinstance(data, pd.DataFrame):
+        return data
+    return records_to_df(data)
+
+
+def _never_processed(e: Exception) -> bool:
+    """서버가 요청을 처리하지 않은 게 확실한 오류 -- 연결 실패(읽기 타임아웃 제외) 또는 429/503"""
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code in http.UNPROCESSED_STATUSES
+    return isinstance(e, requests.ConnectionError) and not isinstance(e, requests.ReadTimeout)
+
+
+class UploadChunk:
+    """Apps Script 업로드 단위 -- 키워드 경계로 자른 CSV 조각 (헤더 포함)"""
+
+    def __init__(self, keywords: list[str], body: bytes, rows: int, date: str):
+        self.keywords = keywords
+        self.body = body
+        self.rows = rows
+        # 같은 날짜 + 같은 내용이면 같은 키 → 재전송을 Apps Script가 중복으로 판별
+        self.key = f"{date}-{hashlib.sha1(body).hexdigest()[:16]}"
+
+
+def build_chunks(df: pd.DataFrame, date: str, max_bytes: int) -> list[UploadChunk]:
+    """
+    키워드 그룹을 순서대로 채워 max_bytes(헤더 포함 CSV 크기) 이하 청크로 분할.
+    한 키워드가 혼자 max_bytes를 넘으면 그 키워드만으로 청크 1개.
+    """
+    header = df.head(0).to_csv(index=False).encode("utf-8")
+    chunks, kws, parts, size, rows = [], [], [], len(header), 0
+    for kw, grp in df.groupby("keyword", sort=False):
+        body = grp.to_csv(index=False, header=False).encode("utf-8")
+        if parts and size + len(body) > max_bytes:
+            chunks.append(UploadChunk(kws, header + b"".join(parts), rows, date))
+            kws, parts, size, rows = [], [], len(header), 0
+        kws.append(kw)
+        parts.append(body)
+        size += len(body)
+        rows += len(grp)
+    if parts:
+        chunks.append(UploadChunk(kws, header + b"".join(parts), rows, date))
+    return chunks
+
+
+class AppsScriptSink:
+    """
+    Apps Script 웹앱(type=auto_daily)으로 CSV 업로드.
+
+    - APPS_SCRIPT_CHUNK_KB(기본 256KB) 단위로 키워드 경계에서 나눠 전송
+    - 청크마다 idem=<날짜>-<내용 해시>, chunk=i, chunks=n 파라미터 첨부
+    - 실패한 청크만 chunk_retries 라운드 재전송 (성공한 청크는 다시 보내지 않음).
+      구버전(v2 아님)은 서버가 받지 않은 게 확실한 청크(연결 실패, 429/503)만 재전송하고
+      나머지는 중복 행을 피하려 남겨 둔다 -- 저널에 성공 표시가 없으므로 --resume이 다시 보낸다.
+    - on_chunk(keywords, key): 청크 1개 성공 직후 호출 (저널 기록용)
+    - APPS_SCRIPT_V2=1: 본문을 gzip+base64로 압축(encoding=gzip-base64)하고, idem 키로
+      중복을 거르는 Apps Script 기준으로 타임아웃·5xx까지 재시도. 컬럼은 brand_mask 1열.
+      구버전 Apps Script는 idem/chunk 파라미터를 무시하고 평문 CSV 청크를 그대로 붙여 넣으므로
+      예전 시트 컬럼(is_* 불리언 5열, crawl.records.LEGACY_COLUMNS)으로 펼쳐 보낸다.
+    """
+    name = "GSheets"
+
+    def __init__(self, url: str, token: str, timeout: float = 30, chunk_bytes: int | None = None,
+                 v2: bool | None = None, chunk_retries: int = 2, on_chunk=None):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.chunk_bytes = chunk_bytes or max(16, _env_int("APPS_SCRIPT_CHUNK_KB", 256)) * 1024
+        self.v2 = os.getenv("APPS_SCRIPT_V2", "") == "1" if v2 is None else v2
+        self.chunk_retries = chunk_retries
+        self.on_chunk = on_chunk
+
+    def _post(self, chunk: UploadChunk, i: int, n: int) -> None:
+        params = {"token": self.token, "type": "auto_daily",
+                  "idem": chunk.key, "chunk": i, "chunks": n}
+        body = chunk.body
+        if self.v2:
+            params["encoding"] = "gzip-base64"
+            body = base64.b64encode(gzip.compress(body, mtime=0))  # 같은 청크 → 같은 바이트
+        res = http.post(
+            self.url, params=params, data=body,
+            headers={"Content-Type": "text/plain; charset=utf-8"},
+            timeout=self.timeout,
+            idempotent=self.v2,  # 서버가 idem 키로 중복 제거할 때만 모든 오류 재시도
+        )
+        res.raise_for_status()
+
+    def write(self, data, date: str) -> tuple[bool, str]:
+        df = as_df(data)
+        if not self.url:
+            return False, "Apps Script URL 미설정"
+        if df.empty:
+            return False, "전송할 데이터가 없습니다."
+        chunks = build_chunks(df if self.v2 else to_legacy_df(df), date, self.chunk_bytes)
+        n = len(chunks)
+        todo = list(enumerate(chunks, 1))
+        sent_rows, last_err, held = 0, "", []
+        for round_ in range(self.chunk_retries + 1):
+            failed = []
+            for i, chunk in todo:
+                try:
+                    self._post(chunk, i, n)
+                except Exception as e:
+                    last_err = f"{type(e).__name__}: {e}"
+                    log.warning(f"[GSheets] 청크 {i}/{n} 실패 ({chunk.rows}행): {last_err}")
+                    if self.v2 or _never_processed(e):
+                        failed.append((i, chunk))
+                    else:
+                        held.append((i, chunk))  # 서버가 붙여 넣었을 수도 있음 -- 재전송하면 중복 행
+                    continue
+                sent_rows += chunk.rows
+                if self.on_chunk is not None:
+                    self.on_chunk(chunk.keywords, chunk.key)
+            todo = failed
+            if not todo:
+                break
+        todo += held
+        if todo:
+            msg = (f"전송 실패: 청크 {n - len(todo)}/{n} 성공, {sent_rows}/{len(df)}건 "
+                   f"-- 마지막 오류 {last_err}")
+            if held:
+                msg += f" (처리 여부 불명 청크 {len(held)}개는 재전송 안 함 -- 시트 확인 후 --resume)"
+            return False, msg
+        return True, f"전체 {len(df)}건 전송 완료 (청크 {n}개)"
+
+
+class NotionSink:
+    name = "Notion"
+
+    def __init__(self, token: str, database_id: str):
+        self.token = token
+        self.database_id = database_id
+
+    def write(self, data, date: str) -> tuple[bool, str]:
+        df = as_df(data)
+        if not (self.token and self.database_id):
+            return False, "Notion 미설정"
+        n_mine = int(has_brand(brand_mask_series(df), MINE_MASK).sum()) if not df.empty else 0
+        if not n_mine:
+            return False, "자사 데이터 없음 (Notion 저장 건너뜀)"
+        from integrations.notion_sync import save_to_notion
+        # 전체 df 전달 → notion_sync 내부에서 is_mine 키워드만 저장하되 Top1Mall은 전체 기준
+        ok, msg = save_to_notion(df, date, self.token, self.database_id)
+        return ok, f"자사 {n_mine}건: {msg}"
+
+
+class SlackSink:
+    name = "Slack"
+
+    def __init__(self, webhook_url: str, history_df: pd.DataFrame | None = None,
+                 notion_db_id: str = "", big_change_alert: bool = True, brands=None):
+        self.webhook_url = webhook_url
+        self.history_df = history_df if history_df is not None else pd.DataFrame()
+        self.notion_db_id = notion_db_id
+        self.big_change_alert = big_change_alert
+        self.brands = brands  # utils.brand.BrandMatcher -- 경쟁사 목록/코드 (None이면 기본 설정)
+
+    def write(self, data, date: str) -> tuple[bool, str]:
+        if not self.webhook_url:
+            return False, "Slack 미설정"
+        from integrations.slack_notify import send_slack
+        df = as_df(data)
+        ok, msg = send_slack(self.webhook_url, df.copy(), self.history_df, date,
+                             notion_db_id=self.notion_db_id, only_on_big_change=False,
+                             brands=self.brands)
+        if self.big_change_alert:
+            # 급변(5위↑)이 있을 때만 별도 경보 메시지 1건 추가
+            send_slack(self.webhook_url, df.copy(), self.history_df, date,
+                       notion_db_id=self.notion_db_id, only_on_big_change=True,
+                       brands=self.brands)
+        return ok, msg
+
+
+class FileSink:
+    name = "File"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, data, date: str) -> tuple[bool, str]:
+        df = as_df(data)
+        try:
+            if self.path.endswith(".csv"):
+                df.to_csv(self.path, index=False, encoding="utf-8")
+            else:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump({"timestamp": date, "count": len(df), "data": df.to_dict("records")},
+                              f, ensure_ascii=False, default=str)
+            return True, f"{len(df)}건 저장: {os.path.basename(self.path)}"
+        except Exception as e:
+            return False, f"저장 실패: {type(e).__name__}: {e}"
+
+
+def write_all(sinks, data, date: str) -> list[tuple[str, bool, str]]:
+    """싱크를 순서대로 실행 -- 한 싱크의 실패가 다음 싱크를 막지 않음"""
+    df = as_df(data)
+    out = []
+    for sink in sinks:
+        try:
+            ok, msg = sink.write(df, date)
+        except Exception as e:
+            ok, msg = False, f"{type(e).__name__}: {e}"
+        (log.info if ok else log.warning)(f"[{sink.name}] {msg}")
+        out.append((sink.name, ok, msg))
+    return out
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/cache.py -- 프로세스 공유 이력 캐시 (Streamlit 세션 간 공유)
+
+세션마다 history_df를 따로 들고 있으면 같은 계정 탭 10개 = 다운로드 10번 + 메모리 사본 10개다.
+이력은 데이터 원천(Apps Script URL / Notion DB ID) 단위로 같으므로 프로세스에 한 벌만 둔다.
+
+- get_shared_history(key, loader)          : 원천별 기본 프레임 (loader 결과 그대로, 읽기 전용)
+- get_shared_view(key, loader, variant, build)
+                                            : 기본 프레임에서 파생한 화면용 프레임을 variant
+                                              (브랜드 설정 버전 등)별로 1번만 만들어 공유
+- invalidate(key)                          : Run & Sync·CSV 가져오기 직후 호출 → 다음 조회 때 다시 읽음
+- HISTORY_CACHE_TTL_S(기본 600초)가 지나면 다음 조회 때 다시 읽음
+- data_version(key)                        : 적재·만료 때마다 바뀌는 값 -- 파생 계산 메모 키용 (history/dashboard.py)
+
+돌려주는 DataFrame은 모든 세션이 같은 객체를 본다 (복사 없음). 호출 측은 컬럼 추가·loc 대입 등
+제자리 수정을 하지 말고 필터/파생 결과를 새 프레임으로 만들어 쓴다.
+같은 키를 여러 세션이 동시에 처음 조회하면 한 세션만 loader를 실행하고 나머지는 기다린다.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+MAX_VIEWS = 8  # 원천별 파생 프레임 최대 개수 (설정 버전이 바뀔 때마다 쌓이지 않게)
+
+
+def _ttl() -> float:
+    try:
+        return float(os.getenv("HISTORY_CACHE_TTL_S", "600"))
+    except ValueError:
+        return 600.0
+
+
+class _Entry:
+    """원천 키 1개의 캐시 항목 -- 기본 프레임 + variant별 파생 프레임"""
+
+    def __init__(self):
+        self.lock = threading.RLock()  # build 안에서 같은 원천의 다른 파생 프레임 조회 허용
+        self.df: pd.DataFrame | None = None
+        self.loaded_at = 0.0
+        self.views: dict[str, pd.DataFrame] = {}
+        self.generation = 0  # 기본 프레임이 바뀔 때마다 +1
+
+    def fresh(self, ttl: float) -> bool:
+        return self.df is not None and time.time() - self.loaded_at < ttl
+
+
+_entries: dict[str, _Entry] = {}
+_entries_lock = threading.Lock()
+
+
+def _entry(key: str) -> _Entry:
+    with _entries_lock:
+        if key not in _entries:
+            _entries[key] = _Entry()
+        return _entries[key]
+
+
+def _load(entry: _Entry, key: str, loader: Callable[[], pd.DataFrame]) -> None:
+    """entry.lock을 잡은 상태에서 호출 -- 만료됐으면 다시 읽고 파생 프레임은 비움"""
+    if entry.fresh(_ttl()):
+        return
+    t0 = time.perf_counter()
+    df = loader()
+    entry.df = df if df is not None else pd.DataFrame()
+    entry.loaded_at = time.time()
+    entry.views = {}
+    entry.generation += 1
+    log.info(f"[history] 공유 캐시 적재 {key}: {len(entry.df):,}행 ({time.perf_counter() - t0:.2f}s)")
+
+
+def get_shared_history(key: str, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """원천별 공유 기본 프레임 (없거나 TTL이 지났으면 loader로 다시 읽음)"""
+    entry = _entry(key)
+    with entry.lock:
+        _load(entry, key, loader)
+        return entry.df
+
+
+def get_shared_view(key: str, loader: Callable[[], pd.DataFrame], variant: str,
+                    build: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+    """
+    기본 프레임에서 build(df)로 만든 파생 프레임 -- variant(예: 브랜드 설정 버전)별 1회만 계산.
+    기본 프레임이 다시 적재되면 파생 프레임도 모두 다시 만든다.
+    """
+    entry = _entry(key)
+    with entry.lock:
+        _load(entry, key, loader)
+        if variant not in entry.views:
+            if len(entry.views) >= MAX_VIEWS:
+                entry.views.pop(next(iter(entry.views)))  # 가장 먼저 만든 것부터
+            entry.views[variant] = build(entry.df)
+        return entry.views[variant]
+
+
+def invalidate(key: str | None = None) -> None:
+    """key 항목(None이면 전체)을 만료 -- 다음 조회 때 loader가 다시 실행됨"""
+    with _entries_lock:
+        targets = list(_entries.values()) if key is None else [_entries[key]] if key in _entries else []
+    for entry in targets:
+        with entry.lock:
+            entry.df, entry.loaded_at, entry.views = None, 0.0, {}
+            entry.generation += 1
+
+
+def data_version(key: str) -> str:
+    """key 기본 프레임의 버전 ("key:세대") -- 같은 값이면 같은 데이터"""
+    entry = _entry(key)
+    with entry.lock:
+        return f"{key}:{entry.generation}"
+
+
+def cache_stats() -> list[dict]:
+    """적재된 항목별 {key, rows, views, age_s} (⚙️ 설정 표시용)"""
+    with _entries_lock:
+        items = list(_entries.items())
+    now = time.time()
+    return [{"key": key, "rows": len(e.df), "views": len(e.views), "age_s": int(now - e.loaded_at)}
+            for key, e in items if e.df is not None]
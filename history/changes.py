@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/changes.py -- 순위 변동 색인 (날짜 × 키워드 × 브랜드 비트)
+
+대시보드 상승/하락 표, 추이 페이지 스캐터, Slack 급변, 순위 알림은 모두 "두 날짜 사이에 무엇이 움직였나"를
+묻는다. 매번 두 날짜의 최고 순위를 따로 groupby 해서 merge 하지 않고, 날짜가 들어올 때 일자별 최고 순위
+집계(history/daily.py)에서 변동을 한 번 계산해 둔다.
+
+    date        'YYYY-MM-DD'
+    keyword
+    bit         brand_mask 비트 1개 (utils.brand 레지스트리)
+    rank        그날 최고 순위 (없으면 결측 -- 직전 수집일에는 있었는데 이날 빠진 행)
+    prev_date   직전 수집일
+    prev_rank   직전 수집일 최고 순위 (없으면 결측 -- 신규 진입)
+    d1          prev_rank - rank (양수 = 상승)
+    d7 / d30    7일·30일 전 기준 변동 -- 기준 순위는 (date - N일) 이전 가장 최근 수집일의 최고 순위
+
+- change_index(best, dates)    : 일자별 최고 순위 집계 → 색인 행 (dates만, 기준 날짜 행은 best에 있어야 함)
+- affected_dates(all, touched) : 날짜를 쓰면 다시 만들 날짜 (그 날짜 + 그 날짜를 기준으로 삼는 뒤 날짜들)
+- day_rows(changes, date)      : 색인에서 한 날짜 행 (date 정렬 기준 이분 탐색)
+- pair_changes(cur, prev)      : 두 날짜 집계를 (keyword, bit)로 맞춘 변동 (색인에 없는 날짜 -- 이번 수집분 등)
+- changes_between(...)         : 임의의 두 날짜 비교 -- 직전 수집일과의 비교면 색인 행을 그대로,
+                                 아니면 두 날짜 집계를 (keyword, bit)로 맞춤
+- keyword_changes(...)         : 비트 여러 개(MINE_MASK 등)를 키워드별 최고 순위로 합친 변동
+
+HistoryStore가 날짜를 쓸 때마다 해당 날짜들만 rank_change 테이블에 다시 만든다 (history/store.py).
+주간 요약으로 압축한 날짜(history/retention.py)는 기준 날짜가 되지 않는다 -- 그 앞은 결측.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+WINDOWS = (7, 30)  # 롤링 변동 기간(일) -- 컬럼 d7, d30
+CHANGE_COLUMNS = ["date", "keyword", "bit", "rank", "prev_date", "prev_rank", "d1", "d7", "d30"]
+PAIR_COLUMNS = ["keyword", "bit", "rank", "prev_rank", "delta"]
+_CHANGE_DTYPES = {"bit": "int64", "rank": "float64", "prev_rank": "float64",
+                  "d1": "float64", "d7": "float64", "d30": "float64"}
+
+
+def empty_changes() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=_CHANGE_DTYPES.get(c, object)) for c in CHANGE_COLUMNS})
+
+
+def _shift(date: str, days: int) -> str:
+    return (dt.date.fromisoformat(date) - dt.timedelta(days=days)).isoformat()
+
+
+def ref_dates(all_dates, dates) -> pd.DataFrame:
+    """dates 각각의 기준 날짜 [date, prev_date, ref7, ref30] -- 저장된 날짜(all_dates) 중에서 고름"""
+    known = np.array(sorted(set(map(str, all_dates))), dtype=object)
+    dates = sorted(set(map(str, dates)))
+
+    def _before(targets, inclusive: bool):
+        pos = np.searchsorted(known, np.array(targets, dtype=object), side="right" if inclusive else "left")
+        return [known[p - 1] if p > 0 else None for p in pos]
+
+    out = pd.DataFrame({"date": dates, "prev_date": _before(dates, False)}, dtype=object)
+    for n in WINDOWS:
+        out[f"ref{n}"] = _before([_shift(d, n) for d in dates], True)
+    return out
+
+
+def affected_dates(all_dates, touched) -> list[str]:
+    """touched 날짜를 쓴 뒤 다시 만들어야 하는 색인 날짜 -- touched 자신 + 기준 날짜가 바뀔 수 있는 뒤 날짜"""
+    touched = sorted(set(map(str, touched)))
+    if not touched:
+        return []
+    known = sorted(set(map(str, all_dates)) | set(touched))
+    refs = ref_dates(known, known).set_index("date")
+    hit = refs.isin(touched).any(axis=1)
+    return sorted(set(touched) | set(refs.index[hit]))
+
+
+def _ranks(best: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({"date": best["date"].astype(str).to_numpy(), "keyword": best["keyword"].astype(str).to_numpy(),
+                         "bit": best["bit"].to_numpy(dtype=np.int64),
+                         "rank": best["best_rank"].to_numpy(dtype=float)})
+
+
+def change_index(best: pd.DataFrame, dates=None, all_dates=None) -> pd.DataFrame:
+    """
+    일자별 최고 순위 집계(history/daily.py BEST_COLUMNS) → 변동 색인 (CHANGE_COLUMNS).
+    dates: 만들 날짜 (None이면 best의 모든 날짜) / all_dates: 기준 날짜 후보 (None이면 best의 날짜)
+    """
+    if best is None or best.empty:
+        return empty_changes()
+    ranks = _ranks(best)
+    all_dates = ranks["date"].unique() if all_dates is None else all_dates
+    refs = ref_dates(all_dates, ranks["date"].unique() if dates is None else dates)
+    keys = ["date", "keyword", "bit"]
+    # 그날 행 + 직전 수집일에만 있던 행 (이날 빠진 브랜드) -- (date, keyword, bit) 바깥 조인 1번
+    cur = ranks.merge(refs[["date", "prev_date"]], on="date")
+    prev = (ranks.rename(columns={"date": "prev_date", "rank": "prev_rank"})
+            .merge(refs[["date", "prev_date"]].dropna(), on="prev_date"))
+    out = cur.merge(prev, on=["date", "prev_date", "keyword", "bit"], how="outer")
+    out["d1"] = out["prev_rank"] - out["rank"]
+    for n in WINDOWS:
+        ref = (ranks.rename(columns={"date": f"ref{n}", "rank": "ref_rank"})
+               .merge(refs[["date", f"ref{n}"]].dropna(), on=f"ref{n}")[keys + ["ref_rank"]])
+        out = out.merge(ref, on=keys, how="left")
+        out[f"d{n}"] = out.pop("ref_rank") - out["rank"]
+    if out.empty:
+        return empty_changes()
+    out = out.sort_values(keys, ignore_index=True)
+    return out.astype(_CHANGE_DTYPES)[CHANGE_COLUMNS]
+
+
+def pair_changes(cur: pd.DataFrame, prev: pd.DataFrame) -> pd.DataFrame:
+    """두 날짜의 일자별 최고 순위 집계 → (keyword, bit)별 변동 [keyword, bit, rank, prev_rank, delta] (바깥 조인)"""
+    a = _ranks(cur)[["keyword", "bit", "rank"]]
+    b = _ranks(prev)[["keyword", "bit", "rank"]].rename(columns={"rank": "prev_rank"})
+    out = a.merge(b, on=["keyword", "bit"], how="outer")
+    out["delta"] = out["prev_rank"] - out["rank"]
+    return out[PAIR_COLUMNS]
+
+
+def day_rows(changes: pd.DataFrame, date: str) -> pd.DataFrame:
+    """색인에서 date 행 -- 색인은 date 순으로 정렬돼 있으므로 이분 탐색으로 구간만 자름"""
+    days = changes["date"].to_numpy(dtype=object)
+    lo, hi = np.searchsorted(days, str(date), side="left"), np.searchsorted(days, str(date), side="right")
+    return changes.iloc[lo:hi]
+
+
+def changes_between(changes: pd.DataFrame, best: pd.DataFrame, date: str, against: str) -> pd.DataFrame:
+    """
+    date와 against 사이의 (keyword, bit)별 변동 [keyword, bit, rank, prev_rank, delta].
+    against가 색인의 직전 수집일이면 색인 행을 그대로 쓰고 (d7·d30 컬럼도 함께), 아니면 best에서 두 날짜를 골라 맞춘다.
+    한쪽에만 있는 행은 다른 쪽 순위가 결측.
+    """
+    date, against = str(date), str(against)
+    if changes is not None and not changes.empty:
+        row = day_rows(changes, date)
+        if not row.empty and (row["prev_date"] == against).all():
+            return (row.rename(columns={"d1": "delta"})[PAIR_COLUMNS + [f"d{n}" for n in WINDOWS]]
+                    .astype({"keyword": str}).reset_index(drop=True))
+    if best is None or best.empty:
+        return pd.DataFrame({c: pd.Series(dtype=_CHANGE_DTYPES.get(c, "float64" if c == "delta" else object))
+                             for c in PAIR_COLUMNS})
+    days = best["date"].astype(str)
+    return pair_changes(best[(days == date).to_numpy()], best[(days == against).to_numpy()])
+
+
+def keyword_changes(pair: pd.DataFrame, mask: int) -> pd.DataFrame:
+    """(keyword, bit)별 변동 → mask 비트 중 가장 좋은 순위끼리의 키워드별 변동 [rank, prev_rank, delta] (index keyword)"""
+    sub = pair[(pair["bit"].to_numpy() & int(mask)) != 0]
+    out = sub.groupby("keyword", observed=True, sort=False)[["rank", "prev_rank"]].min()
+    out["delta"] = out["prev_rank"] - out["rank"]
+    return out
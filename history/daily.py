@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/daily.py -- 일자별 최고 순위 집계 (date × keyword × 브랜드 비트)
+
+"키워드별 자사 최고 순위"는 대시보드 순위 변동, 추이 차트, 히트맵, 라이벌 차트, Slack 급변,
+Notion 요약, 순위 알림이 모두 쓰는 값이다. 원본 행에서 매번 groupby 하지 않고 하루치가
+들어올 때 한 번 집계해 두고 읽는다.
+
+    date        'YYYY-MM-DD'
+    keyword
+    bit         brand_mask 비트 1개 (utils.brand 레지스트리: DB=1, BI=2, DA=4 ...)
+    best_rank   그 브랜드의 가장 좋은(작은) 순위
+    rows        그 브랜드 노출 행 수
+    page1       1페이지(PAGE1위 이내) 노출 여부
+
+- daily_best(df)        : 원본 행 → 집계 (비트별 행을 펼친 뒤 groupby 1번)
+- HistoryStore          : 날짜를 쓸 때마다 해당 날짜 집계를 daily_best 테이블에 다시 만든다
+- best_by_keyword(...)  : 집계 → keyword별 최고 순위 (비트 여러 개면 그중 최소 -- MINE_MASK = DB·BI)
+- best_table(...)       : 집계 → (date, keyword)별 최고 순위 (추이 차트·히트맵)
+
+brand_mask가 0인 행(브랜드 없음)과 순위 0 이하 행은 집계하지 않는다.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from utils.brand import brand_mask_series
+
+PAGE1 = 40  # 네이버쇼핑 PC 1페이지 노출 수
+BEST_COLUMNS = ["date", "keyword", "bit", "best_rank", "rows", "page1"]
+_BEST_DTYPES = {"bit": "int64", "best_rank": "int16", "rows": "int32", "page1": "bool"}
+
+
+def empty_best() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=_BEST_DTYPES.get(c, object)) for c in BEST_COLUMNS})
+
+
+def _date_text(df: pd.DataFrame) -> pd.Series:
+    """date 컬럼 → 'YYYY-MM-DD' (datetime64는 고유 날짜만 변환, 없으면 빈 문자열)"""
+    if "date" not in df.columns:
+        return pd.Series("", index=df.index)
+    dates = df["date"]
+    if pd.api.types.is_datetime64_dtype(dates):
+        codes, uniques = pd.factorize(dates)
+        labels = np.append(pd.Index(uniques).strftime("%Y-%m-%d").to_numpy(dtype=object), None)
+        return pd.Series(labels[codes], index=df.index)
+    return dates
+
+
+def daily_best(df: pd.DataFrame, page1: int = PAGE1, brands=None) -> pd.DataFrame:
+    """
+    원본 순위 행 → (date, keyword, bit)별 best_rank·rows·page1 (BEST_COLUMNS).
+    brands(BrandMatcher): brand_mask가 없는 행을 쇼핑몰 이름으로 채울 때 사용 (utils.brand.brand_mask_series)
+    """
+    if df is None or df.empty or "keyword" not in df.columns or "rank" not in df.columns:
+        return empty_best()
+    masks = brand_mask_series(df, brands).to_numpy()
+    rank = pd.to_numeric(df["rank"], errors="coerce").fillna(0).to_numpy()
+    valid = (masks != 0) & (rank > 0)
+    if not valid.any():
+        return empty_best()
+    union = int(np.bitwise_or.reduce(masks[valid]))
+    # 행 × 켜진 비트로 펼침 -- 비트마다 groupby 하지 않고 (date, keyword, bit) 한 번에 집계
+    idx_parts, bit_parts = [], []
+    for pos in range(63):
+        bit = 1 << pos
+        if union & bit:
+            idx = np.flatnonzero(valid & ((masks & bit) != 0))
+            idx_parts.append(idx)
+            bit_parts.append(np.full(len(idx), bit, dtype=np.int64))
+    idx = np.concatenate(idx_parts)
+    flat = pd.DataFrame({
+        "date": _date_text(df).take(idx).to_numpy(),
+        "keyword": df["keyword"].take(idx).to_numpy(),
+        "bit": np.concatenate(bit_parts),
+        "rank": rank.take(idx),
+    })
+    out = (flat.groupby(["date", "keyword", "bit"], observed=True, sort=True)["rank"]
+           .agg(best_rank="min", rows="size").reset_index())
+    out["page1"] = out["best_rank"] <= page1
+    return out.astype(_BEST_DTYPES)[BEST_COLUMNS]
+
+
+def as_best(frame: pd.DataFrame | None, brands=None) -> pd.DataFrame:
+    """집계(best_rank 컬럼 있음)는 그대로, 원본 행이면 daily_best로 집계"""
+    if frame is None or frame.empty:
+        return empty_best()
+    return frame if "best_rank" in frame.columns else daily_best(frame, brands=brands)
+
+
+def _select(best: pd.DataFrame, mask: int, date=None) -> pd.DataFrame:
+    hit = (best["bit"].to_numpy() & int(mask)) != 0
+    if date is not None:
+        hit &= (best["date"] == date).to_numpy()
+    return best[hit]
+
+
+def best_by_keyword(best: pd.DataFrame, mask: int, date=None) -> pd.Series:
+    """keyword → mask 비트 중 가장 좋은 순위 (date 지정 시 그 날짜만)"""
+    sub = _select(best, mask, date)
+    return sub.groupby("keyword", observed=True, sort=False)["best_rank"].min()
+
+
+def best_table(best: pd.DataFrame, mask: int) -> pd.DataFrame:
+    """(date, keyword) → mask 비트 중 가장 좋은 순위 [date, keyword, rank]"""
+    sub = _select(best, mask)
+    return (sub.groupby(["date", "keyword"], observed=True, as_index=False)["best_rank"].min()
+            .rename(columns={"best_rank": "rank"}))
+
+
+def best_dates(best: pd.DataFrame) -> list:
+    """집계에 있는 날짜 (오름차순)"""
+    return sorted(best["date"].dropna().unique().tolist())
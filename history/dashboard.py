@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/dashboard.py -- Dashboard KPI 계산 (1회 집계 + 메모이즈)
+
+Dashboard는 Streamlit 재실행(expander 열기, 버튼 클릭 등)마다 순위 상승/하락 표(브랜드별 groupby+merge),
+검색량·1위 쇼핑몰·1위 제품명 맵(수집분+최신 이력 concat 후 정렬), 브랜드 노출 수, 1위 탈취,
+기회 키워드, CTR 표를 전부 다시 계산했다. 입력 데이터가 그대로면 결과도 같다.
+
+- compute_metrics(...)   : 최신 이틀 데이터에서 모든 KPI를 계산
+                           · 오늘 행 + 최신 이력 행을 합쳐 keyword groupby 1번 (노출·1위·검색량·기회·CTR)
+                           · 상승/하락은 순위 변동 색인(history/changes.py)의 두 날짜 비교 행을 그대로 거름
+- dashboard_metrics(key, inputs)
+                         : key = (데이터 버전, 날짜 쌍, 브랜드 설정)별로 1번만 계산해 프로세스에서 공유.
+                           적중하면 inputs()도 부르지 않는다 -- 최신 날짜 필터 같은 입력 준비 비용까지 생략
+
+돌려주는 DashboardMetrics는 세션끼리 공유하므로 호출 측은 안의 list/dict/DataFrame을 수정하지 않는다.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from utils.brand import BIT_BI, BIT_DB, MINE_MASK, has_brand
+
+log = logging.getLogger(__name__)
+
+# 상승/하락 표를 따로 내는 자사 브랜드 (비트, 표시 이름) -- 표 순서
+BRANDS = [(BIT_DB, "드론박스"), (BIT_BI, "빛드론")]
+OPP_RANKS = (15, 60)   # 기회 키워드: 자사 최고 순위 범위
+OPP_MIN_VOL = 100      # 기회 키워드: 최소 월 검색량
+LOW_CTR = 2.0          # CTR 낮은 키워드 기준(%)
+MAX_ENTRIES = 16       # 메모 최대 개수 (데이터 버전이 바뀔 때마다 쌓이지 않게)
+
+_NONE = np.iinfo(np.int32).max  # 조건에 맞지 않는 행의 순위 (idxmin/min에서 빠지게)
+
+
+@dataclass(frozen=True)
+class DashboardMetrics:
+    exposed: frozenset       # 오늘 자사(MINE_MASK) 상품이 노출된 키워드
+    exposed_by_bit: dict     # {비트: 노출 키워드 수} (BRANDS)
+    improved: list           # 순위 상승 [{keyword, today_rank, prev_rank, delta, top_mall, brand_mask, brand, (d7, d30)}] 상승폭 순
+    dropped: list            # 순위 하락 (같은 형식) 하락폭 순
+    vol_map: dict            # keyword → 월 검색량 (오늘 + 최신 이력)
+    top1_map: dict           # keyword → 1위 쇼핑몰
+    title_map: dict          # keyword → 1위 제품명
+    stolen: list             # 경쟁사 1위 탈취 [{키워드, 어제 1위, 오늘 1위 (탈취)}]
+    opportunities: pd.DataFrame  # [keyword, rank, vol, top_price] 검색량 순
+    low_ctr: pd.DataFrame        # [keyword, rank, ctr, vol] 검색량 순
+
+
+def _column(frame: pd.DataFrame, col: str, default=0) -> pd.Series:
+    if col in frame.columns:
+        return frame[col]
+    return pd.Series(default, index=frame.index)
+
+
+def _rank_changes(changes: pd.DataFrame, top_mall: dict) -> tuple[list, list]:
+    """자사 브랜드별 (오늘 최고 순위, 전일 최고 순위) -- 두 날짜 모두 순위가 있는 변동 행만"""
+    bits = [bit for bit, _ in BRANDS]
+    chg = changes[changes["bit"].isin(bits) & changes["rank"].notna() & changes["prev_rank"].notna()]
+    if chg.empty:
+        return [], []
+    names = dict(BRANDS)
+    out = pd.DataFrame({
+        "keyword": chg["keyword"].astype(str),
+        "today_rank": chg["rank"].astype(int),
+        "prev_rank": chg["prev_rank"].astype(int),
+        "delta": chg["prev_rank"].astype(int) - chg["rank"].astype(int),
+        "top_mall": chg["keyword"].map(top_mall),
+        "brand_mask": chg["bit"].astype(int),
+        "brand": chg["bit"].map(names),
+        "_order": chg["bit"].map({bit: i for i, bit in enumerate(bits)}),
+    })
+    for col in ("d7", "d30"):  # 색인 행이면 7일·30일 전 기준 변동도 (없으면 None)
+        if col in chg.columns:
+            out[col] = chg[col].astype(object).where(chg[col].notna(), None)
+    up = out[out["delta"] > 0].sort_values(["delta", "_order"], ascending=[False, True], kind="stable")
+    down = out[out["delta"] < 0].sort_values(["delta", "_order"], kind="stable")
+    return (up.drop(columns="_order").to_dict("records"),
+            down.drop(columns="_order").to_dict("records"))
+
+
+def compute_metrics(crawled: pd.DataFrame, latest: pd.DataFrame, changes: pd.DataFrame,
+                    my_pattern: str) -> DashboardMetrics:
+    """
+    crawled: 이번 세션 수집분 (없으면 빈 DataFrame -- 그때는 latest가 '오늘')
+    latest: 이력 최신 날짜 행
+    changes: 오늘·비교 날짜의 (keyword, bit)별 변동 [keyword, bit, rank, prev_rank, delta] (history/changes.changes_between)
+    my_pattern: 자사 쇼핑몰 이름 정규식 (1위 탈취 판정)
+    """
+    # 오늘 행과 최신 이력 행을 한 프레임으로 -- 수집분이 없으면 최신 이력 행이 곧 오늘 행
+    has_crawl = not crawled.empty
+    parts = [p for p in (crawled, latest) if not p.empty]
+    if not parts:
+        frame = pd.DataFrame(columns=["keyword", "rank"])
+        is_today = is_latest = np.zeros(0, dtype=bool)
+    else:
+        frame = pd.concat(parts, ignore_index=True)
+        n_crawl = len(crawled)
+        is_today = np.arange(len(frame)) < n_crawl if has_crawl else np.ones(len(frame), dtype=bool)
+        is_latest = ~is_today if has_crawl else np.ones(len(frame), dtype=bool)
+    rank = pd.to_numeric(_column(frame, "rank", _NONE), errors="coerce").fillna(_NONE).to_numpy(dtype=np.int64)
+    mine = (has_brand(frame["brand_mask"], MINE_MASK).to_numpy() if "brand_mask" in frame.columns
+            else np.ones(len(frame), dtype=bool))
+    ctr = pd.to_numeric(_column(frame, "ctr"), errors="coerce").fillna(0).to_numpy(dtype=float)
+    vol = pd.to_numeric(_column(frame, "vol"), errors="coerce").to_numpy(dtype=float)
+    low_ctr_rows = is_today & mine & (ctr > 0) & ("brand_mask" in frame.columns)
+    cols = {
+        "keyword": frame["keyword"],
+        "vol": vol,
+        "r_all": rank,
+        "r_today": np.where(is_today, rank, _NONE),
+        "r_latest": np.where(is_latest, rank, _NONE),
+        "r_mine": np.where(is_today & mine, rank, _NONE),
+        "r_ctr": np.where(low_ctr_rows, rank, _NONE),
+        "ctr": np.where(low_ctr_rows, ctr, np.nan),
+        "vol_ctr": np.where(low_ctr_rows, vol, np.nan),
+    }
+    for bit, _ in BRANDS:
+        cols[f"b{bit}"] = (is_today & has_brand(frame["brand_mask"], bit).to_numpy()
+                           if "brand_mask" in frame.columns else np.zeros(len(frame), dtype=bool))
+    work = pd.DataFrame(cols)
+    agg = work.groupby("keyword", observed=True, sort=False).agg(
+        vol=("vol", "max"), top=("r_all", "idxmin"), t_top=("r_today", "idxmin"),
+        l_top=("r_latest", "idxmin"), mine_rank=("r_mine", "min"),
+        ctr_rank=("r_ctr", "min"), ctr=("ctr", "max"), ctr_vol=("vol_ctr", "max"),
+        **{f"b{bit}": (f"b{bit}", "max") for bit, _ in BRANDS})
+    agg.index = agg.index.astype(str)
+
+    def _pick(idx_col: str, col: str, valid: np.ndarray) -> pd.Series:
+        """agg[idx_col] 행 번호의 frame[col] (valid가 아닌 키워드는 빠짐)"""
+        if col not in frame.columns:
+            return pd.Series(dtype=object)
+        pos = agg[idx_col].to_numpy()[valid]
+        return pd.Series(frame[col].astype(object).to_numpy()[pos], index=agg.index[valid])
+
+    top_valid = np.ones(len(agg), dtype=bool)
+    t_valid = work["r_today"].to_numpy()[agg["t_top"].to_numpy()] < _NONE if len(agg) else top_valid
+    l_valid = work["r_latest"].to_numpy()[agg["l_top"].to_numpy()] < _NONE if len(agg) else top_valid
+    mall_col = "top1_mall" if "top1_mall" in frame.columns else "mall"
+
+    vol_map = agg["vol"].dropna().to_dict() if "vol" in frame.columns else {}
+    top1_map = _pick("top", mall_col, top_valid).to_dict()
+    title_map = _pick("top", "title", top_valid).to_dict()
+    today_mall = _pick("t_top", "mall", t_valid).to_dict()
+
+    # 1위 탈취 -- 최신 이력(어제) 1위가 자사였는데 오늘 1위는 자사가 아님
+    stolen = []
+    now_top = _pick("t_top", mall_col, t_valid)
+    was_top = _pick("l_top", mall_col, l_valid)
+    if len(now_top) and len(was_top):
+        pat = re.compile(my_pattern, re.IGNORECASE)
+        for kw, now in now_top.items():
+            if kw not in was_top.index:
+                continue
+            was, now = str(was_top[kw]), str(now)
+            if pat.search(was) and not pat.search(now):
+                stolen.append({"키워드": kw, "어제 1위": was, "오늘 1위 (탈취)": now})
+
+    # 기회 키워드 -- 검색량 있고 자사 최고 순위가 OPP_RANKS 안
+    mine_rank = agg["mine_rank"]
+    opp = agg[(mine_rank >= OPP_RANKS[0]) & (mine_rank <= OPP_RANKS[1]) & (agg["vol"].fillna(0) >= OPP_MIN_VOL)]
+    top_price = _pick("t_top", "price", t_valid)
+    opportunities = pd.DataFrame({
+        "keyword": opp.index, "rank": opp["mine_rank"].astype(int).to_numpy(),
+        "vol": opp["vol"].astype(int).to_numpy(),
+        "top_price": pd.to_numeric(top_price.reindex(opp.index), errors="coerce").fillna(0).astype(int).to_numpy(),
+    }).sort_values("vol", ascending=False, kind="stable", ignore_index=True)
+
+    low = agg[agg["ctr"].notna() & (agg["ctr"] < LOW_CTR)]
+    low_ctr = pd.DataFrame({
+        "keyword": low.index, "rank": low["ctr_rank"].astype(int).to_numpy(),
+        "ctr": low["ctr"].to_numpy(), "vol": low["ctr_vol"].fillna(0).astype(int).to_numpy(),
+    }).sort_values("vol", ascending=False, kind="stable", ignore_index=True)
+
+    improved, dropped = ([], []) if changes is None or changes.empty else _rank_changes(changes, today_mall)
+    return DashboardMetrics(
+        exposed=frozenset(agg.index[agg["mine_rank"] < _NONE]),
+        exposed_by_bit={bit: int(agg[f"b{bit}"].sum()) for bit, _ in BRANDS},
+        improved=improved, dropped=dropped,
+        vol_map=vol_map, top1_map=top1_map, title_map=title_map, stolen=stolen,
+        opportunities=opportunities, low_ctr=low_ctr)
+
+
+_memo: OrderedDict[tuple, DashboardMetrics] = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def dashboard_metrics(key: tuple, inputs: Callable[[], tuple]) -> DashboardMetrics:
+    """
+    key별 1회 계산 (프로세스 공유). inputs()는 compute_metrics 인자 튜플을 돌려주고 처음 계산할 때만 호출된다.
+    key에는 데이터 버전(history/cache.data_version 등)·날짜 쌍·브랜드 설정처럼 결과를 바꾸는 값을 모두 넣는다.
+    """
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    metrics = compute_metrics(*inputs())
+    with _memo_lock:
+        _memo[key] = metrics
+        while len(_memo) > MAX_ENTRIES:
+            _memo.popitem(last=False)  # 가장 오래 안 쓴 것부터
+    return metrics
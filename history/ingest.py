@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/ingest.py -- Apps Script 이력 응답 스트리밍 적재
+
+res.json() → pd.DataFrame(list_of_dicts)는 행마다 dict·문자열 객체를 전부 만든 뒤에야
+DataFrame을 만들기 시작해서, 세션 시작 순간 메모리 최고점이 최종 프레임의 몇 배가 된다.
+여기서는 응답 본문을 조각(chunk) 단위로 읽으면서 행을 바로 컬럼 버퍼에 넣는다.
+
+    컬럼 버퍼 = 값 사전(처음 본 값 → 코드) + 행별 코드 배열(array('i'), 행당 4바이트)
+
+이력은 같은 날짜·키워드·쇼핑몰·상품명·순위 값이 반복되므로 사전이 작고, 마지막에
+문자열 컬럼은 category(Categorical.from_codes), 숫자 컬럼은 고유 값만 변환 후 take로 만든다.
+
+받는 형식 (본문 첫 글자로 판별 -- 예전 Apps Script는 format 파라미터를 무시하고 행 배열을 보냄)
+- 행 배열 JSON   : [{"date": ..., "keyword": ...}, ...]              ← 스트리밍 파싱
+- 컬럼형 JSON    : {"columns": ["date", ...], "rows": [[...], ...]}  ← 스트리밍 파싱 (키 반복 없음)
+- CSV            : 헤더 1줄 + 행 (pandas.read_csv가 응답 스트림을 직접 읽음)
+"""
+
+from __future__ import annotations
+
+import codecs
+import io
+import json
+import logging
+from array import array
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from history.schema import CATEGORY_COLUMNS, FLOAT_COLUMNS, INT_COLUMNS
+
+log = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1 << 16
+WIRE_FORMATS = ("csv", "columns", "json")  # Apps Script에 요청하는 형식 (APPS_SCRIPT_FORMAT)
+_NUMERIC = set(INT_COLUMNS) | set(FLOAT_COLUMNS)
+_DECODER = json.JSONDecoder()
+
+
+class _Column:
+    """컬럼 1개 -- 고유 값 사전 + 행별 코드 (결측은 -1)"""
+
+    __slots__ = ("codes", "index", "values")
+
+    def __init__(self, n_before: int = 0):
+        self.codes = array("i", [-1]) * n_before  # 중간에 처음 나온 컬럼은 앞 행을 결측으로
+        self.index: dict = {}
+        self.values: list = []
+
+    def append(self, value) -> None:
+        if value is None or value == "":
+            self.codes.append(-1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def series(self, name: str) -> pd.Series:
+        codes = np.frombuffer(self.codes, dtype=np.int32) if len(self.codes) else np.empty(0, np.int32)
+        if name in _NUMERIC:
+            uniques = pd.to_numeric(pd.Series(self.values, dtype=object), errors="coerce").to_numpy(dtype=float)
+            return pd.Series(np.append(uniques, np.nan)[codes], name=name)  # -1 → 마지막 칸(NaN)
+        cats = pd.Index([str(v) for v in self.values])
+        if cats.has_duplicates:  # 1 과 "1"처럼 문자열로 바꾸면 같아지는 값
+            cats, remap = cats.unique(), cats.unique().get_indexer(cats)
+            codes = np.where(codes >= 0, np.append(remap, -1)[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=cats), name=name)
+
+
+class ColumnBuffers:
+    """행(dict 또는 컬럼 순서 list)을 받아 컬럼 버퍼에 쌓고 마지막에 DataFrame 1개로"""
+
+    def __init__(self, columns: list[str] | None = None):
+        self.columns: dict[str, _Column] = {c: _Column() for c in columns or []}
+        self.rows = 0
+
+    def add_dict(self, row: dict) -> None:
+        columns = self.columns
+        for name, value in row.items():
+            col = columns.get(name)
+            if col is None:
+                col = columns[name] = _Column(self.rows)
+            col.append(value)
+        self.rows += 1
+        if len(row) < len(columns):  # 이 행에 없던 컬럼은 결측
+            for col in columns.values():
+                if len(col.codes) < self.rows:
+                    col.codes.append(-1)
+
+    def add_list(self, values: list) -> None:
+        for col, value in zip(self.columns.values(), values):
+            col.append(value)
+        self.rows += 1
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: col.series(name) for name, col in self.columns.items()})
+
+
+def _text_chunks(chunks: Iterable[bytes]) -> Iterator[str]:
+    """바이트 조각 → 문자열 조각 (조각 경계에서 잘린 UTF-8 문자는 다음 조각과 합침)"""
+    dec = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        if chunk:
+            yield dec.decode(chunk)
+    tail = dec.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _JsonStream:
+    """문자열 조각 스트림 위의 최소 JSON 토큰 리더 -- 배열 원소를 1개씩 raw_decode"""
+
+    def __init__(self, texts: Iterator[str]):
+        self.texts = texts
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        nxt = next(self.texts, None)
+        if nxt is None:
+            return False
+        self.buf = self.buf[self.pos:] + nxt
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """공백을 건너뛴 다음 글자 (끝이면 "")"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"JSON 형식 오류: '{ch}' 필요 (위치 {self.pos})")
+        self.pos += 1
+
+    def value(self):
+        """다음 JSON 값 1개 -- 조각 끝에서 잘렸으면 다음 조각을 붙여 다시 시도"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 숫자는 조각 끝에서 잘려도 파싱되므로 (123|45) 끝에 닿았으면 더 읽어 본다
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def items(self) -> Iterator:
+        """'[' 다음부터 배열 원소를 1개씩 (']'에서 끝)"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"JSON 형식 오류: ',' 또는 ']' 필요 (위치 {self.pos})")
+
+
+def _read_columnar(js: _JsonStream) -> ColumnBuffers:
+    """{"columns": [...], "rows": [[...], ...]} -- columns가 rows보다 먼저 와야 함"""
+    buf = None
+    js.expect("{")
+    while js.peek() not in ("}", ""):
+        key = js.value()
+        js.expect(":")
+        if key == "columns":
+            buf = ColumnBuffers([str(c) for c in js.value()])
+        elif key == "rows":
+            if buf is None:
+                raise ValueError("컬럼형 JSON: columns가 rows보다 앞에 있어야 합니다")
+            for row in js.items():
+                buf.add_list(row)
+        else:
+            js.value()  # 모르는 키 (since 등 메타) 건너뜀
+        if js.peek() == ",":
+            js.pos += 1
+    return buf or ColumnBuffers()
+
+
+def read_rows(chunks: Iterable[bytes]) -> pd.DataFrame:
+    """
+    응답 본문 조각 → DataFrame (문자열 컬럼은 category, 숫자 컬럼은 float/int).
+    형식은 첫 글자로 판별: '[' 행 배열 JSON / '{' 컬럼형 JSON / 그 밖은 CSV.
+    """
+    texts = _text_chunks(chunks)
+    js = _JsonStream(texts)
+    first = js.peek()
+    if first == "":
+        return pd.DataFrame()
+    if first == "[":
+        buf = ColumnBuffers()
+        for row in js.items():
+            if isinstance(row, dict):
+                buf.add_dict(row)
+        return buf.frame()
+    if first == "{":
+        return _read_columnar(js).frame()
+    return _read_csv(js.buf[js.pos:], texts)
+
+
+class _TextReader(io.RawIOBase):
+    """이미 읽은 앞부분 + 남은 문자열 조각 → read_csv용 바이트 스트림"""
+
+    def __init__(self, head: str, texts: Iterator[str]):
+        self._parts = iter([head])
+        self._rest = texts
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pending:
+            nxt = next(self._parts, None)
+            if nxt is None:
+                nxt = next(self._rest, None)
+                if nxt is None:
+                    return 0
+            self._pending = nxt.encode("utf-8")
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def _read_csv(head: str, texts: Iterator[str]) -> pd.DataFrame:
+    # 없는 컬럼의 dtype 지정은 read_csv가 무시 -- 텍스트 컬럼은 읽으면서 바로 category.
+    # 숫자 컬럼도 category로 읽고 고유값만 변환 ("1,234", "-" 같은 칸은 JSON 경로처럼 결측)
+    dtypes = {c: "category" for c in ("date", *CATEGORY_COLUMNS, *_NUMERIC)}
+    stream = io.BufferedReader(_TextReader(head, texts), buffer_size=CHUNK_BYTES)
+    df = pd.read_csv(stream, dtype=dtypes)
+    for name in _NUMERIC & set(df.columns):
+        col = df[name]
+        uniques = pd.to_numeric(pd.Series(col.cat.categories, dtype=object), errors="coerce").to_numpy(dtype=float)
+        df[name] = np.append(uniques, np.nan)[col.cat.codes.to_numpy()]  # -1 → 마지막 칸(NaN)
+    return df
+
+
+def read_response(res) -> pd.DataFrame:
+    """requests 응답(stream=True 권장) → DataFrame. 본문을 조각으로 읽고 연결은 돌려준다."""
+    try:
+        return read_rows(res.iter_content(chunk_size=CHUNK_BYTES))
+    finally:
+        res.close()
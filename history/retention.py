@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/retention.py -- 이력 보존 단계 (최근 원본 행 / 과거 주간 요약)
+
+원본 행(키워드당 상위 3개 + 브랜드 노출 행 전부, 13컬럼)은 매일 쌓이기만 하고, 화면은 그 전체를
+메모리에 올려 필터한다. 오래된 날짜는 주간 요약으로 줄여 둔다.
+
+    단계 1  최근 HISTORY_RAW_DAYS일(기본 90)   원본 행 rank_rows + 일자별 집계 daily_best
+    단계 2  그 이전                             주간 요약 weekly_best (주 × 키워드 × 브랜드 비트)
+
+    week         그 주 월요일 'YYYY-MM-DD'
+    best_rank    주중 가장 좋은 일자별 최고 순위
+    median_rank  일자별 최고 순위의 중앙값
+    page1_days   1페이지(daily.PAGE1위 이내) 노출 일수
+    days         노출된 일수
+
+- apply_retention(store)  : 경계(월요일 기준, 주 중간에서 자르지 않음) 이전 날짜를 주간 요약으로 압축
+- trend_table(...)        : 추이 차트용 (date, keyword) 최고 순위 -- 원본 단계가 없는 기간은 주간 요약을 씀
+- 압축한 날짜는 읽기 전용: 이후 같은 날짜 행이 다시 들어와도 저장하지 않는다 (HistoryStore.merge)
+- 주간 요약은 압축 시점의 브랜드 분류로 고정 -- 설정 변경 재분류(crawl/backfill.py)는 원본 단계에만 적용
+
+HISTORY_RAW_DAYS=0 이면 압축하지 않는다 (전부 원본 보존).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+
+import pandas as pd
+
+from history.daily import best_table
+
+log = logging.getLogger(__name__)
+
+WEEKLY_COLUMNS = ["week", "keyword", "bit", "best_rank", "median_rank", "page1_days", "days"]
+_WEEKLY_DTYPES = {"bit": "int64", "best_rank": "int16", "median_rank": "float32",
+                  "page1_days": "int8", "days": "int8"}
+
+
+def raw_days() -> int:
+    try:
+        return max(0, int(os.getenv("HISTORY_RAW_DAYS", "90")))
+    except ValueError:
+        return 90
+
+
+def empty_weekly() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=_WEEKLY_DTYPES.get(c, object)) for c in WEEKLY_COLUMNS})
+
+
+def week_start(dates) -> pd.Series:
+    """'YYYY-MM-DD' → 그 주 월요일 'YYYY-MM-DD' (고유 날짜만 변환)"""
+    codes, uniques = pd.factorize(pd.Series(dates).astype(str))
+    ts = pd.to_datetime(pd.Series(uniques), format="%Y-%m-%d")
+    labels = (ts - pd.to_timedelta(ts.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    return pd.Series(labels[codes])
+
+
+def raw_cutoff(today: dt.date | None = None, days: int | None = None) -> str | None:
+    """원본 단계의 첫 날짜 (월요일) -- 이보다 이전 날짜가 압축 대상. 보존 일수 0이면 None"""
+    days = raw_days() if days is None else days
+    if days <= 0:
+        return None
+    edge = (today or dt.date.today()) - dt.timedelta(days=days)
+    return (edge - dt.timedelta(days=edge.weekday())).isoformat()
+
+
+def weekly_summary(best: pd.DataFrame) -> pd.DataFrame:
+    """일자별 최고 순위 집계(history/daily.py BEST_COLUMNS) → 주간 요약 (WEEKLY_COLUMNS)"""
+    if best is None or best.empty:
+        return empty_weekly()
+    flat = pd.DataFrame({
+        "week": week_start(best["date"]).to_numpy(),
+        "keyword": best["keyword"].to_numpy(),
+        "bit": best["bit"].to_numpy(),
+        "rank": best["best_rank"].to_numpy(),
+        "page1": best["page1"].to_numpy(dtype=bool),
+    })
+    out = (flat.groupby(["week", "keyword", "bit"], observed=True, sort=True)
+           .agg(best_rank=("rank", "min"), median_rank=("rank", "median"),
+                page1_days=("page1", "sum"), days=("rank", "size"))
+           .reset_index())
+    return out.astype(_WEEKLY_DTYPES)[WEEKLY_COLUMNS]
+
+
+def apply_retention(store, today: dt.date | None = None, days: int | None = None) -> int:
+    """store에서 경계 이전 날짜를 주간 요약으로 압축 → 압축한 날짜 수 (이미 압축됐으면 0)"""
+    cutoff = raw_cutoff(today, days)
+    if cutoff is None:
+        return 0
+    n_days, n_rows = store.compact(cutoff)
+    if n_days:
+        log.info(f"[history] {cutoff} 이전 {n_days}일 · 원본 {n_rows:,}행 → 주간 요약으로 압축")
+    return n_days
+
+
+def trend_table(best: pd.DataFrame, weekly: pd.DataFrame, mask: int,
+                start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """
+    (date, keyword) → mask 비트 중 가장 좋은 순위 [date, keyword, rank, tier].
+    일자별 집계가 있는 기간은 날짜별(tier '일별'), 그 이전은 주 월요일 날짜로 주간 최고 순위(tier '주별').
+    """
+    parts = []
+    first_daily = None
+    if best is not None and not best.empty:
+        days = best["date"].astype(str)
+        first_daily = days.min()
+        hit = pd.Series(True, index=best.index)
+        if start:
+            hit &= days >= start
+        if end:
+            hit &= days <= end
+        daily = best_table(best[hit], mask)
+        daily["date"] = daily["date"].astype(str)
+        daily["tier"] = "일별"
+        parts.append(daily)
+    if weekly is not None and not weekly.empty:
+        hit = (weekly["bit"].to_numpy() & int(mask)) != 0
+        if first_daily:
+            hit &= (weekly["week"] < first_daily).to_numpy()
+        if start:  # 시작일이 걸친 주도 포함
+            hit &= (weekly["week"] >= week_start([start]).iloc[0]).to_numpy()
+        if end:
+            hit &= (weekly["week"] <= end).to_numpy()
+        wk = (weekly[hit].groupby(["week", "keyword"], observed=True, as_index=False)["best_rank"].min()
+              .rename(columns={"week": "date", "best_rank": "rank"}))
+        wk["tier"] = "주별"
+        parts.append(wk)
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=["date", "keyword", "rank", "tier"])
+    out = pd.concat(parts, ignore_index=True)
+    out["keyword"] = out["keyword"].astype(str)
+    return out.sort_values(["date", "keyword"], ignore_index=True)[["date", "keyword", "rank", "tier"]]
+
+
+def weekly_dates(weekly: pd.DataFrame) -> tuple[str, str] | None:
+    """주간 요약이 덮는 기간 (첫 주 월요일, 마지막 주 일요일) / 없으면 None"""
+    if weekly is None or weekly.empty:
+        return None
+    last = dt.date.fromisoformat(str(weekly["week"].max())) + dt.timedelta(days=6)
+    return str(weekly["week"].min()), last.isoformat()
+
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/schema.py -- 메모리 절약형 history_df dtype 스키마
+
+pd.DataFrame(json) 그대로면 날짜·키워드·쇼핑몰·상품명이 행마다 파이썬 문자열 객체이고
+순위·검색량도 int64(또는 문자열)다. 이력은 같은 키워드·쇼핑몰·상품명이 날마다 반복되므로
+사전 인코딩(category)만으로 대부분 줄어든다.
+
+    date                      datetime64[ns]
+    keyword, mall, top1_mall  category
+    title, link, mall_raw,    category (사전 인코딩 -- 같은 상품이 날마다 반복)
+    brand_ver
+    rank, *_rank              int16   (999 = 순위 밖)
+    vol, price                int32
+    click, ctr                float32
+    brand_mask                int64
+
+coerce_history()는 Apps Script·Notion·CSV 가져오기·예약 수집 JSON 등 어느 입구에서 온
+DataFrame이든 위 스키마로 맞춘다 (없는 컬럼은 만들지 않음, 스키마 밖 컬럼은 그대로).
+category 컬럼을 groupby 할 때는 observed=True -- 안 그러면 걸러진 키워드도 빈 그룹으로 나온다.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from history.store import normalize_dates
+from utils.brand import LEGACY_FLAGS, brand_mask_series
+
+CATEGORY_COLUMNS = ("keyword", "mall", "top1_mall", "title", "link", "mall_raw", "brand_ver")
+INT_COLUMNS = {
+    "rank": "int16", "db_rank": "int16", "bi_rank": "int16", "da_rank": "int16",
+    "hr_rank": "int16", "dv_rank": "int16",
+    "vol": "int32", "price": "int32", "brand_mask": "int64",
+}
+INT_DEFAULTS = {"rank": 999, "db_rank": 999, "bi_rank": 999, "da_rank": 999, "hr_rank": 999, "dv_rank": 999}
+FLOAT_COLUMNS = ("click", "ctr")
+
+
+def coerce_history(df: pd.DataFrame) -> pd.DataFrame:
+    """이력 DataFrame → 메모리 절약 스키마 (새 DataFrame, 입력은 건드리지 않음)"""
+    if df.empty:
+        return df
+    out = df.copy(deep=False)
+    if any(col in out.columns for col, _ in LEGACY_FLAGS):
+        out["brand_mask"] = brand_mask_series(out)
+        out = out.drop(columns=[col for col, _ in LEGACY_FLAGS if col in out.columns])
+    if "date" in out.columns and not pd.api.types.is_datetime64_dtype(out["date"]):
+        out["date"] = pd.to_datetime(normalize_dates(out["date"]), format="%Y-%m-%d")
+    for col, dtype in INT_COLUMNS.items():
+        if col in out.columns and out[col].dtype != dtype:
+            num = pd.to_numeric(out[col], errors="coerce").fillna(INT_DEFAULTS.get(col, 0))
+            info = np.iinfo(dtype)
+            out[col] = num.clip(info.min, info.max).astype(dtype)
+    for col in FLOAT_COLUMNS:
+        if col in out.columns and out[col].dtype != "float32":
+            out[col] = pd.to_numeric(out[col], errors="coerce").fillna(0).astype("float32")
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    return out
+
+
+def date_labels(dates: pd.Series) -> pd.Series:
+    """
+    datetime64 날짜 → 'YYYY-MM-DD' 순서형 category (화면·차트용).
+    고유 날짜만 문자열로 바꾸므로 행 수와 무관하게 빠르고, 문자열 비교(== '2026-10-18')·max()가 그대로 된다.
+    """
+    if not pd.api.types.is_datetime64_dtype(dates):
+        return dates
+    codes, uniques = pd.factorize(dates, sort=True)
+    labels = pd.Index(uniques).strftime("%Y-%m-%d")
+    cat = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+    return pd.Series(cat, index=dates.index, name=dates.name)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> dict:
+    """변환 전후 메모리 (문자열 객체 포함 deep 측정) → {rows, before, after, saved_pct}"""
+    b = int(before.memory_usage(deep=True).sum()) if not before.empty else 0
+    a = int(after.memory_usage(deep=True).sum()) if not after.empty else 0
+    return {"rows": len(after), "before": b, "after": a,
+            "saved_pct": round((1 - a / b) * 100, 1) if b else 0.0}
+
+
+def format_memory_report(report: dict) -> str:
+    mb = 1024 * 1024
+    return (f"이력 {report['rows']:,}행 · 메모리 {report['before'] / mb:.1f}MB → "
+            f"{report['after'] / mb:.1f}MB ({report['saved_pct']}% 절감)")
+
+
+def date_between(dates: pd.Series, start: str | None = None, end: str | None = None) -> pd.Series:
+    """
+    'YYYY-MM-DD' 날짜 컬럼의 start~end(양 끝 포함) 행 마스크.
+    date_labels 결과(category)는 고유 날짜만 비교하고 코드로 펼친다 -- 날짜 변환용 새 컬럼 불필요.
+    """
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        cats = dates.cat.categories.astype(str)
+        keep = np.ones(len(cats) + 1, dtype=bool)
+        keep[-1] = False  # 결측 코드(-1)
+        if start:
+            keep[:-1] &= cats >= str(start)
+        if end:
+            keep[:-1] &= cats <= str(end)
+        return pd.Series(keep[dates.cat.codes.to_numpy()], index=dates.index)
+    text = dates.astype(str)
+    mask = dates.notna()
+    if start:
+        mask &= text >= str(start)
+    if end:
+        mask &= text <= str(end)
+    return mask
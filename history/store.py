@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/store.py -- 로컬 순위 이력 저장소 (SQLite)
+
+세션마다 Apps Script 이력 전체(JSON 배열)를 내려받아 history_df를 만들던 것을 대신한다.
+데이터 원천(Apps Script URL 등)마다 SQLite 파일 1개, 행은 날짜 단위로 관리한다.
+
+- 테이블 rank_rows : HISTORY_SCHEMA 고정 컬럼 (crawl.records.RECORD_COLUMNS + brand_ver)
+                    (date, keyword, rank, mall) 유일 -- 같은 행을 다시 넣어도 늘지 않음
+- 테이블 days      : 저장된 날짜 목록 (행 수 · 원천 · 기록 시각) -- 날짜 파티션 목록 역할
+- 테이블 summary   : Notion 키워드 요약 (날짜 × 키워드, upsert_summary / read_summary)
+- 테이블 daily_best: 일자별 최고 순위 집계 (history/daily.py) -- 날짜를 쓸 때마다 그 날짜만 다시 집계
+- 테이블 weekly_best: 보존 기간이 지난 날짜의 주간 요약 (history/retention.py) -- compact(before)
+- 테이블 rank_change: 순위 변동 색인 (history/changes.py) -- 쓴 날짜와 그 날짜를 기준으로 삼는 뒤 날짜만 다시 계산
+- 테이블 meta      : 동기화 기준점 등 키-값 (get_meta / set_meta)
+- 쓰기: replace_days(df) 날짜 단위 통째 교체 / replace_keywords(df) df에 있는 (날짜, 키워드)만 교체
+        / merge(df) 없는 행만 추가 (압축한 날짜는 건너뜀)
+- 읽기: read(start, end, keywords, columns) / read_day(date) / prev_date(before) / read_best(start, end)
+        / read_weekly(start, end) / read_changes(start, end)
+
+경로: HISTORY_DIR(기본: 저장소 루트/.history)/<원천 키>.sqlite
+읽기 측(streamlit_app, rank_alerts)은 history/sync.py로 새 날짜만 채운 뒤 이 저장소를 조회한다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from history.changes import CHANGE_COLUMNS, affected_dates, change_index, empty_changes, ref_dates
+from history.daily import BEST_COLUMNS, daily_best, empty_best
+from history.retention import WEEKLY_COLUMNS, empty_weekly, weekly_summary
+from utils.brand import brand_mask_series
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BASE_DIR, ".history")
+
+# 컬럼 → SQLite 타입 (순서 = read() 기본 컬럼 순서)
+HISTORY_SCHEMA = {
+    "date": "TEXT NOT NULL", "keyword": "TEXT NOT NULL",
+    "vol": "INTEGER", "click": "REAL", "ctr": "REAL",
+    "rank": "INTEGER NOT NULL", "mall": "TEXT NOT NULL",
+    "title": "TEXT", "price": "INTEGER", "link": "TEXT",
+    "brand_mask": "INTEGER", "mall_raw": "TEXT", "brand_ver": "TEXT",
+}
+HISTORY_COLUMNS = list(HISTORY_SCHEMA)
+KEY_COLUMNS = ("date", "keyword", "rank", "mall")
+
+# Notion 키워드 요약 (integrations/notion_sync.load_from_notion 행) -- 날짜 × 키워드당 페이지 1개
+SUMMARY_SCHEMA = {
+    "date": "TEXT NOT NULL", "keyword": "TEXT NOT NULL", "vol": "INTEGER", "ctr": "REAL",
+    "rank": "INTEGER", "db_rank": "INTEGER", "bi_rank": "INTEGER", "da_rank": "INTEGER",
+    "hr_rank": "INTEGER", "dv_rank": "INTEGER", "top1_mall": "TEXT", "is_mine": "INTEGER",
+    "brand_mask": "INTEGER", "edited_at": "TEXT",
+}
+SUMMARY_COLUMNS = list(SUMMARY_SCHEMA)
+# 일자별 최고 순위 집계 (history/daily.py BEST_COLUMNS)
+BEST_SCHEMA = {
+    "date": "TEXT NOT NULL", "keyword": "TEXT NOT NULL", "bit": "INTEGER NOT NULL",
+    "best_rank": "INTEGER", "rows": "INTEGER", "page1": "INTEGER",
+}
+# 주간 요약 (history/retention.py WEEKLY_COLUMNS)
+WEEKLY_SCHEMA = {
+    "week": "TEXT NOT NULL", "keyword": "TEXT NOT NULL", "bit": "INTEGER NOT NULL",
+    "best_rank": "INTEGER", "median_rank": "REAL", "page1_days": "INTEGER", "days": "INTEGER",
+}
+# 순위 변동 색인 (history/changes.py CHANGE_COLUMNS)
+CHANGE_SCHEMA = {
+    "date": "TEXT NOT NULL", "keyword": "TEXT NOT NULL", "bit": "INTEGER NOT NULL",
+    "rank": "INTEGER", "prev_date": "TEXT", "prev_rank": "INTEGER",
+    "d1": "INTEGER", "d7": "INTEGER", "d30": "INTEGER",
+}
+META_COMPACTED = "compacted_before"  # 이 날짜 이전은 주간 요약만 남음 (읽기 전용)
+META_CHANGES = "change_index"        # 변동 색인을 저장된 날짜 전체로 만든 적 있음 (색인 도입 전 저장소)
+_NUMERIC = {"vol": 0, "click": 0.0, "ctr": 0.0, "rank": 999, "price": 0, "brand_mask": 0}
+
+
+def _columns_sql(schema: dict) -> str:
+    return ", ".join(f'"{c}" {t}' for c, t in schema.items())
+
+
+def source_key(kind: str, ident: str) -> str:
+    """데이터 원천 → 파일 이름용 키 (URL·ID 자체는 파일 이름에 남기지 않음)"""
+    return f"{kind}-{hashlib.sha1(ident.encode('utf-8')).hexdigest()[:12]}"
+
+
+def normalize_dates(values: pd.Series) -> pd.Series:
+    """
+    날짜 값 → YYYY-MM-DD (KST). 시트의 날짜 셀은 Apps Script JSON에서 UTC 시각 문자열
+    ("2026-10-14T15:00:00.000Z" = KST 10-15 0시)로 오므로 KST로 바꾼 뒤 날짜만 취한다.
+    """
+    # 고유 값만 변환 (이력은 같은 날짜가 수천 행씩 반복, category 컬럼도 그대로 받음)
+    codes, uniques = pd.factorize(values)
+    ts = pd.to_datetime(pd.Series(np.asarray(uniques, dtype=object)), errors="coerce", utc=True, format="mixed")
+    labels = np.append(ts.dt.tz_convert("Asia/Seoul").dt.strftime("%Y-%m-%d").to_numpy(dtype=object), np.nan)
+    return pd.Series(labels[codes], index=values.index, name=values.name)
+
+
+def to_history_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    임의 출처 DataFrame → HISTORY_COLUMNS 순서·타입.
+    예전 is_* 컬럼은 brand_mask로, 날짜는 YYYY-MM-DD 문자열로, 없는 컬럼은 기본값으로 채운다.
+    """
+    out = pd.DataFrame(index=df.index)
+    out["date"] = normalize_dates(df["date"])
+    out["keyword"] = df["keyword"].astype(str)
+    for col, default in _NUMERIC.items():
+        if col == "brand_mask":
+            out[col] = brand_mask_series(df)
+        elif col in df.columns:
+            out[col] = pd.to_numeric(df[col], errors="coerce").fillna(default)
+        else:
+            out[col] = default
+    for col in ("vol", "rank", "price"):
+        out[col] = out[col].astype("int64")
+    for col in ("mall", "title", "link", "mall_raw", "brand_ver"):
+        out[col] = df[col].astype(object).where(df[col].notna(), "").astype(str) if col in df.columns else ""
+    return out.loc[out["date"].notna(), HISTORY_COLUMNS]
+
+
+class HistoryStore:
+    """원천 1개의 이력 저장소. 스레드 안전 (Streamlit 세션·수집 스레드가 같이 써도 됨)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            f"CREATE TABLE IF NOT EXISTS rank_rows ({_columns_sql(HISTORY_SCHEMA)},"
+            f" UNIQUE ({', '.join(KEY_COLUMNS)}));"
+            "CREATE INDEX IF NOT EXISTS rank_rows_keyword ON rank_rows (keyword, date);"
+            "CREATE TABLE IF NOT EXISTS days ("
+            " date TEXT PRIMARY KEY, rows INTEGER, source TEXT, written_at REAL);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            f"CREATE TABLE IF NOT EXISTS summary ({_columns_sql(SUMMARY_SCHEMA)},"
+            " PRIMARY KEY (date, keyword));"
+            f"CREATE TABLE IF NOT EXISTS daily_best ({_columns_sql(BEST_SCHEMA)},"
+            " PRIMARY KEY (date, keyword, bit));"
+            f"CREATE TABLE IF NOT EXISTS weekly_best ({_columns_sql(WEEKLY_SCHEMA)},"
+            " PRIMARY KEY (week, keyword, bit));"
+            f"CREATE TABLE IF NOT EXISTS rank_change ({_columns_sql(CHANGE_SCHEMA)},"
+            " PRIMARY KEY (date, keyword, bit));")
+        self._conn.commit()
+        # 집계 테이블이 생기기 전에 만든 저장소 -- 저장된 날짜 전체를 한 번 집계
+        with self._lock, self._conn:
+            missing = [d for (d,) in self._conn.execute(
+                "SELECT date FROM days WHERE date NOT IN (SELECT DISTINCT date FROM daily_best)")]
+            if missing:
+                self._rebuild_best(missing)
+            if not self._conn.execute("SELECT 1 FROM meta WHERE key = ?", [META_CHANGES]).fetchone():
+                self._rebuild_changes([d for (d,) in self._conn.execute("SELECT date FROM days")])
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", [META_CHANGES])
+
+    # ── 쓰기 ─────────────────────────────────────────────────────────────────
+    def _insert(self, frame: pd.DataFrame, verb: str) -> int:
+        marks = ", ".join("?" * len(HISTORY_COLUMNS))
+        names = ", ".join(f'"{c}"' for c in HISTORY_COLUMNS)
+        cur = self._conn.executemany(
+            f"{verb} INTO rank_rows ({names}) VALUES ({marks})",
+            frame.itertuples(index=False, name=None))
+        return cur.rowcount
+
+    def _rebuild_best(self, dates) -> None:
+        """dates의 daily_best를 저장된 행 기준으로 다시 집계 (쓰기 트랜잭션 안에서 호출)"""
+        marks = ",".join("?" * len(dates))
+        rows = pd.read_sql_query(
+            f"SELECT date, keyword, rank, brand_mask FROM rank_rows WHERE date IN ({marks})",
+            self._conn, params=list(dates))
+        best = daily_best(rows)
+        self._conn.executemany("DELETE FROM daily_best WHERE date = ?", [(d,) for d in dates])
+        self._conn.executemany(
+            f"INSERT INTO daily_best ({', '.join(BEST_COLUMNS)}) VALUES ({', '.join('?' * len(BEST_COLUMNS))})",
+            best.astype({"page1": "int64"}).astype(object).itertuples(index=False, name=None))
+
+    def _rebuild_changes(self, touched) -> None:
+        """touched를 쓴 뒤 영향받는 날짜의 rank_change를 다시 계산 (daily_best 갱신 후, 쓰기 트랜잭션 안에서)"""
+        known = [d for (d,) in self._conn.execute("SELECT date FROM days ORDER BY date")]
+        stored = set(known)
+        dates = [d for d in affected_dates(known, touched) if d in stored]
+        if not dates:
+            return
+        # 만들 날짜 + 그 기준 날짜(직전·7일·30일 전)의 집계만 읽음
+        need = sorted(set(dates) | {r for r in ref_dates(known, dates).iloc[:, 1:].to_numpy().ravel() if r})
+        marks = ",".join("?" * len(need))
+        best = pd.read_sql_query(f"SELECT date, keyword, bit, best_rank FROM daily_best WHERE date IN ({marks})",
+                                 self._conn, params=need)
+        changes = change_index(best, dates, known)
+        self._conn.executemany("DELETE FROM rank_change WHERE date = ?", [(d,) for d in dates])
+        self._conn.executemany(
+            f"INSERT INTO rank_change ({', '.join(CHANGE_COLUMNS)}) VALUES ({', '.join('?' * len(CHANGE_COLUMNS))})",
+            changes.astype(object).where(changes.notna(), None).itertuples(index=False, name=None))
+
+    def _touch_days(self, dates, source: str) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO days (date, rows, source, written_at) "
+            "SELECT ?, COUNT(*), ?, ? FROM rank_rows WHERE date = ?",
+            [(d, source, now, d) for d in dates])
+        self._rebuild_best(dates)
+        self._rebuild_changes(dates)
+
+    def _writable(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """압축한 날짜(META_COMPACTED 이전) 행은 버림 -- 주간 요약과 원본이 섞이지 않게"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", [META_COMPACTED]).fetchone()
+        if not row or frame.empty:
+            return frame
+        keep = frame["date"] >= row[0]
+        if not keep.all():
+            log.info(f"[history] 주간 요약으로 압축된 날짜({row[0]} 이전) {int((~keep).sum())}행은 저장하지 않음")
+        return frame[keep]
+
+    def replace_days(self, df: pd.DataFrame, source: str = "") -> int:
+        """df에 있는 날짜는 저장된 행을 지우고 df 행으로 교체 → 저장 행 수 (날짜 단위 원자적)"""
+        frame = to_history_frame(df).drop_duplicates(list(KEY_COLUMNS), keep="last")
+        with self._lock:
+            frame = self._writable(frame)
+        dates = sorted(frame["date"].unique())
+        if not dates:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM rank_rows WHERE date = ?", [(d,) for d in dates])
+            n = self._insert(frame, "INSERT")
+            self._touch_days(dates, source)
+        return n
+
+    def replace_keywords(self, df: pd.DataFrame, source: str = "") -> int:
+        """
+        df에 있는 (날짜, 키워드)만 저장된 행을 지우고 df 행으로 교체 → 저장 행 수.
+        일부 키워드만 다시 수집한 경우용 -- 같은 날짜의 다른 키워드 행은 그대로 두고 집계만 다시 만든다.
+        """
+        frame = to_history_frame(df).drop_duplicates(list(KEY_COLUMNS), keep="last")
+        with self._lock:
+            frame = self._writable(frame)
+        if frame.empty:
+            return 0
+        pairs = list(frame[["date", "keyword"]].drop_duplicates().itertuples(index=False, name=None))
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM rank_rows WHERE date = ? AND keyword = ?", pairs)
+            n = self._insert(frame, "INSERT")
+            self._touch_days(sorted(frame["date"].unique()), source)
+        return n
+
+    def merge(self, df: pd.DataFrame, source: str = "", update: bool = False) -> int:
+        """
+        (date, keyword, rank, mall) 기준 병합 → 반영된 행 수.
+        update=False: 없는 행만 추가 / True: 같은 키 행은 df 값으로 덮어씀 (증분 동기화)
+        """
+        frame = to_history_frame(df).drop_duplicates(list(KEY_COLUMNS), keep="last")
+        with self._lock:
+            frame = self._writable(frame)
+        if frame.empty:
+            return 0
+        with self._lock, self._conn:
+            n = self._insert(frame, "INSERT OR REPLACE" if update else "INSERT OR IGNORE")
+            self._touch_days(sorted(frame["date"].unique()), source)
+        return n
+
+    def upsert_summary(self, df: pd.DataFrame) -> int:
+        """Notion 요약 행 저장 -- 같은 (date, keyword)는 새 값으로 교체 → 저장 행 수"""
+        if df.empty:
+            return 0
+        frame = df.reindex(columns=SUMMARY_COLUMNS)
+        frame["date"] = normalize_dates(frame["date"])
+        frame = frame[frame["date"].notna()].drop_duplicates(["date", "keyword"], keep="last")
+        frame["is_mine"] = frame["is_mine"].fillna(False).astype(bool).astype(int)
+        frame = frame.astype(object).where(frame.notna(), None)
+        names = ", ".join(f'"{c}"' for c in SUMMARY_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO summary ({names}) VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))})",
+                frame.itertuples(index=False, name=None))
+        return len(frame)
+
+    def compact(self, before: str) -> tuple[int, int]:
+        """
+        before 이전 날짜의 원본 행·일자별 집계를 주간 요약으로 바꾸고 삭제 → (날짜 수, 원본 행 수).
+        before는 월요일이어야 한다 (history/retention.raw_cutoff) -- 한 주가 두 단계로 나뉘지 않게.
+        """
+        with self._lock:
+            with self._conn:
+                days = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(rows), 0) FROM days WHERE date < ?", [before]).fetchone()
+                if not days[0]:
+                    return 0, 0
+                best = pd.read_sql_query(f"SELECT {', '.join(BEST_COLUMNS)} FROM daily_best WHERE date < ?",
+                                         self._conn, params=[before])
+                weekly = weekly_summary(best.astype({"page1": "bool"}))
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO weekly_best ({', '.join(WEEKLY_COLUMNS)})"
+                    f" VALUES ({', '.join('?' * len(WEEKLY_COLUMNS))})",
+                    weekly.astype(object).itertuples(index=False, name=None))
+                for table in ("rank_rows", "daily_best", "rank_change", "days"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE date < ?", [before])
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE"
+                    " SET value = MAX(value, excluded.value)", [META_COMPACTED, before])
+            self._conn.execute("VACUUM")  # 지운 페이지를 파일에서 반환 (트랜잭션 밖에서만 가능)
+        return int(days[0]), int(days[1])
+
+    def set_meta(self, key: str, value) -> None:
+        """동기화 상태 등 부가 정보 (history/sync.py)"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [key, str(value)])
+
+    # ── 읽기 ─────────────────────────────────────────────────────────────────
+    def get_meta(self, key: str, default: str = "") -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", [key]).fetchone()
+        return row[0] if row else default
+
+    def dates(self) -> list[str]:
+        with self._lock:
+            return [d for (d,) in self._conn.execute("SELECT date FROM days ORDER BY date")]
+
+    def latest_date(self) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(date) FROM days").fetchone()
+        return row[0] if row else None
+
+    def prev_date(self, before: str) -> str | None:
+        """before보다 이전인 가장 최근 저장 날짜"""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(date) FROM days WHERE date < ?", [before]).fetchone()
+        return row[0] if row else None
+
+    def read(self, start: str | None = None, end: str | None = None,
+             keywords=None, columns=None) -> pd.DataFrame:
+        """날짜 범위(양 끝 포함)·키워드로 거른 행 -- 조건은 SQL에서 처리 (날짜·키워드 색인)"""
+        cols = [c for c in (columns or HISTORY_COLUMNS) if c in HISTORY_SCHEMA]
+        where, params = [], []
+        if start:
+            where.append("date >= ?")
+            params.append(start)
+        if end:
+            where.append("date <= ?")
+            params.append(end)
+        if keywords is not None:
+            keywords = list(keywords)
+            if not keywords:
+                return pd.DataFrame(columns=cols)
+            where.append(f"keyword IN ({','.join('?' * len(keywords))})")
+            params += keywords
+        sql = "SELECT " + ", ".join(f'"{c}"' for c in cols) + " FROM rank_rows"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date, keyword, rank"
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def read_summary(self, start: str | None = None) -> pd.DataFrame:
+        """Notion 요약 행 (start 이후, 최신 날짜 · 자사 순위 순 -- load_from_notion과 같은 정렬)"""
+        sql = "SELECT * FROM summary" + (" WHERE date >= ?" if start else "") + " ORDER BY date DESC, db_rank"
+        with self._lock:
+            df = pd.read_sql_query(sql, self._conn, params=[start] if start else [])
+        df["is_mine"] = df["is_mine"].astype(bool)
+        return df
+
+    def read_day(self, date: str) -> pd.DataFrame:
+        return self.read(date, date)
+
+    def read_best(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        """일자별 최고 순위 집계 (history/daily.py BEST_COLUMNS) -- 날짜 범위 양 끝 포함"""
+        where, params = [], []
+        if start:
+            where.append("date >= ?")
+            params.append(start)
+        if end:
+            where.append("date <= ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(BEST_COLUMNS)} FROM daily_best"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY date, keyword, bit", self._conn, params=params)
+        if df.empty:
+            return empty_best()
+        return df.astype({"bit": "int64", "best_rank": "int16", "rows": "int32", "page1": "bool"})
+
+    def read_changes(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        """순위 변동 색인 (history/changes.py CHANGE_COLUMNS) -- 날짜 범위 양 끝 포함"""
+        where, params = [], []
+        if start:
+            where.append("date >= ?")
+            params.append(start)
+        if end:
+            where.append("date <= ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM rank_change"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY date, keyword, bit", self._conn, params=params)
+        if df.empty:
+            return empty_changes()
+        return df.astype({"bit": "int64", "rank": "float64", "prev_rank": "float64",
+                          "d1": "float64", "d7": "float64", "d30": "float64"})
+
+    def read_weekly(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        """주간 요약 (history/retention.py WEEKLY_COLUMNS) -- week(월요일)가 범위 안인 행"""
+        where, params = [], []
+        if start:
+            where.append("week >= ?")
+            params.append(start)
+        if end:
+            where.append("week <= ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(WEEKLY_COLUMNS)} FROM weekly_best"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY week, keyword, bit", self._conn, params=params)
+        if df.empty:
+            return empty_weekly()
+        return df.astype({"bit": "int64", "best_rank": "int16", "median_rank": "float32",
+                          "page1_days": "int8", "days": "int8"})
+
+    def stats(self) -> dict:
+        with self._lock:
+            days, rows = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(rows), 0) FROM days").fetchone()
+            weeks = self._conn.execute("SELECT COUNT(DISTINCT week) FROM weekly_best").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"days": days, "rows": rows, "weeks": weeks, "bytes": size}
+
+
+_shared: dict[str, HistoryStore] = {}
+_shared_lock = threading.Lock()
+
+
+def get_history_store(source: str, directory: str | None = None) -> HistoryStore:
+    """원천 키(source_key)별 공유 인스턴스 (같은 프로세스 안에서 연결 1개만 유지)"""
+    path = os.path.join(directory or os.getenv("HISTORY_DIR") or DEFAULT_DIR, f"{source}.sqlite")
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = HistoryStore(path)
+        return _shared[path]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+[HISTORY] history/sync.py -- 원격 이력 → 로컬 저장소(history/store.py) 증분 동기화
+
+클라이언트가 마지막으로 받은 지점(워터마크)을 저장소 meta에 기록하고, 그 이후 데이터만 요청한다.
+하루 단위 새로고침 비용이 전체 이력이 아니라 새로 생긴 하루치에 비례한다.
+
+- Apps Script : GET ?since=<마지막으로 받은 날짜> → 그 날짜 이상 행만 (Apps Script doGet 수정 필요,
+                README 참고). 예전 Apps Script가 since를 무시하고 전체를 돌려줘도 클라이언트가
+                since 이전 날짜를 버리므로 결과는 같다 (전송량만 줄지 않음).
+                마지막 날짜는 업로드가 이어졌을 수 있어 매번 다시 받는다.
+- Notion      : last_edited_time >= <마지막으로 받은 페이지 수정 시각> 인 페이지만 조회.
+
+받은 행은 (date, keyword, rank, mall) -- Notion은 (date, keyword) -- 기준으로 중복 제거 후 병합한다.
+워터마크는 로컬 수집분(main_automation, Run & Sync)과 별도라서 로컬에 더 최근 날짜가 있어도
+원격에만 있는 날짜를 건너뛰지 않는다.
+
+SYNC_MIN_INTERVAL_S(기본 600초) 안에 이미 동기화했으면 Apps Script 요청 자체를 생략한다.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import time
+
+import pandas as pd
+
+from history.ingest import WIRE_FORMATS, read_response
+from history.store import HistoryStore, get_history_store, normalize_dates, source_key
+from utils import http
+
+log = logging.getLogger(__name__)
+
+META_LAST_SYNC = "apps_script_synced_at"
+META_SINCE = "apps_script_since"      # Apps Script에서 받은 가장 최근 날짜
+META_NOTION_EDITED = "notion_edited"  # Notion에서 받은 가장 최근 페이지 수정 시각
+
+
+def _min_interval() -> float:
+    try:
+        return float(os.getenv("SYNC_MIN_INTERVAL_S", "600"))
+    except ValueError:
+        return 600.0
+
+
+def apps_script_store(url: str) -> HistoryStore:
+    """Apps Script 웹앱 URL별 저장소"""
+    return get_history_store(source_key("apps_script", url))
+
+
+def notion_store(database_id: str) -> HistoryStore:
+    """Notion 데이터베이스별 저장소 (summary 테이블)"""
+    return get_history_store(source_key("notion", database_id))
+
+
+def _wire_format() -> str:
+    fmt = os.getenv("APPS_SCRIPT_FORMAT", "csv").strip().lower()
+    return fmt if fmt in WIRE_FORMATS else "csv"
+
+
+def fetch_apps_script(url: str, token: str, since: str = "", timeout: float = 25) -> pd.DataFrame:
+    """
+    Apps Script 이력 GET → DataFrame (since: 이 날짜 이상만 요청). 오류는 호출 측으로 전파.
+    본문은 스트리밍으로 읽어 바로 컬럼 버퍼에 적재 (history/ingest.py) -- 텍스트 컬럼은 category.
+    format(APPS_SCRIPT_FORMAT)을 모르는 예전 Apps Script가 행 배열 JSON을 보내도 그대로 읽는다.
+    """
+    params = {"token": token, "format": _wire_format()}
+    if since:
+        params["since"] = since
+    res = http.get(url, params=params, timeout=timeout, stream=True)
+    if not res.ok:
+        res.close()
+    res.raise_for_status()
+    return read_response(res)
+
+
+def sync_apps_script(store: HistoryStore, url: str, token: str, force: bool = False) -> tuple[int, int]:
+    """
+    워터마크 이후 날짜만 받아 병합 → (반영한 날짜 수, 행 수).
+    force=False이면 최소 간격 안의 재호출은 건너뛴다 (0, 0).
+    """
+    last = float(store.get_meta(META_LAST_SYNC, "0") or 0)
+    if not force and time.time() - last < _min_interval():
+        return 0, 0
+    since = store.get_meta(META_SINCE)
+    df = fetch_apps_script(url, token, since)
+    store.set_meta(META_LAST_SYNC, time.time())
+    if df.empty or "date" not in df.columns:
+        return 0, 0
+    dates = normalize_dates(df["date"])
+    todo = dates.notna() & (dates >= since)
+    if not todo.any():
+        return 0, 0
+    n_rows = store.merge(df[todo], source="apps_script", update=True)
+    n_days = int(dates[todo].nunique())
+    store.set_meta(META_SINCE, dates[todo].max())
+    log.info(f"[history] Apps Script 동기화 (since={since or '처음'}): {n_days}일 · {n_rows}행")
+    return n_days, n_rows
+
+
+def sync_notion(store: HistoryStore, token: str, database_id: str, days: int = 30) -> tuple[int, str]:
+    """
+    마지막 수정 시각 이후 바뀐 Notion 페이지만 받아 summary에 병합 → (받은 행 수, 오류 메시지).
+    처음에는 최근 days일 페이지 전체.
+    """
+    from integrations.notion_sync import load_from_notion
+    since = store.get_meta(META_NOTION_EDITED)
+    df, err = load_from_notion(token, database_id, days=days, edited_since=since or None)
+    if err:
+        return 0, err
+    if df.empty:
+        return 0, ""
+    n = store.upsert_summary(df)
+    edited = df["edited_at"].dropna()
+    if not edited.empty:
+        store.set_meta(META_NOTION_EDITED, edited.max())
+    log.info(f"[history] Notion 동기화 (since={since or '처음'}): {n}행")
+    return n, ""
+
+
+def notion_history(store: HistoryStore, days: int = 30) -> pd.DataFrame:
+    """저장된 Notion 요약 중 최근 days일 (load_from_notion과 같은 컬럼)"""
+    cutoff = (dt.date.today() - dt.timedelta(days=days)).isoformat()
+    return store.read_summary(start=cutoff)
@@ -20,7 +20,7 @@ import random
 import logging
 import datetime as dt
 
-from utils.brand import parse_brand_list, _clean
+from utils.brand import build_brand_groups, _clean
 
 log = logging.getLogger(__name__)
 
@@ -32,31 +32,6 @@ DEFAULT_PROMPT_TEMPLATES = [
 
 
 # ── 브랜드 그룹 구성 ─────────────────────────────────────────────────────────
-def build_brand_groups(brand1_str: str, brand2_str: str, competitors_str: str) -> dict:
-    """
-    {대표이름: [별칭 리스트]} 형태로 변환.
-    - 자사 2개 브랜드: 쉼표 목록 전체가 한 그룹 (첫 항목이 대표 이름)
-    - 경쟁사: 각각 독립 그룹. 단, 한글 브랜드 바로 뒤에 오는 영문(ASCII) 표기는
-      해당 브랜드의 별칭으로 묶임. 예) "다다사, dadasa, 효로로" → 다다사=[다다사, dadasa]
-    """
-    groups = {}
-    b1 = parse_brand_list(brand1_str)
-    b2 = parse_brand_list(brand2_str)
-    if b1:
-        groups[b1[0]] = b1  # 첫 항목을 대표 이름으로
-    if b2:
-        groups[b2[0]] = b2
-    last_rep = None
-    for comp in parse_brand_list(competitors_str):
-        is_ascii = comp.isascii()
-        if (is_ascii and last_rep is not None and not last_rep.isascii()):
-            groups[last_rep].append(comp)  # 직전 한글 브랜드의 영문 별칭
-        else:
-            groups[comp] = [comp]
-            last_rep = comp
-    return groups
-
-
 def _find_first_index(text_clean: str, aliases: list[str]) -> int:
     """전처리된 응답에서 별칭 중 가장 먼저 등장하는 위치. 없으면 -1."""
     best = -1
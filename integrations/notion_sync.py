@@ -12,8 +12,15 @@ from datetime import datetime, timedelta
 
 import pandas as pd
 
+from history.daily import as_best, best_by_keyword
+from utils.brand import BIT_BI, BIT_DA, BIT_DB, BIT_DV, BIT_HR, brand_mask_series
+
 log = logging.getLogger(__name__)
 
+# 요약 순위 컬럼 ↔ 브랜드 레지스트리 비트 (Notion 속성 DBRank ... DVRank)
+_RANK_BITS = (("db_rank", BIT_DB), ("bi_rank", BIT_BI),
+              ("da_rank", BIT_DA), ("hr_rank", BIT_HR), ("dv_rank", BIT_DV))
+
 # Notion Database 속성 스키마 (키워드 요약 구조)
 _SCHEMA = {
     "Date":    {"date": {}},
@@ -89,12 +96,53 @@ def _delete_existing_pages(c, database_id, date_str):
         log.warning("[notion] 기존 데이터 삭제 오류: %s", e)
 
 
-def save_to_notion(df, date_str, token, database_id):
+def _summarize(df, best=None):
+    """
+    수집 행 → {키워드: {vol, ctr, db_rank ... dv_rank, top1_mall, top1_title}}
+    브랜드별 최고 순위는 일자별 최고 순위 집계(history/daily.py) -- best를 주면 그대로 쓰고,
+    없으면 df로 한 번 집계한다. vol/ctr은 키워드 첫 행, Top1은 rank 1인 첫 행(경쟁사 포함).
+    """
+    kw = df["keyword"].astype(str).str.strip() if "keyword" in df.columns else pd.Series("", index=df.index)
+    work = pd.DataFrame({
+        "kw":    kw,
+        "rank":  pd.to_numeric(df.get("rank", 999), errors="coerce").fillna(999).astype(int),
+        "mask":  brand_mask_series(df),
+        "vol":   pd.to_numeric(df.get("vol", 0), errors="coerce").fillna(0),
+        "ctr":   pd.to_numeric(df.get("ctr", 0), errors="coerce").fillna(0),
+        "mall":  df["mall"] if "mall" in df.columns else "",
+        "title": df["title"] if "title" in df.columns else "",
+    }, index=df.index)
+    work = work[work["kw"] != ""]
+    if work.empty:
+        return {}
+    out = work.groupby("kw", sort=False)[["vol", "ctr"]].first()
+    if best is None:
+        best = as_best(work[["kw", "rank", "mask"]].rename(columns={"kw": "keyword", "mask": "brand_mask"}))
+    for col, bit in _RANK_BITS:
+        out[col] = best_by_keyword(best, bit).reindex(out.index).fillna(999).astype(int)
+    top1 = work[work["rank"] == 1].drop_duplicates("kw").set_index("kw")
+    out["top1_mall"] = top1["mall"].reindex(out.index)
+    out["top1_title"] = top1["title"].reindex(out.index)
+
+    summary = {}
+    for k, r in out.iterrows():
+        has_top1 = pd.notna(r["top1_mall"])
+        summary[k] = {
+            "vol": int(r["vol"]), "ctr": float(r["ctr"]),
+            **{col: int(r[col]) for col, _ in _RANK_BITS},
+            "top1_mall":  str(r["top1_mall"]) if has_top1 else "",
+            "top1_title": str(r["top1_title"]) if has_top1 else "",
+        }
+    return summary
+
+
+def save_to_notion(df, date_str, token, database_id, best=None):
     """
     DataFrame → Notion Database 저장 (키워드별 요약 1건)
 
     - 같은 날짜 기존 페이지 먼저 삭제 후 재저장
     - is_mine(드론박스|빛드론) 행만 받아서 키워드별로 집계
+    - best: 이 날짜의 일자별 최고 순위 집계 (history/daily.py, 없으면 df로 집계)
 
     Returns:
         (success: bool, message: str)
@@ -112,36 +160,7 @@ def save_to_notion(df, date_str, token, database_id):
         _delete_existing_pages(c, database_id, date_str)
 
         # 키워드별 집계 (전체 df 기준 — Top1Mall은 경쟁사 포함)
-        summary = {}
-        for _, row in df.iterrows():
-            kw = str(row.get("keyword", "")).strip()
-            if not kw:
-                continue
-            rank = int(row.get("rank", 999))
-            is_db  = bool(row.get("is_db",  False))
-            is_bit = bool(row.get("is_bit", False))
-            is_da  = bool(row.get("is_da",  False))
-            is_hr  = bool(row.get("is_hr",  False))
-            is_dv  = bool(row.get("is_dv",  False))
-
-            if kw not in summary:
-                summary[kw] = {
-                    "vol": int(row.get("vol", 0)),
-                    "ctr": float(row.get("ctr", 0)),
-                    "db_rank": 999, "bi_rank": 999,
-                    "da_rank": 999, "hr_rank": 999, "dv_rank": 999,
-                    "top1_mall": "", "top1_title": "",
-                }
-            s = summary[kw]
-            # Top1Mall/Top1Title: rank 1인 어떤 쇼핑몰이든 기록 (경쟁사 포함)
-            if rank == 1 and not s["top1_mall"]:
-                s["top1_mall"]  = str(row.get("mall", ""))
-                s["top1_title"] = str(row.get("title", ""))
-            if is_db:  s["db_rank"] = min(s["db_rank"], rank)
-            if is_bit: s["bi_rank"] = min(s["bi_rank"], rank)
-            if is_da:  s["da_rank"] = min(s["da_rank"], rank)
-            if is_hr:  s["hr_rank"] = min(s["hr_rank"], rank)
-            if is_dv:  s["dv_rank"] = min(s["dv_rank"], rank)
+        summary = _summarize(df, best)
 
         # is_mine(드론박스 or 빛드론)이 노출된 키워드만 저장
         summary = {kw: s for kw, s in summary.items()
@@ -194,12 +213,14 @@ def save_to_notion(df, date_str, token, database_id):
         return False, str(e)
 
 
-def load_from_notion(token, database_id, date_str=None, days=30):
+def load_from_notion(token, database_id, date_str=None, days=30, edited_since=None):
     """
     Notion Database → DataFrame 조회
 
+    edited_since: ISO 시각 -- 이 시각 이후 수정된 페이지만 (증분 동기화, history/sync.py)
+
     Returns:
-        (df: pd.DataFrame, error: str)
+        (df: pd.DataFrame, error: str) -- 행마다 페이지 수정 시각 edited_at 포함
     """
     if not token or not database_id:
         return pd.DataFrame(), "Notion Token 또는 Database ID가 없습니다."
@@ -212,6 +233,9 @@ def load_from_notion(token, database_id, date_str=None, days=30):
         else:
             cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
             filter_obj = {"property": "Date", "date": {"on_or_after": cutoff}}
+        if edited_since:
+            filter_obj = {"and": [filter_obj, {"timestamp": "last_edited_time",
+                                               "last_edited_time": {"on_or_after": edited_since}}]}
 
         pages  = []
         cursor = None
@@ -257,6 +281,13 @@ def load_from_notion(token, database_id, date_str=None, days=30):
 
             db_rank = _num("DBRank") or 999
             bi_rank = _num("BIRank") or 999
+            ranks = {"db_rank": db_rank, "bi_rank": bi_rank, "da_rank": _num("DARank") or 999,
+                     "hr_rank": _num("HRRank") or 999, "dv_rank": _num("DVRank") or 999}
+            # 순위가 있는 브랜드 비트 → brand_mask (수집 행과 같은 비트 테스트로 필터)
+            mask = 0
+            for col, bit in _RANK_BITS:
+                if ranks[col] < 999:
+                    mask |= bit
 
             rows.append({
                 "date":     _date("Date"),
@@ -264,15 +295,11 @@ def load_from_notion(token, database_id, date_str=None, days=30):
                 "vol":      _num("Vol"),
                 "ctr":      _num("CTR"),
                 "rank":     min(db_rank, bi_rank),
-                "db_rank":  db_rank,
-                "bi_rank":  bi_rank,
-                "da_rank":  _num("DARank") or 999,
-                "hr_rank":  _num("HRRank") or 999,
-                "dv_rank":  _num("DVRank") or 999,
+                **ranks,
                 "top1_mall":_rt("Top1Mall"),
                 "is_mine":  _bool("IsMine"),
-                "is_db":    db_rank < 999,
-                "is_bit":   bi_rank < 999,
+                "brand_mask": mask,
+                "edited_at": page.get("last_edited_time", ""),
             })
 
         df = pd.DataFrame(rows)
@@ -11,49 +11,75 @@
   👀 경쟁사 1페이지 첫 진입: 전일 1페이지 밖 → 오늘 진입
 
 main_automation.py(GitHub Actions)에서 매일 크롤 직후 호출:
-  전일 데이터는 Apps Script GET으로 로드, SLACK_WEBHOOK_URL 설정 시에만 발송.
+  전일 데이터는 로컬 이력 저장소(없는 날짜만 Apps Script에서 동기화), SLACK_WEBHOOK_URL 설정 시에만 발송.
+  오늘·전일 순위는 저장소가 오늘 분을 적재하며 만든 순위 변동 색인(history/changes.py)에서 읽는다.
 """
 from __future__ import annotations
 
+import datetime as dt
 import logging
 
+from crawl.backfill import backfill_brands
+from history.daily import PAGE1, as_best, best_by_keyword
+from utils.brand import get_matcher
+
 log = logging.getLogger(__name__)
 
-MY_MALLS_DEFAULT = ("드론박스", "빛드론")
-PAGE1_DEFAULT = 40  # 네이버쇼핑 PC 1페이지 노출 수
+PAGE1_DEFAULT = PAGE1  # 네이버쇼핑 PC 1페이지 노출 수
 
 
-def _best_ranks(df, malls):
-    """{(keyword, mall): 최고(min) 순위} — 대상 mall만"""
+def _best_ranks(best, entries):
+    """{(keyword, 브랜드 라벨): 최고(min) 순위} — 일자별 최고 순위 집계(history/daily.py)에서 entries 비트만"""
     out = {}
-    if df is None or len(df) == 0:
+    if best is None or best.empty or not entries:
         return out
-    for _, r in df.iterrows():
-        mall = str(r.get("mall", ""))
-        if mall not in malls:
-            continue
-        key = (str(r.get("keyword", "")), mall)
-        try:
-            rank = int(float(r.get("rank", 0)))
-        except (TypeError, ValueError):
-            continue
-        if rank > 0 and (key not in out or rank < out[key]):
-            out[key] = rank
+    for e in entries:
+        out.update({(str(k), e.label): int(v) for k, v in best_by_keyword(best, e.bit).items()})
     return out
 
 
+def _index_ranks(changes, entries):
+    """순위 변동 색인 행 → ({(keyword, 라벨): 오늘 순위}, {(keyword, 라벨): 전일 순위}) -- entries 비트만"""
+    today, prev = {}, {}
+    for e in entries:
+        rows = changes[changes["bit"] == e.bit]
+        for col, out in (("rank", today), ("prev_rank", prev)):
+            hit = rows[rows[col].notna()]
+            out.update({(str(k), e.label): int(v) for k, v in zip(hit["keyword"], hit[col])})
+    return today, prev
+
+
 def detect_events(
     today_df,
     prev_df,
-    my_malls=MY_MALLS_DEFAULT,
-    comp_malls=("다다사", "효로로", "드론뷰"),
+    brands=None,
     drop_threshold: int = 3,
     page1: int = PAGE1_DEFAULT,
+    today_best=None,
+    changes=None,
 ) -> list[dict]:
-    """오늘/전일 수집 데이터 비교 → 이벤트 목록 (level, icon, msg)"""
-    my_malls, comp_malls = tuple(my_malls), tuple(comp_malls)
-    t_my, p_my = _best_ranks(today_df, my_malls), _best_ranks(prev_df, my_malls)
-    t_cp, p_cp = _best_ranks(today_df, comp_malls), _best_ranks(prev_df, comp_malls)
+    """
+    오늘/전일 수집 데이터 비교 → 이벤트 목록 (level, icon, msg)
+    brands: utils.brand.BrandMatcher -- 자사/경쟁사 그룹과 비트 (None이면 기본 설정)
+    today_best: 오늘 분 일자별 최고 순위 집계 (저장소에 적재하며 만든 것, 없으면 today_df로 집계)
+    changes: 오늘 분 순위 변동 색인 행 (HistoryStore.read_changes -- 직전 수집일 = prev_df 날짜).
+             저장된 분류가 현재 브랜드 설정과 같을 때만 쓰고, 재분류가 필요하면 두 날짜를 다시 집계
+    """
+    brands = brands or get_matcher()
+    # 전일 데이터가 예전 브랜드 설정으로 분류돼 있으면 오늘과 같은 설정으로 맞춘 뒤 비교
+    (today_df, n_today), (prev_df, n_prev) = (backfill_brands(d, brands) if d is not None else (None, 0)
+                                              for d in (today_df, prev_df))
+    mine, comps = brands.entries(mine=True), brands.entries(mine=False)
+    # 색인의 직전 수집일이 prev_df 날짜와 같아야 같은 비교
+    same_pair = (changes is not None and not changes.empty and prev_df is not None and len(prev_df)
+                 and (changes["prev_date"] == str(prev_df["date"].iloc[0])).all())
+    if same_pair and not (n_today or n_prev):
+        (t_my, p_my), (t_cp, p_cp) = _index_ranks(changes, mine), _index_ranks(changes, comps)
+    else:
+        t_best = today_best if today_best is not None and not today_best.empty else as_best(today_df)
+        p_best = as_best(prev_df)
+        t_my, p_my = _best_ranks(t_best, mine), _best_ranks(p_best, mine)
+        t_cp, p_cp = _best_ranks(t_best, comps), _best_ranks(p_best, comps)
     events = []
 
     # 자사: 급락 / 이탈 / TOP3 진입
@@ -100,27 +126,26 @@ def format_alert_message(events: list[dict], date_str: str = "") -> str:
 
 
 def load_prev_from_apps_script(apps_script_url: str, token: str, today_iso: str):
-    """Apps Script 이력(GET)에서 오늘 이전 가장 최근 일자의 데이터프레임 반환"""
-    import requests
-    import pandas as pd
-    try:
-        res = requests.get(apps_script_url, params={"token": token}, timeout=25)
-        df = pd.DataFrame(res.json())
-    except Exception as e:
-        log.warning("[alerts] 이력 로드 실패: %s", e)
-        return None
-    if df.empty or "date" not in df.columns:
-        return None
-    dates = sorted({str(d) for d in df["date"] if str(d) < today_iso})
-    if not dates:
-        return None
-    return df[df["date"].astype(str) == dates[-1]].copy()
+    """
+    오늘 이전 가장 최근 일자의 데이터프레임 -- 로컬 이력 저장소(history/store.py)에서 조회.
+    저장소에 어제 날짜가 없을 때만 Apps Script에서 새 날짜를 동기화한다.
+    """
+    from history.sync import apps_script_store, sync_apps_script
+    store = apps_script_store(apps_script_url)
+    yesterday = (dt.date.fromisoformat(today_iso) - dt.timedelta(days=1)).isoformat()
+    if store.prev_date(today_iso) != yesterday:
+        try:
+            sync_apps_script(store, apps_script_url, token, force=True)
+        except Exception as e:
+            log.warning("[alerts] 이력 동기화 실패 (저장된 이력으로 비교): %s", e)
+    prev = store.prev_date(today_iso)
+    return store.read_day(prev) if prev else None
 
 
 def send_slack_webhook(webhook_url: str, text: str) -> bool:
-    import requests
+    from utils import http
     try:
-        r = requests.post(webhook_url, json={"text": text}, timeout=15)
+        r = http.post(webhook_url, json={"text": text}, timeout=15)
         return r.status_code == 200
     except Exception as e:
         log.warning("[alerts] Slack 발송 실패: %s", e)
@@ -15,7 +15,7 @@ from __future__ import annotations
 import logging
 import datetime as dt
 
-import requests
+from utils import http
 
 log = logging.getLogger(__name__)
 
@@ -50,7 +50,8 @@ def fetch_trend(client_id: str, client_secret: str, keywords: list[str],
         "Content-Type": "application/json",
     }
     try:
-        r = requests.post(DATALAB_URL, json=payload, headers=headers, timeout=20)
+        # 조회성 POST라 재시도해도 안전
+        r = http.post(DATALAB_URL, json=payload, headers=headers, timeout=20, idempotent=True)
     except Exception as e:
         return None, f"API 호출 실패: {e}"
     if r.status_code != 200:
@@ -10,7 +10,13 @@ Slack Incoming Webhook 알림 — 스크린샷 스타일 레이아웃
   (급변 감지 시 추가 섹션)
 """
 import logging
-import requests
+
+import pandas as pd
+
+from history.changes import day_rows, keyword_changes
+from history.daily import as_best, best_by_keyword, best_dates
+from utils import http
+from utils.brand import MINE_MASK, get_matcher
 
 log = logging.getLogger(__name__)
 
@@ -22,29 +28,43 @@ def _notion_url(database_id):
     return f"https://notion.so/{clean}"
 
 
-def build_message(df, history_df, date_str, notion_db_id=""):
+def build_message(df, history_df, date_str, notion_db_id="", brands=None):
     """
     DataFrame → Slack Block Kit 배열
 
+    Args:
+        history_df: 순위 변동 색인(history/changes.py, date_str 행 포함), 일자별 최고 순위 집계(history/daily.py)
+                    또는 원본 이력 행
+        brands: utils.brand.BrandMatcher -- 경쟁사 코드/목록 (None이면 기본 설정)
     Returns:
         blocks (list)
     """
     # ── 기본 집계 ─────────────────────────────────────────
     kw_count = df["keyword"].nunique() if "keyword" in df.columns else 0
+    brands = brands or get_matcher()
+    today_best = as_best(df, brands)
 
-    # 자사 브랜드 노출 키워드 수 (행 수가 아닌 고유 키워드 수)
-    db_count  = int(df[df["is_db"].fillna(False)]["keyword"].nunique())  if "is_db"  in df.columns else 0
-    bit_count = int(df[df["is_bit"].fillna(False)]["keyword"].nunique()) if "is_bit" in df.columns else 0
+    def _kw_count(bit):
+        """bit 브랜드가 노출된 고유 키워드 수 (행 수가 아님)"""
+        return int(today_best.loc[(today_best["bit"] & bit) != 0, "keyword"].nunique())
 
-    # 경쟁사 노출 키워드 수
-    da_count  = int(df[df["is_da"].fillna(False)]["keyword"].nunique()) if "is_da" in df.columns else 0
-    hr_count  = int(df[df["is_hr"].fillna(False)]["keyword"].nunique()) if "is_hr" in df.columns else 0
-    dv_count  = int(df[df["is_dv"].fillna(False)]["keyword"].nunique()) if "is_dv" in df.columns else 0
+    # 자사 / 경쟁사 노출 키워드 수 -- 레지스트리 코드별 (DB, BI / DA, HR, DV, C1 ...)
+    my_counts   = [(e.code, _kw_count(e.bit)) for e in brands.registry if e.mine]
+    comp_counts = [(e.code, _kw_count(e.bit)) for e in brands.entries(mine=False)]
 
     # ── 전일 대비 급변 감지 ───────────────────────────────
+    # 오늘·전일 모두 자사(DB·BI) 최고 순위 기준
     big_changes = []
-    if not history_df.empty and "date" in history_df.columns:
-        dates = sorted(history_df["date"].dropna().unique().tolist())
+    if history_df is not None and "d1" in history_df.columns:
+        # 변동 색인: 저장소가 오늘 분을 적재하며 직전 수집일과 비교해 둔 행 -- 두 날짜 모두 순위가 있는 키워드만
+        both = keyword_changes(day_rows(history_df, date_str), MINE_MASK).dropna(subset=["rank", "prev_rank"])
+        both = both.rename(columns={"rank": "curr", "prev_rank": "prev"})
+        hist_best = pd.DataFrame()
+    else:
+        both = None
+        hist_best = as_best(history_df, brands)
+    if not hist_best.empty:
+        dates = best_dates(hist_best)
         prev_date = None
         if date_str in dates:
             idx = dates.index(date_str)
@@ -53,21 +73,18 @@ def build_message(df, history_df, date_str, notion_db_id=""):
             prev_date = dates[-1]
 
         if prev_date:
-            prev_df   = history_df[history_df["date"] == prev_date]
-            mine_now  = df[df.get("is_db", False) | df.get("is_bit", False)] if (
-                "is_db" in df.columns or "is_bit" in df.columns) else df
-
-            for kw, grp in mine_now.groupby("keyword"):
-                curr_rank = int(grp["rank"].min())
-                prev_rows = prev_df[prev_df["keyword"] == kw]
-                if not prev_rows.empty:
-                    prev_rank = int(prev_rows["rank"].min())
-                    diff = prev_rank - curr_rank
-                    if abs(diff) >= 5:
-                        big_changes.append({
-                            "kw": kw, "curr": curr_rank,
-                            "prev": prev_rank, "diff": diff
-                        })
+            both = pd.concat([best_by_keyword(today_best, MINE_MASK).rename("curr"),
+                              best_by_keyword(hist_best, MINE_MASK, prev_date).rename("prev")],
+                             axis=1, join="inner")
+    if both is not None:
+        for kw, r in both.iterrows():
+            curr_rank, prev_rank = int(r["curr"]), int(r["prev"])
+            diff = prev_rank - curr_rank
+            if abs(diff) >= 5:
+                big_changes.append({
+                    "kw": kw, "curr": curr_rank,
+                    "prev": prev_rank, "diff": diff
+                })
 
     big_changes.sort(key=lambda x: abs(x["diff"]), reverse=True)
 
@@ -112,8 +129,8 @@ def build_message(df, history_df, date_str, notion_db_id=""):
     blocks.append({"type": "divider"})
 
     # 4. 자사 / 경쟁사 노출 (2열)
-    my_brand_text   = f"DB: {db_count} | BI: {bit_count}"
-    comp_brand_text = f"DA: {da_count} | HY: {hr_count} | DV: {dv_count}"
+    my_brand_text   = " | ".join(f"{code}: {n}" for code, n in my_counts)
+    comp_brand_text = " | ".join(f"{code}: {n}" for code, n in comp_counts) or "-"
 
     blocks.append({
         "type": "section",
@@ -142,7 +159,7 @@ def build_message(df, history_df, date_str, notion_db_id=""):
 
 
 def send_slack(webhook_url, df, history_df, date_str,
-               notion_db_id="", only_on_big_change=False):
+               notion_db_id="", only_on_big_change=False, brands=None):
     """
     Slack Incoming Webhook 전송
 
@@ -157,14 +174,14 @@ def send_slack(webhook_url, df, history_df, date_str,
         return False, "전송할 데이터가 없습니다."
 
     try:
-        blocks = build_message(df, history_df, date_str, notion_db_id)
+        blocks = build_message(df, history_df, date_str, notion_db_id, brands)
 
         if only_on_big_change:
             has_alert = any(":rotating_light:" in str(b) for b in blocks)
             if not has_alert:
                 return True, "급변 없음 — Slack 전송 생략"
 
-        resp = requests.post(webhook_url, json={"blocks": blocks}, timeout=15)
+        resp = http.post(webhook_url, json={"blocks": blocks}, timeout=15)
         resp.raise_for_status()
         log.info("[slack] 전송 완료")
         return True, "Slack 알림 전송 완료"
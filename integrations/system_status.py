@@ -116,10 +116,11 @@ def live_naver(client_id: str, client_secret: str) -> tuple[str, str]:
     """네이버 검색 API 실제 호출 테스트"""
     if not (client_id and client_secret):
         return "gray", "키 미설정"
-    import requests
+    from utils import http
     try:
-        r = requests.get(
-            "https://openapi.naver.com/v1/search/shop.json",
+        # 연결 테스트는 재시도 1회만 -- 버튼 응답이 늦어지지 않게
+        r = http.get(
+            "https://openapi.naver.com/v1/search/shop.json", retries=1,
             headers={"X-Naver-Client-Id": client_id, "X-Naver-Client-Secret": client_secret},
             params={"query": "드론", "display": 1}, timeout=10)
         if r.status_code == 200:
@@ -135,11 +136,11 @@ def live_gemini(api_key: str) -> tuple[str, str]:
     """Gemini API 실제 호출 테스트"""
     if not api_key:
         return "gray", "키 미설정"
-    import requests
+    from utils import http
     try:
-        r = requests.post(
+        r = http.post(
             f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}",
-            json={"contents": [{"parts": [{"text": "ping"}]}]}, timeout=15)
+            json={"contents": [{"parts": [{"text": "ping"}]}]}, timeout=15, retries=1)
         if r.status_code == 200:
             return "green", "연결 정상 (HTTP 200)"
         if r.status_code in (400, 403):
@@ -153,9 +154,9 @@ def live_apps_script(url: str, token: str) -> tuple[str, str]:
     """Apps Script(데이터 저장소) 연결 테스트"""
     if not url:
         return "gray", "미설정"
-    import requests
+    from utils import http
     try:
-        r = requests.get(url, params={"token": token}, timeout=15)
+        r = http.get(url, params={"token": token}, timeout=15, retries=1)
         if r.status_code == 200:
             return "green", "연결 정상"
         return "yellow", f"응답 이상 (HTTP {r.status_code})"
@@ -1,37 +1,36 @@
 # -*- coding: utf-8 -*-
-import requests
-import pandas as pd
+import argparse
 import datetime as dt
 import time
-import base64
-import hmac
-import hashlib
 import os
-import io
-import random
-import sys
 import logging
+import tempfile
+
+from crawl.core import CrawlConfig, iter_keyword_results, today_kst
+from crawl.journal import CrawlJournal
+from crawl.records import records_to_df
+from crawl.shard import merge_shards, select_shard, shard_journal, shard_name
+from crawl.sinks import AppsScriptSink
+from history.retention import apply_retention
+from history.sync import apps_script_store
+from utils import cassette
+from utils.brand import get_matcher
+from utils.http import breaker_status
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 
 # [P2] 절대 경로 기준점 -- 어떤 디렉토리에서 실행해도 keywords.txt를 정확히 찾음
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-NAVER_CLIENT_ID = os.getenv("NAVER_CLIENT_ID")
-NAVER_CLIENT_SECRET = os.getenv("NAVER_CLIENT_SECRET")
-NAVER_AD_API_KEY = os.getenv("NAVER_AD_API_KEY")
-NAVER_AD_SECRET_KEY = os.getenv("NAVER_AD_SECRET_KEY")
-NAVER_CUSTOMER_ID = os.getenv("NAVER_CUSTOMER_ID")
 APPS_SCRIPT_URL = os.getenv("APPS_SCRIPT_URL")
 APPS_SCRIPT_TOKEN = os.getenv("APPS_SCRIPT_TOKEN")
 
-_brand1_raw = os.getenv("MY_BRAND_1", "드론박스, DroneBox, DJI 정품판매점 드론박스")
-_brand2_raw = os.getenv("MY_BRAND_2", "빛드론, Bit-Drone, Bit Drone, BITDRONE")
-_comp_raw   = os.getenv("COMPETITORS", "다다사, dadasa, 효로로, 드론뷰")
-
-T_DB   = [x.strip() for x in _brand1_raw.split(',') if x.strip()]
-T_BIT  = [x.strip() for x in _brand2_raw.split(',') if x.strip()]
-T_COMP = [x.strip() for x in _comp_raw.split(',')   if x.strip()]
+# [CRAWL] 수집 설정 -- MY_BRAND_1/MY_BRAND_2/COMPETITORS, CRAWL_CONCURRENCY, RANK_DEPTH 등
+# 환경변수는 crawl/core.py CrawlConfig.from_env가 읽는다.
+# 상위 3위 + 자사/경쟁사 행만 보존 (keep="brand"), 딥 페이지는 추적 브랜드가 다 나오면 조기 종료
+CRAWL_CONFIG = CrawlConfig.from_env(extra_headers={
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+})
 
 def load_keywords(file_path=None):
     # [P2] 절대 경로 우선 -- GitHub Actions 등 다른 CWD에서도 정상 동작
@@ -50,107 +49,63 @@ def load_keywords(file_path=None):
     logging.warning(f"[P2] keywords.txt 미발견 ({abs_path}) -- 기본 키워드 3개로 대체")
     return ["입문용 드론", "촬영용 드론", "미니4 프로"]
 
-def get_vol(kw):
-    try:
-        ts = str(int(time.time() * 1000))
-        sig = base64.b64encode(hmac.new(NAVER_AD_SECRET_KEY.encode(), f"{ts}.GET./keywordstool".encode(), hashlib.sha256).digest()).decode()
-        headers = {"X-Timestamp": ts, "X-API-KEY": NAVER_AD_API_KEY, "X-Customer": NAVER_CUSTOMER_ID, "X-Signature": sig}
-        res = requests.get(f"https://api.naver.com/keywordstool?hintKeywords={kw.replace(' ', '')}&showDetail=1", headers=headers, timeout=10)
-        res.raise_for_status()
-        for i in res.json().get('keywordList', []):
-            if i.get('relKeyword', '').replace(" ", "") == kw.replace(" ", ""):
-                def _to_int(val):
-                    s = str(val).replace("<", "").strip()
-                    return int(s) if s.isdigit() else 0
-                def _to_float(val):
-                    s = str(val).replace("<", "").strip()
-                    try: return float(s)
-                    except: return 0.0
-                v = _to_int(i.get('monthlyPcQcCnt', 0)) + _to_int(i.get('monthlyMobileQcCnt', 0))
-                c = _to_float(i.get('monthlyAvePcClkCnt', 0)) + _to_float(i.get('monthlyAveMobileClkCnt', 0))
-                return v, round(c, 1), round(c / v * 100, 2) if v else 0
-    except Exception as e:
-        logging.warning(f"[P3][get_vol] '{kw}' 검색량 API 오류: {type(e).__name__}: {e}")
-    return 0, 0, 0
-
-def get_rank(kw):
-    time.sleep(random.uniform(0.8, 1.8)) 
-    headers = {
-        "X-Naver-Client-Id": NAVER_CLIENT_ID, 
-        "X-Naver-Client-Secret": NAVER_CLIENT_SECRET,
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    try:
-        res = requests.get("https://openapi.naver.com/v1/search/shop.json", headers=headers, params={"query": kw, "display": 100, "sort": "sim"}, timeout=10)
-        res.raise_for_status()
-        return res.json().get('items', [])
-    except Exception as e:
-        logging.warning(f"⚠️ {kw} 검색 에러: {e}")
-        return []
-
-def run_automation():
-    today_iso = (dt.datetime.utcnow() + dt.timedelta(hours=9)).strftime("%Y-%m-%d")
-    keywords = load_keywords()  # [P2] 인수 없이 호출 -- BASE_DIR 기반 절대 경로 자동 사용
-    
-    # 띄어쓰기 무시 + 소문자 변환된 비교용 리스트
-    t_db_clean = [x.replace(" ", "").lower() for x in T_DB]
-    t_bit_clean = [x.replace(" ", "").lower() for x in T_BIT]
-    t_comp_clean = [x.replace(" ", "").lower() for x in T_COMP]
-    
-    results = []
-    
-    for kw in keywords:
-        vol, clk, ctr = get_vol(kw)
-        items = get_rank(kw)
-        if items:
-            for r, item in enumerate(items, 1):
-                raw_mall = item.get('mallName', '')
-                cm = raw_mall.replace(" ", "").lower()
-                
-                is_mine = any(x in cm for x in t_db_clean + t_bit_clean)
-                is_comp = any(x in cm for x in t_comp_clean)
-                
-                if r <= 3 or is_mine or is_comp:
-                    sm = raw_mall
-                    if any(x in cm for x in t_db_clean): sm = "드론박스"
-                    elif any(x in cm for x in t_bit_clean): sm = "빛드론"
-                    elif "다다사" in cm: sm = "다다사"
-                    elif "효로로" in cm: sm = "효로로"
-                    elif "드론뷰" in cm: sm = "드론뷰"
-                    
-                    # [핵심 수정] 원본 스트림릿 코드와 100% 동일한 구조와 컬럼 복원
-                    results.append({
-                        "date": today_iso, 
-                        "keyword": kw, 
-                        "vol": vol, 
-                        "click": clk, 
-                        "ctr": ctr,
-                        "rank": r, 
-                        "mall": sm, 
-                        "title": item.get('title', '').replace("<b>", "").replace("</b>", ""),
-                        "price": item.get('lprice', 0), 
-                        "link": item.get('link', ''),
-                        "is_db": any(x in cm for x in t_db_clean),
-                        "is_bit": any(x in cm for x in t_bit_clean),
-                        "is_da": "다다사" in cm,
-                        "is_hr": "효로로" in cm,
-                        "is_dv": "드론뷰" in cm
-                    })
+APPS_SCRIPT_SINK = "apps_script"  # 저널 업로드 표시용 싱크 이름
+
+def _crawl(journal, keywords, resume, limit):
+    """journal 기준 미완료 키워드 수집 → (수집 키워드 수, 실패 수, 소요 초)"""
+    if not resume:
+        kept = journal.reset()
+        if kept:
+            logging.info(f"[RESUME] 오늘 이미 업로드한 키워드 {kept}개는 다시 수집해도 재전송하지 않음")
+    todo = journal.pending(keywords)
+    if limit > 0:
+        todo = todo[:limit]
+    if resume:
+        logging.info(f"[RESUME] 오늘 완료 {len(keywords) - len(journal.pending(keywords))}개 · "
+                     f"이번 실행 수집 {len(todo)}개")
+
+    # [CRAWL] 키워드 단위 병렬 수집 (crawl/core.py) -- 결과는 키워드 입력 순서대로 나옴
+    failed = []
+    resolver = CRAWL_CONFIG.new_volume_resolver()
+    started = time.monotonic()
+    for res in iter_keyword_results(todo, CRAWL_CONFIG, resolver, journal.date, on_result=journal.record):
+        if res.error:
+            failed.append(res.keyword)
+    elapsed = time.monotonic() - started
+    logging.info(f"[CRAWL] {len(todo)}개 키워드 수집 완료: 실패 {len(failed)}개, "
+                 f"{elapsed:.1f}초 "
+                 f"(동시 {CRAWL_CONFIG.concurrency}, 깊이 {CRAWL_CONFIG.depth})")
+    logging.info(f"[CRAWL] {resolver.summary()}")
+    for host, hs in breaker_status().items():
+        if hs["retries"] or hs["failures"]:
+            logging.info(f"[HTTP] {host}: 요청 {hs['requests']} · 재시도 {hs['retries']} · "
+                         f"실패 {hs['failures']} · 차단 {hs['rejected']} ({hs['state']})")
+    return len(todo), len(failed), elapsed
 
+def _publish(journal, keywords):
+    """오늘 저널 기준 업로드 + 순위 변동 알림 (하루 1회 경로)"""
+    today_iso = journal.date
+    # 업로드는 저널 기준 -- 이번 실행 수집분 + 지난 실행에서 업로드 실패한 분
+    to_upload = journal.not_uploaded(APPS_SCRIPT_SINK, keywords)
+    results = journal.records(to_upload)
     if results and APPS_SCRIPT_URL:
-        df = pd.DataFrame(results)
-        csv_bytes = df.to_csv(index=False).encode('utf-8')
+        # 청크가 성공할 때마다 그 키워드를 업로드 완료로 기록 → 재실행 시 실패 청크분만 재전송
+        sink = AppsScriptSink(APPS_SCRIPT_URL, APPS_SCRIPT_TOKEN,
+                              on_chunk=lambda kws, key: journal.mark_uploaded(APPS_SCRIPT_SINK, kws, key))
+        ok, msg = sink.write(records_to_df(results), today_iso)
+        if ok:
+            logging.info(f"구글 시트 {msg} (키워드 {len(to_upload)}개)")
+        else:
+            logging.error(f"[P3] 구글 시트 {msg} -- 저널에 보존됨, --resume으로 재전송")
+
+        # 알림은 오늘 전체(저널) 기준
+        df = records_to_df(journal.records(keywords))
+        # 로컬 이력 저장소에도 오늘 분 반영 (history/store.py) -- 다음 날 전일 비교는 HTTP 없이
         try:
-            requests.post(
-                APPS_SCRIPT_URL,
-                params={"token": APPS_SCRIPT_TOKEN, "type": "auto_daily"},
-                data=csv_bytes,
-                headers={'Content-Type': 'text/plain; charset=utf-8'},
-                timeout=30
-            )
-            logging.info("구글 시트 전송 완료")
+            apps_script_store(APPS_SCRIPT_URL).replace_days(df, source="crawl")
+            apply_retention(apps_script_store(APPS_SCRIPT_URL), today=dt.date.fromisoformat(today_iso))
         except Exception as e:
-            logging.error(f"[P3] 구글 시트 전송 실패: {type(e).__name__}: {e}")
+            logging.warning(f"[HISTORY] 이력 저장 실패: {type(e).__name__}: {e}")
 
         # [ALERTS] 순위 변동 이벤트 알림 (SLACK_WEBHOOK_URL 설정 시에만 동작)
         _slack_url = os.environ.get("SLACK_WEBHOOK_URL", "")
@@ -163,7 +118,12 @@ def run_automation():
                 if prev_df is None:
                     logging.info("[ALERTS] 비교할 전일 데이터 없음 — 알림 생략")
                 else:
-                    events = detect_events(df, prev_df)
+                    # 오늘 분 최고 순위·순위 변동 색인은 위 replace_days가 저장소에 만들어 둔 것을 그대로 사용
+                    _store = apps_script_store(APPS_SCRIPT_URL)
+                    events = detect_events(df, prev_df, brands=get_matcher(
+                        CRAWL_CONFIG.brand1, CRAWL_CONFIG.brand2, CRAWL_CONFIG.competitors),
+                        today_best=_store.read_best(today_iso, today_iso),
+                        changes=_store.read_changes(today_iso, today_iso))
                     msg = format_alert_message(events, today_iso)
                     if msg and send_slack_webhook(_slack_url, msg):
                         logging.info(f"[ALERTS] 이벤트 {len(events)}건 Slack 발송 완료")
@@ -174,5 +134,103 @@ def run_automation():
     else:
         logging.warning("[P3] 수집 결과 없음 또는 APPS_SCRIPT_URL 미설정")
 
+def run_automation(resume=False, limit=0, shard_index=None, shard_count=1, merge=False, benchmark=False):
+    today_iso = today_kst()
+    # [P2] 인수 없이 호출 -- BASE_DIR 기반 절대 경로 자동 사용. 중복 키워드는 1번만 수집·업로드
+    keywords = list(dict.fromkeys(load_keywords()))
+
+    if benchmark:
+        # [BENCH] 임시 저널에 처음부터 수집만 -- 오늘 저널·업로드·알림은 건드리지 않음
+        n, n_failed, elapsed = _crawl(CrawlJournal(today_iso, tempfile.mkdtemp(prefix="crawl_bench_")),
+                                      keywords, False, limit)
+        n_req = sum(hs["requests"] for hs in breaker_status().values())
+        cas = cassette.active()
+        logging.info(f"[BENCH] 키워드 {n}개 (실패 {n_failed}) · {elapsed:.2f}초 · "
+                     f"{n / elapsed if elapsed else 0:.1f} 키워드/초 · HTTP 요청 {n_req}건"
+                     + (f" · {cas.summary()}" if cas else ""))
+        return
+
+    # [CRAWL] 체크포인트 저널 -- 키워드가 끝나는 즉시 .crawl_journal/<날짜>.jsonl에 기록.
+    # --resume이면 오늘 이미 끝난 키워드는 건너뛰고, 아니면 오늘 저널을 비우고 처음부터 (업로드 표시는 유지).
+    journal = CrawlJournal(today_iso)
+    journal.purge_old()
+
+    if shard_index is not None:
+        # [SHARD] 내 샤드 키워드만 수집 → 샤드 저널에만 기록, 업로드/알림은 --merge가 1회 수행
+        mine = select_shard(keywords, shard_index, shard_count)
+        part = shard_journal(today_iso, shard_index, shard_count)
+        logging.info(f"[SHARD] {shard_name(shard_index, shard_count)}: 전체 {len(keywords)}개 중 {len(mine)}개 담당")
+        _crawl(part, mine, resume, limit)
+        left = part.pending(mine)
+        if left:
+            logging.warning(f"[SHARD] 미완료 키워드 {len(left)}개 -- 같은 샤드를 --resume으로 다시 실행")
+        logging.info(f"[SHARD] 결과: {part.path}")
+        return
+
+    if merge:
+        # [SHARD] 샤드 저널 → 오늘 저널 (키워드 단위 중복 제거). 오늘 저널은 비우지 않음
+        imported, missing = merge_shards(journal, keywords, shard_count)
+        logging.info(f"[SHARD] 샤드 {shard_count}개 병합: 새 키워드 {imported}개")
+        if missing:
+            logging.warning(f"[SHARD] 결과 파일 없는 샤드: {missing}")
+    else:
+        _crawl(journal, keywords, resume, limit)
+
+    left = journal.pending(keywords)
+    if left:
+        hint = "누락 샤드를 다시 실행한 뒤 --merge" if merge else "`python main_automation.py --resume`으로 이어서 수집"
+        logging.warning(f"[RESUME] 미완료 키워드 {len(left)}개 -- {hint}")
+    _publish(journal, keywords)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="네이버 쇼핑 일일 순위 자동 수집")
+    p.add_argument("--resume", action="store_true",
+                   help="오늘 저널에서 끝난 키워드는 건너뛰고, 아직 업로드되지 않은 행만 전송")
+    p.add_argument("--limit", type=int, default=0,
+                   help="이번 실행에서 수집할 최대 키워드 수 (0=전체). --resume과 함께 여러 번 나눠 실행")
+    p.add_argument("--shard-index", type=int, default=None,
+                   help="이 워커가 맡을 샤드 번호 (0부터). 수집만 하고 업로드/알림은 --merge에서")
+    p.add_argument("--shard-count", type=int, default=1,
+                   help="전체 샤드(병렬 워커) 수")
+    p.add_argument("--merge", action="store_true",
+                   help="샤드 결과를 오늘 데이터로 합쳐 중복 제거 후 업로드·알림 1회 실행")
+    p.add_argument("--record", metavar="PATH",
+                   help="실제 API 응답을 카세트 파일(gzip JSON)로 녹화")
+    p.add_argument("--replay", metavar="PATH",
+                   help="네트워크 없이 카세트 응답으로 실행")
+    p.add_argument("--latency-ms", default="0",
+                   help="재생 시 요청당 지연(ms) 또는 recorded(녹화 당시 소요 시간)")
+    p.add_argument("--benchmark", action="store_true",
+                   help="임시 저널로 전체 키워드 수집만 하고 처리량 출력 (업로드/알림 없음)")
+    args = p.parse_args(argv)
+    if args.shard_count < 1:
+        p.error("--shard-count는 1 이상이어야 합니다")
+    if args.shard_index is not None and not 0 <= args.shard_index < args.shard_count:
+        p.error("--shard-index는 0 ~ shard-count-1 범위여야 합니다")
+    if args.merge and args.shard_index is not None:
+        p.error("--merge와 --shard-index는 함께 쓸 수 없습니다")
+    if args.record and args.replay:
+        p.error("--record와 --replay는 함께 쓸 수 없습니다")
+    return args
+
+def setup_cassette(args):
+    """[BENCH] --record/--replay → utils/cassette (환경변수 HTTP_CASSETTE_*보다 우선)"""
+    if args.record or args.replay or args.benchmark:
+        # 검색량 캐시 적중분은 API를 부르지 않아 녹화·측정에서 빠지므로 끔
+        os.environ["VOL_CACHE_TTL_DAYS"] = "0"
+    if args.record:
+        cassette.use_cassette(args.record, cassette.MODE_RECORD)
+    elif args.replay:
+        latency = args.latency_ms
+        if latency != cassette.LATENCY_RECORDED:
+            try:
+                latency = float(latency)
+            except ValueError:
+                raise SystemExit(f"--latency-ms는 숫자 또는 recorded: {latency!r}")
+        cassette.use_cassette(args.replay, cassette.MODE_REPLAY, latency)
+
 if __name__ == "__main__":
-    run_automation()
+    args = parse_args()
+    setup_cassette(args)
+    run_automation(resume=args.resume, limit=args.limit, shard_index=args.shard_index,
+                   shard_count=args.shard_count, merge=args.merge, benchmark=args.benchmark)
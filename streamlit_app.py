@@ -18,11 +18,9 @@ import pandas as pd
 import altair as alt
 import datetime as dt
 import time
-import random
 import base64
 import hmac
 import hashlib
-import requests
 import io
 genai = None
 _GENAI_OK = False  # SDK 미사용 — REST API로 직접 호출
@@ -153,59 +151,24 @@ def _sched_save_cfg(cfg):
         pass
 
 def _sched_load_result():
+    # 예약 수집 결과 JSON(FileSink) → 이력 스키마 DataFrame (history/schema.py)
     try:
         if _os.path.exists(_SCHED_RESULT_FILE):
             with open(_SCHED_RESULT_FILE, "r", encoding="utf-8") as f:
-                return _json.load(f)
+                return coerce_history(pd.DataFrame(_json.load(f).get("data") or []))
     except Exception:
         pass
     return None
 
-def _sched_save_result(data_list, today_str):
-    try:
-        with open(_SCHED_RESULT_FILE, "w", encoding="utf-8") as f:
-            _json.dump({"timestamp": today_str, "count": len(data_list), "data": data_list},
-                       f, ensure_ascii=False, default=str)
-    except Exception:
-        pass
-
 def _sched_run_crawl(keys, keywords_list):
     import logging as _slog
-    results = []
-    ad_api  = keys.get("naver_ad_api_key", "")
-    ad_sec  = keys.get("naver_ad_secret_key", "")
-    ad_cid  = keys.get("naver_customer_id", "")
-    nav_cid = keys.get("naver_client_id", "")
-    nav_sec = keys.get("naver_client_secret", "")
-    t_b1    = [x.strip() for x in keys.get("my_brand_1","").split(",") if x.strip()]
-    t_b2    = [x.strip() for x in keys.get("my_brand_2","").split(",") if x.strip()]
-    today   = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=9)).strftime("%Y-%m-%d")
-    for kw in keywords_list:
-        try:
-            vol, clk, ctr = get_vol(kw, ad_api, ad_sec, ad_cid)
-            items = get_rank(kw, nav_cid, nav_sec)
-            if items:
-                for r, item in enumerate(items, 1):
-                    mn = item['mallName'].replace(" ","").lower()
-                    results.append({
-                        "date": today, "keyword": kw, "vol": vol, "click": clk, "ctr": ctr,
-                        "rank": r, "mall": item['mallName'],
-                        "title": item['title'].replace("<b>","").replace("</b>",""),
-                        "price": item['lprice'], "link": item['link'],
-                        "is_db":  any(x.lower().replace(" ","") in mn for x in t_b1),
-                        "is_bit": any(x.lower().replace(" ","") in mn for x in t_b2),
-                    })
-            else:
-                # 순위 결과 없어도 검색량은 저장 (미노출 키워드 vol 표시용)
-                results.append({
-                    "date": today, "keyword": kw, "vol": vol, "click": clk, "ctr": ctr,
-                    "rank": 999, "mall": "", "title": "", "price": 0, "link": "",
-                    "is_db": False, "is_bit": False,
-                })
-        except Exception as e:
-            _slog.warning(f"[AutoCrawl] '{kw}' 오류: {e}")
-    _sched_save_result(results, today)
-    _slog.info(f"[AutoCrawl] 완료: {len(results)}건")
+    # 예약 수집은 depth 전체 행 + 미노출 키워드 자리표시 행(rank 999)을 보존 (crawl/core.py)
+    cfg = CrawlConfig.from_user_keys(keys, keep=KEEP_ALL, placeholder=True, extra_headers=HTTP_HEADERS)
+    today = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=9)).strftime("%Y-%m-%d")
+    _vr = cfg.new_volume_resolver()
+    results = list(crawl_keywords(keywords_list, cfg, _vr, today))
+    ok, msg = FileSink(_SCHED_RESULT_FILE).write(results, today)
+    _slog.info(f"[AutoCrawl] 완료: {len(results)}건 · {_vr.summary()} · {msg}")
 
 def _sched_start(keys):
     if _SCHED_SINGLETON["thread"] and _SCHED_SINGLETON["thread"].is_alive():
@@ -326,6 +289,22 @@ from auth.users import (
     load_keys as _auth_load_keys,
 )
 from auth.db import init_db as _auth_init_db
+from crawl.backfill import backfill_brands, stale_rows
+from crawl.core import KEEP_ALL, CrawlConfig, crawl_keywords, iter_keyword_results, search_shop_page
+from crawl.records import records_to_df
+from crawl.sinks import AppsScriptSink, FileSink, NotionSink, SlackSink, write_all
+from history.changes import change_index, changes_between, keyword_changes, pair_changes
+from history.daily import daily_best, empty_best
+from history.cache import cache_stats, data_version, get_shared_history, get_shared_view, invalidate as invalidate_history
+from history.dashboard import dashboard_metrics
+from history.retention import apply_retention, empty_weekly, raw_days, trend_table, weekly_dates
+from history.schema import coerce_history, date_between, date_labels, format_memory_report, memory_report
+from history.store import source_key
+from history.sync import apps_script_store, notion_history, notion_store, sync_apps_script, sync_notion
+from utils.brand import BIT_BI, BIT_DB, MINE_MASK, brand_mask_series, get_matcher, has_brand
+from utils.lazy import LazyContext, lazy_property
+from utils import http as _http
+from utils.vol_cache import get_volume_cache
 
 sys.stdout.reconfigure(encoding='utf-8')
 st.set_page_config(page_title="키워드맵", page_icon="🗺️", layout="wide", initial_sidebar_state="collapsed")
@@ -529,7 +508,10 @@ HTTP_HEADERS = {
 }
 
 if 'crawled_df' not in st.session_state: st.session_state.crawled_df = pd.DataFrame()
+if 'crawled_best' not in st.session_state: st.session_state.crawled_best = empty_best()
 if 'history_df' not in st.session_state: st.session_state.history_df = pd.DataFrame()
+# 세션 로컬 데이터(crawled_df·history_df) 버전 -- 바뀔 때마다 새 값 (Dashboard KPI 메모 키, history/dashboard.py)
+if 'data_ver' not in st.session_state: st.session_state.data_ver = _secrets.token_hex(6)
 if 'ai_report_text' not in st.session_state: st.session_state.ai_report_text = ""
 if 'authenticated'   not in st.session_state: st.session_state.authenticated  = False
 if 'current_user'    not in st.session_state: st.session_state.current_user   = None
@@ -664,40 +646,18 @@ if not st.session_state.authenticated:
     st.stop()
 
 # --- API 엔진 ---
-def get_vol(kw, ak, sk, cid):
-    if not (ak and sk and cid): return 0, 0, 0
-    try:
-        ts = str(int(time.time() * 1000))
-        sig = base64.b64encode(hmac.new(sk.encode(), f"{ts}.GET./keywordstool".encode(), hashlib.sha256).digest()).decode()
-        headers = {**HTTP_HEADERS, "X-Timestamp": ts, "X-API-KEY": ak, "X-Customer": cid, "X-Signature": sig}
-        time.sleep(random.uniform(1.2, 2.5))
-        res = requests.get(f"https://api.naver.com/keywordstool?hintKeywords={kw.replace(' ', '')}&showDetail=1", headers=headers, timeout=10)
-        res.raise_for_status()
-        for i in res.json().get('keywordList', []):
-            if i['relKeyword'].replace(" ", "") == kw.replace(" ", ""):
-                v = int(str(i['monthlyPcQcCnt']).replace("<", "")) + int(str(i['monthlyMobileQcCnt']).replace("<", ""))
-                c = float(str(i['monthlyAvePcClkCnt']).replace("<", "")) + float(str(i['monthlyAveMobileClkCnt']).replace("<", ""))
-                return v, round(c, 1), round(c / v * 100, 2) if v else 0
-    except Exception as e:
-        import logging as _log
-        _log.warning(f"[get_vol] '{kw}' 오류: {type(e).__name__}: {e}")
-    return 0, 0, 0
-
 def get_rank(kw, cid, sec):
+    """쇼핑 검색 1페이지 (단건 조회용) — 수집은 crawl/core.py iter_keyword_results 사용"""
     if not (cid and sec): return []
     try:
-        headers = {**HTTP_HEADERS, "X-Naver-Client-Id": cid, "X-Naver-Client-Secret": sec}
-        time.sleep(random.uniform(0.8, 1.5))
-        res = requests.get("https://openapi.naver.com/v1/search/shop.json", headers=headers, params={"query": kw, "display": 100, "sort": "sim"}, timeout=10)
-        res.raise_for_status()
-        return res.json().get('items', [])
+        return search_shop_page(kw, CrawlConfig(naver_client_id=cid, naver_client_secret=sec,
+                                                extra_headers=HTTP_HEADERS))
     except Exception as e:
         import logging as _log
         _log.warning(f"[get_rank] '{kw}' 오류: {type(e).__name__}: {e}")
         return []
 
-from integrations.notion_sync import save_to_notion, load_from_notion, get_available_dates
-from integrations.slack_notify import send_slack
+from integrations.notion_sync import save_to_notion
 
 # ── API 키 변수 초기화 (session_state에서 직접 읽기) ──────────────────────────
 _k = st.session_state.user_keys
@@ -778,43 +738,169 @@ if _mini_lv == "red":
 
 def get_clean_df(df_target):
     if df_target.empty: return df_target
-    df_clean = df_target.copy()
+    # 얕은 복사 -- 아래에서 mall 컬럼을 통째로 교체할 뿐 원본 값은 건드리지 않음
+    df_clean = df_target.copy(deep=False)
     # top1_mall → mall 컬럼 통일 (Notion 요약 구조 호환)
     if 'mall' not in df_clean.columns and 'top1_mall' in df_clean.columns:
         df_clean['mall'] = df_clean['top1_mall']
+    _matcher = get_matcher(my_brand_1, my_brand_2, competitors)
+    # 브랜드 비트마스크 -- brand_mask 컬럼/예전 is_* 컬럼 우선, 없으면 원래 쇼핑몰 이름으로 채움
+    df_clean['brand_mask'] = brand_mask_series(df_clean, _matcher)
     if 'mall' not in df_clean.columns: return df_clean
-    t_db = [x.strip() for x in my_brand_1.split(',') if x.strip()]
-    t_bit = [x.strip() for x in my_brand_2.split(',') if x.strip()]
-    t_comp = [x.strip() for x in competitors.split(',') if x.strip()]
-    core_malls = t_db + t_bit + t_comp
-    def map_mall_name(name):
-        if not isinstance(name, str): return name
-        for core in core_malls:
-            if core in name: return core
-        return name
-    df_clean['mall'] = df_clean['mall'].apply(map_mall_name)
+    # [P6] 설정 순서(브랜드1 → 브랜드2 → 경쟁사)상 첫 매칭 별칭으로 통일 -- utils/brand.py 매처.
+    # 고유 쇼핑몰 이름만 매칭하고, 결과는 브랜드 설정 버전별 매처에 남아 rerun 때는 조회만 함
+    df_clean['mall'] = _matcher.normalize_series(df_clean['mall'])
+    # 화면용 날짜 -- datetime64(history/schema.py) → 'YYYY-MM-DD' 순서형 category (고유 날짜만 변환)
+    if 'date' in df_clean.columns:
+        df_clean['date'] = date_labels(df_clean['date'])
     return df_clean
 
 notion_token      = _k.get("notion_token", "")
 notion_db_id      = _k.get("notion_database_id", "")
 slack_webhook_url = _k.get("slack_webhook_url", "")
 
-if st.session_state.history_df.empty and apps_script_url:
-    with st.spinner("Google Sheets에서 데이터를 불러오는 중..."):
-        try:
-            import requests as _r
-            _gs_res = _r.get(apps_script_url, params={"token": apps_script_token}, timeout=20)
-            _gs_json = _gs_res.json()
-            if _gs_json:
-                _gs_df = pd.DataFrame(_gs_json)
-                if not _gs_df.empty:
-                    st.session_state.history_df = _gs_df
-        except Exception as _e:
-            pass
+def _load_apps_script_history():
+    # 로컬 이력 저장소(history/store.py)에 새 날짜만 동기화한 뒤 저장소에서 읽어 메모리 절약 dtype으로 변환
+    # (history/schema.py) -- 절감량은 attrs["memory"]로 남겨 ⚙️ 설정에 표시
+    _store = apps_script_store(apps_script_url)
+    try:
+        sync_apps_script(_store, apps_script_url, apps_script_token)
+    except Exception:
+        pass  # 동기화 실패 시 저장된 이력만 표시
+    try:
+        apply_retention(_store)  # 보존 기간이 지난 날짜는 주간 요약으로 (history/retention.py)
+    except Exception:
+        pass
+    _raw = _store.read()
+    _compact = coerce_history(_raw)
+    _compact.attrs["memory"] = memory_report(_raw, _compact)
+    return _compact
+
+def _load_notion_history():
+    return coerce_history(notion_history(notion_store(notion_db_id), days=30))
+
+def _history_source():
+    """이 세션의 이력 원천 → (공유 캐시 키, loader) / 원천이 없으면 None (세션 CSV 이력만 사용)"""
+    if st.session_state.get("history_source") == "notion" and notion_token and notion_db_id:
+        return source_key("notion", notion_db_id), _load_notion_history
+    if apps_script_url:
+        return source_key("apps_script", apps_script_url), _load_apps_script_history
+    return None
 
-hist_df    = get_clean_df(st.session_state.history_df)
-crawled_df = get_clean_df(st.session_state.crawled_df)
-metric_df  = crawled_df.copy() if not crawled_df.empty else (hist_df[hist_df['date'] == hist_df['date'].max()] if not hist_df.empty else pd.DataFrame())
+_matcher_now = get_matcher(my_brand_1, my_brand_2, competitors)
+
+def _history_view(base):
+    # 브랜드 설정이 바뀌었으면 저장된 행을 새 설정으로 재분류 (crawl/backfill.py) 후 화면용 정리.
+    # 설정 버전별로 프로세스에서 1번만 실행 -- 같은 원천·같은 설정의 다른 세션은 결과를 그대로 공유
+    _out, _n = backfill_brands(base, _matcher_now)
+    if _n:
+        # 새로 생긴 mall_raw·brand_ver·재분류된 mall도 category로 (history/schema.py)
+        _out = coerce_history(_out)
+    _view = get_clean_df(_out)
+    _view.attrs["backfilled"] = _n
+    return _view
+
+def _store_aggregates(base):
+    # 재분류로 brand_mask가 바뀌지 않았으면 저장소가 날짜를 적재할 때 만들어 둔 집계(일자별 최고 순위·변동 색인)를 그대로 씀
+    _view = get_shared_view(*_hist_src, _matcher_now.version, _history_view)
+    return bool(apps_script_url and _hist_src[0] == source_key("apps_script", apps_script_url)
+                and "brand_mask" in base.columns and base["brand_mask"].equals(_view["brand_mask"]))
+
+def _history_best(base):
+    # 일자별 최고 순위 집계 (history/daily.py). 저장소 집계를 못 쓰면 화면용 프레임으로 1번 집계
+    if _store_aggregates(base):
+        return apps_script_store(apps_script_url).read_best()
+    return daily_best(get_shared_view(*_hist_src, _matcher_now.version, _history_view))
+
+def _history_changes(base):
+    # 순위 변동 색인 (history/changes.py) -- 직전 수집일·7일·30일 전 대비. 저장소 색인을 못 쓰면 화면용 집계로 1번 생성
+    if _store_aggregates(base):
+        return apps_script_store(apps_script_url).read_changes()
+    return change_index(get_shared_view(*_hist_src, f"{_matcher_now.version}:best", _history_best))
+
+def _history_weekly(base):
+    # 보존 기간이 지나 원본 행이 없는 날짜의 주간 요약 (history/retention.py) -- 추이 차트가 기간에 맞춰 함께 읽음
+    if apps_script_url and _hist_src[0] == source_key("apps_script", apps_script_url):
+        return apps_script_store(apps_script_url).read_weekly()
+    return empty_weekly()
+
+class _PageData(LazyContext):
+    """
+    페이지가 쓰는 이력·수집 데이터 -- 메뉴 분기 전에 전부 만들지 않고 페이지가 처음 접근할 때 만든다 (utils/lazy.py).
+    스키마·FAQ 생성기처럼 이력을 안 쓰는 페이지는 아무것도 계산하지 않는다. 만든 항목·시간은 페이지 하단에 표시.
+    이력은 원천별로 프로세스에 한 벌만 두고 모든 세션이 같은 프레임을 읽음 (history/cache.py).
+    hist_df·history_base는 공유 객체이므로 컬럼 추가 등 제자리 수정 금지 -- 필터 결과를 새로 만들어 쓸 것
+    """
+
+    def _backfill_session(self, key):
+        # 세션 로컬 데이터(이번 수집분, 원천 미설정 시 CSV 가져오기)는 세션에서 재분류
+        st.session_state[key], _n = backfill_brands(st.session_state[key], _matcher_now)
+        if _n:
+            st.session_state.data_ver = _secrets.token_hex(6)
+        if _n and key == "crawled_df":
+            st.session_state.crawled_best = daily_best(st.session_state.crawled_df)
+
+    def _shared(self, variant, build):
+        with st.spinner("이력을 불러오는 중..."):
+            return get_shared_view(*_hist_src, variant, build)
+
+    @lazy_property
+    def history_base(self):
+        if _hist_src:
+            with st.spinner("이력을 불러오는 중..."):
+                return get_shared_history(*_hist_src)
+        self._backfill_session("history_df")
+        return st.session_state.history_df
+
+    @lazy_property
+    def hist_df(self):
+        if _hist_src:
+            return self._shared(_matcher_now.version, _history_view)
+        return get_clean_df(self.history_base)
+
+    @lazy_property
+    def hist_best(self):
+        if _hist_src:
+            return self._shared(f"{_matcher_now.version}:best", _history_best)
+        return daily_best(self.hist_df)
+
+    @lazy_property
+    def hist_changes(self):
+        if _hist_src:
+            return self._shared(f"{_matcher_now.version}:changes", _history_changes)
+        return change_index(self.hist_best)
+
+    @lazy_property
+    def hist_weekly(self):
+        return self._shared("weekly", _history_weekly) if _hist_src else empty_weekly()
+
+    @lazy_property
+    def crawled_df(self):
+        self._backfill_session("crawled_df")
+        return get_clean_df(st.session_state.crawled_df)
+
+    @lazy_property
+    def metric_df(self):
+        # 오늘 지표 기준 행 -- 이번 수집분, 없으면 이력 최신 날짜
+        if not self.crawled_df.empty:
+            return self.crawled_df
+        _h = self.hist_df
+        return _h[_h['date'] == _h['date'].max()] if not _h.empty else pd.DataFrame()
+
+    @lazy_property
+    def metric_best(self):
+        # metric_df와 같은 날짜의 일자별 최고 순위 집계 (이번 수집분은 수집 직후 1번 집계)
+        if not self.crawled_df.empty:
+            return st.session_state.crawled_best
+        _h = self.hist_df
+        return self.hist_best[self.hist_best['date'] == str(_h['date'].max())] if not _h.empty else empty_best()
+
+_hist_src = _history_source()
+_ctx = _PageData()
+# 이 세션에서 브랜드 설정을 바꾼 직후에만 알림 (공유 프레임은 TTL마다 다시 만들어지므로 재분류 수로 판단하지 않음)
+if st.session_state.get("_brand_ver") not in (None, _matcher_now.version):
+    st.toast(f"🔁 브랜드 설정 변경 — 기록 {_ctx.hist_df.attrs.get('backfilled', 0):,}행 재분류")
+st.session_state["_brand_ver"] = _matcher_now.version
 
 # ── 1. Dashboard ───────────────────────────────────────────────────────────────
 if selected_menu == "Dashboard":
@@ -834,12 +920,16 @@ if selected_menu == "Dashboard":
         if st.button("새로고침", use_container_width=True, type="primary"):
             if notion_token and notion_db_id:
                 with st.spinner("불러오는 중..."):
-                    _df_r, _err_r = load_from_notion(notion_token, notion_db_id, days=30)
-                    if not _df_r.empty:
-                        st.session_state.history_df = _df_r
+                    # 마지막 동기화 이후 수정된 페이지만 받아 로컬 저장소에 병합 (history/sync.py)
+                    _n_store = notion_store(notion_db_id)
+                    _, _err_r = sync_notion(_n_store, notion_token, notion_db_id, days=30)
+                    if not notion_history(_n_store, days=30).empty:
+                        # 이 세션은 Notion 요약을 이력 원천으로 사용 -- 공유 캐시는 다음 조회 때 다시 읽음
+                        st.session_state.history_source = "notion"
+                        invalidate_history(source_key("notion", notion_db_id))
                         st.rerun()
                     else:
-                        st.error(f"실패: {_err_r}")
+                        st.error(f"실패: {_err_r or '데이터 없음'}")
             else:
                 st.warning("사이드바에서 Notion 설정을 먼저 입력해주세요.")
         st.markdown("</div>", unsafe_allow_html=True)
@@ -878,12 +968,9 @@ if selected_menu == "Dashboard":
             st.caption("🔴 필수 항목은 ⚙️ 설정 메뉴에서 키를 등록하거나, ENCRYPT_KEY는 Streamlit Secrets에 추가하세요.")
 
     # ── 데이터 준비 ────────────────────────────────────────────────────────────
-    _today_df = metric_df.copy() if not metric_df.empty else pd.DataFrame()
-    _prev_df  = pd.DataFrame()
-    if not hist_df.empty:
-        _dates = sorted(hist_df['date'].dropna().unique().tolist(), reverse=True)
-        if len(_dates) > 1:
-            _prev_df = hist_df[hist_df['date'] == _dates[1]].copy()
+    hist_df = _ctx.hist_df
+    crawled_df = _ctx.crawled_df  # 세션 수집분 재분류가 있으면 data_ver가 바뀌므로 메모 키보다 먼저
+    _dates = sorted(hist_df['date'].dropna().unique().tolist(), reverse=True) if not hist_df.empty else []
 
     # 전체 모니터링 키워드 목록 (keywords.txt 기준)
     _kw_file = _os.path.join(_AUTH_DIR, "keywords.txt")
@@ -894,69 +981,36 @@ if selected_menu == "Dashboard":
     elif 'save_kws_text' in st.session_state and st.session_state.save_kws_text:
         _all_kws = [_k2.strip() for _k2 in st.session_state.save_kws_text.split('\n') if _k2.strip()]
 
-    # 오늘 자사 상품이 노출된 키워드 (is_db 또는 is_bit = True인 것만)
-    if not _today_df.empty:
-        if 'is_db' in _today_df.columns and 'is_bit' in _today_df.columns:
-            _mine_df = _today_df[_today_df['is_db'].fillna(False) | _today_df['is_bit'].fillna(False)]
-        elif 'mall' in _today_df.columns:
-            _mb_pat = '|'.join([x.strip() for x in (my_brand_1 + ',' + my_brand_2).split(',') if x.strip()])
-            _mine_df = _today_df[_today_df['mall'].str.contains(_mb_pat, na=False, case=False, regex=True)]
+    # KPI 전부(노출·순위 변동·검색량/1위 맵·1위 탈취·기회·CTR)를 최신 이틀 데이터로 한 번에 계산 (history/dashboard.py).
+    # (데이터 버전, 날짜 쌍, 브랜드 설정)이 같으면 expander 열기 같은 재실행에서는 다시 계산하지 않음
+    _my_brands_pat = '|'.join([x.strip() for x in (my_brand_1+','+my_brand_2).split(',') if x.strip()])
+    _dash_key = (
+        data_version(_hist_src[0]) if _hist_src else None, st.session_state.data_ver,
+        str(_dates[0]) if _dates else None, str(_dates[1]) if len(_dates) > 1 else None,
+        _matcher_now.version, _my_brands_pat,
+    )
+    def _dash_inputs():
+        _latest = hist_df[hist_df['date'] == _dates[0]] if _dates else pd.DataFrame()
+        if crawled_df.empty and len(_dates) > 1:
+            # 최신 이력 날짜 vs 직전 날짜 -- 순위 변동 색인(history/changes.py)에서 그 날짜 행만 꺼냄
+            _chg = changes_between(_ctx.hist_changes, _ctx.hist_best, str(_dates[0]), str(_dates[1]))
         else:
-            _mine_df = _today_df
-        _today_kws = set(_mine_df['keyword'].unique())
-    else:
-        _today_kws = set()
-
-    # 순위 변동 계산 — 브랜드별(드론박스/빛드론) 따로
-    _improved_rows = []
-    _dropped_rows  = []
-    if not _today_df.empty and not _prev_df.empty and 'is_db' in _today_df.columns:
-        _top1_today = _today_df.sort_values('rank').drop_duplicates('keyword')[['keyword','mall']].rename(columns={'mall':'top_mall'})
-        _brand_mall_col = 'top1_mall' if 'top1_mall' in _prev_df.columns else ('mall' if 'mall' in _prev_df.columns else None)
-        for _brand_col, _brand_name in [('is_db', '드론박스'), ('is_bit', '빛드론')]:
-            _t_brand = _today_df[_today_df[_brand_col].fillna(False)]
-            _p_brand = _prev_df[_prev_df[_brand_col].fillna(False)] if _brand_col in _prev_df.columns else pd.DataFrame()
-            if _t_brand.empty or _p_brand.empty:
-                continue
-            _t_best = _t_brand.groupby('keyword')['rank'].min().reset_index().rename(columns={'rank': 'today_rank'})
-            _p_best = _p_brand.groupby('keyword')['rank'].min().reset_index().rename(columns={'rank': 'prev_rank'})
-            _chg = pd.merge(_t_best, _p_best, on='keyword', how='inner')
-            _chg['delta'] = _chg['prev_rank'].astype(int) - _chg['today_rank'].astype(int)
-            _chg = pd.merge(_chg, _top1_today, on='keyword', how='left')
-            _chg['is_db']  = (_brand_name == '드론박스')
-            _chg['is_bit'] = (_brand_name == '빛드론')
-            _chg['brand']  = _brand_name
-            _improved_rows += _chg[_chg['delta'] > 0].sort_values('delta', ascending=False).to_dict('records')
-            _dropped_rows  += _chg[_chg['delta'] < 0].sort_values('delta').to_dict('records')
-        _improved_rows.sort(key=lambda x: x['delta'], reverse=True)
-        _dropped_rows.sort(key=lambda x: x['delta'])
-
+            # 이번 수집분은 아직 색인에 없음 -- 수집분 집계와 비교 날짜 집계를 맞춤
+            _hb = _ctx.hist_best
+            _prev_best = _hb[_hb['date'] == str(_dates[1])] if len(_dates) > 1 else empty_best()
+            _chg = pair_changes(_ctx.metric_best, _prev_best)
+        return crawled_df, _latest, _chg, _my_brands_pat
+    _dm = dashboard_metrics(_dash_key, _dash_inputs)
+
+    _today_kws     = _dm.exposed
+    _improved_rows = _dm.improved
+    _dropped_rows  = _dm.dropped
     # 미노출 키워드 (keywords.txt 에 있지만 오늘 is_mine 없는 것)
     _missing_kws = [_kw for _kw in _all_kws if _kw not in _today_kws]
-    # 미노출 키워드의 마지막 알려진 검색량 & 1위 경쟁사 & 1위 제품명
-    _vol_map   = {}
-    _top1_map  = {}
-    _title_map = {}
-    # crawled_df + hist_df 합쳐서 최대한 많은 키워드 커버
-    _ref_frames = []
-    if not crawled_df.empty:
-        _ref_frames.append(crawled_df)
-    if not hist_df.empty:
-        # hist_df는 가장 최신 날짜만 사용
-        _h_latest = hist_df[hist_df['date'] == hist_df['date'].max()]
-        _ref_frames.append(_h_latest)
-    if _ref_frames:
-        _ref_df = pd.concat(_ref_frames, ignore_index=True)
-        # 검색량
-        if 'vol' in _ref_df.columns:
-            _vol_map = _ref_df.groupby('keyword')['vol'].max().to_dict()
-        # 1위 mall/title: rank 기준 정렬 후 키워드별 첫 행
-        _ref_top1 = _ref_df.sort_values('rank').drop_duplicates('keyword')
-        _mall_col = 'top1_mall' if 'top1_mall' in _ref_top1.columns else ('mall' if 'mall' in _ref_top1.columns else None)
-        if _mall_col:
-            _top1_map = _ref_top1.set_index('keyword')[_mall_col].to_dict()
-        if 'title' in _ref_top1.columns:
-            _title_map = _ref_top1.set_index('keyword')['title'].to_dict()
+    # 미노출 키워드의 마지막 알려진 검색량 & 1위 경쟁사 & 1위 제품명 (수집분 + 최신 이력)
+    _vol_map   = _dm.vol_map
+    _top1_map  = _dm.top1_map
+    _title_map = _dm.title_map
 
     # KPI 숫자
     _n_exposed = len(_today_kws)
@@ -964,24 +1018,14 @@ if selected_menu == "Dashboard":
     _n_down    = len(_dropped_rows)
     _n_missing = len(_missing_kws)
     # 드론박스/빛드론 별도 노출 카운트
-    _t_db_list  = [x.strip() for x in my_brand_1.split(',') if x.strip()]
-    _t_bit_list = [x.strip() for x in my_brand_2.split(',') if x.strip()]
-    if not _today_df.empty and 'is_db' in _today_df.columns:
-        _n_db  = int(_today_df[_today_df['is_db'].fillna(False)]['keyword'].nunique())
-        _n_bit = int(_today_df[_today_df['is_bit'].fillna(False)]['keyword'].nunique())
-    elif not _today_df.empty and 'mall' in _today_df.columns:
-        _db_pat  = '|'.join(_t_db_list)
-        _bit_pat = '|'.join(_t_bit_list)
-        _n_db  = int(_today_df[_today_df['mall'].str.contains(_db_pat,  na=False, case=False)]['keyword'].nunique())
-        _n_bit = int(_today_df[_today_df['mall'].str.contains(_bit_pat, na=False, case=False)]['keyword'].nunique())
-    else:
-        _n_db = _n_bit = 0
+    _n_db  = _dm.exposed_by_bit[BIT_DB]
+    _n_bit = _dm.exposed_by_bit[BIT_BI]
 
     # ── 브랜드별 순위 변동 계산 ───────────────────────────────────────────────
-    _up_db  = len([r for r in _improved_rows if r.get('is_db',  False)]) if _improved_rows else 0
-    _up_bit = len([r for r in _improved_rows if r.get('is_bit', False)]) if _improved_rows else 0
-    _dn_db  = len([r for r in _dropped_rows  if r.get('is_db',  False)]) if _dropped_rows  else 0
-    _dn_bit = len([r for r in _dropped_rows  if r.get('is_bit', False)]) if _dropped_rows  else 0
+    _up_db  = len([r for r in _improved_rows if r.get('brand_mask', 0) & BIT_DB])
+    _up_bit = len([r for r in _improved_rows if r.get('brand_mask', 0) & BIT_BI])
+    _dn_db  = len([r for r in _dropped_rows  if r.get('brand_mask', 0) & BIT_DB])
+    _dn_bit = len([r for r in _dropped_rows  if r.get('brand_mask', 0) & BIT_BI])
     # 브랜드별 미노출 수 (전체 _missing_kws는 합산이므로 여기서는 합계만 절반씩)
     _ms_db  = sum(1 for kw in _missing_kws if kw not in _today_kws)
     _ms_bit = 0  # 브랜드별 미노출 분리가 어려울 경우 0 표시
@@ -1048,11 +1092,16 @@ if selected_menu == "Dashboard":
     </div>
     """, unsafe_allow_html=True)
 
-    if _today_df.empty and not _all_kws:
+    if crawled_df.empty and hist_df.empty and not _all_kws:
         st.info("📌 'Run & Sync' 메뉴에서 수집을 먼저 실행하거나 Notion 새로고침을 눌러주세요.")
 
     # ── 섹션 1: 순위 하락 키워드 ─────────────────────────────────────────────
     st.markdown(f'<div class="km-block"><div class="km-block-head"><span class="km-block-title">📉 순위 하락 키워드</span><span class="km-badge km-badge-rd">{_n_down}개</span></div>', unsafe_allow_html=True)
+    def _fmt_delta(d):
+        # 순위 변동 색인의 7일·30일 전 대비 (양수 = 상승, 기준 날짜가 없으면 -)
+        if d is None or pd.isna(d):
+            return "-"
+        return f"▲{int(d)}" if d > 0 else (f"▼{abs(int(d))}" if d < 0 else "0")
     if _dropped_rows:
         _drop_data = []
         for _r in _dropped_rows:
@@ -1062,6 +1111,8 @@ if selected_menu == "Dashboard":
                 "어제 순위": f"{int(_r['prev_rank'])}위",
                 "오늘 순위": f"{int(_r['today_rank'])}위",
                 "하락폭":   f"▼{abs(int(_r['delta']))}",
+                "7일 변동": _fmt_delta(_r.get('d7')),
+                "30일 변동": _fmt_delta(_r.get('d30')),
                 "현재 1위": _r.get('top_mall', '-'),
             })
         _drop_df = pd.DataFrame(_drop_data)
@@ -1139,25 +1190,7 @@ if selected_menu == "Dashboard":
         st.info("어제 대비 순위 상승 키워드가 없습니다.")
 
     # ── 섹션 4: 경쟁사 1위 탈취 알림 ─────────────────────────────────────────
-    _stolen = []
-    if not hist_df.empty and not _today_df.empty:
-        _h_dates = sorted(hist_df['date'].dropna().unique().tolist(), reverse=True)
-        if _h_dates:
-            _prev_top1_df = hist_df[hist_df['date'] == _h_dates[0]]
-            _mall_col2 = 'top1_mall' if 'top1_mall' in _today_df.columns else ('mall' if 'mall' in _today_df.columns else None)
-            _mall_col3 = 'top1_mall' if 'top1_mall' in _prev_top1_df.columns else ('mall' if 'mall' in _prev_top1_df.columns else None)
-            if _mall_col2 and _mall_col3:
-                _now_top1  = _today_df.sort_values('rank').drop_duplicates('keyword').set_index('keyword')[_mall_col2]
-                _prev_top1 = _prev_top1_df.sort_values('rank').drop_duplicates('keyword').set_index('keyword')[_mall_col3]
-                _my_brands_pat = '|'.join([x.strip() for x in (my_brand_1+','+my_brand_2).split(',') if x.strip()])
-                for kw in _now_top1.index:
-                    if kw not in _prev_top1.index: continue
-                    _was = str(_prev_top1[kw])
-                    _now = str(_now_top1[kw])
-                    # 어제는 자사가 1위였는데 오늘은 다른 곳이 1위
-                    import re as _re
-                    if _re.search(_my_brands_pat, _was, _re.IGNORECASE) and not _re.search(_my_brands_pat, _now, _re.IGNORECASE):
-                        _stolen.append({"키워드": kw, "어제 1위": _was, "오늘 1위 (탈취)": _now})
+    _stolen = _dm.stolen
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1169,18 +1202,9 @@ if selected_menu == "Dashboard":
         st.success("✅ 자사 1위 키워드를 경쟁사에 빼앗기지 않았습니다.")
 
     # ── 섹션 5: 기회 키워드 (검색량 높고 순위 20~60위) ──────────────────────
-    _opp_data = []
-    if not _today_df.empty and _vol_map:
-        _mine_today = _today_df[_today_df['is_db'].fillna(False) | _today_df['is_bit'].fillna(False)] if 'is_db' in _today_df.columns else _today_df
-        _best_rank_today = _mine_today.groupby('keyword')['rank'].min()
-        for kw, rank in _best_rank_today.items():
-            if 15 <= rank <= 60:
-                vol = _vol_map.get(kw, 0)
-                if vol >= 100:
-                    _price_rows = _today_df[_today_df['keyword'] == kw].sort_values('rank')
-                    _top1_price = int(_price_rows.iloc[0]['price']) if not _price_rows.empty and 'price' in _price_rows.columns else 0
-                    _opp_data.append({"키워드": kw, "현재 순위": f"{int(rank)}위", "월 검색량": f"{int(vol):,}", "1위 가격": f"{_top1_price:,}원" if _top1_price else "-"})
-    _opp_data.sort(key=lambda x: int(x["월 검색량"].replace(",","")), reverse=True)
+    _opp_data = [{"키워드": _o.keyword, "현재 순위": f"{_o.rank}위", "월 검색량": f"{_o.vol:,}",
+                  "1위 가격": f"{_o.top_price:,}원" if _o.top_price else "-"}
+                 for _o in _dm.opportunities.itertuples(index=False)]
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown(f'<div class="km-block"><div class="km-block-head"><span class="km-block-title">💡 기회 키워드</span><span class="km-badge km-badge-pp">{len(_opp_data)}개</span></div>', unsafe_allow_html=True)
     st.caption("검색량 100+ · 현재 순위 15~60위 · 조금만 올리면 상위 노출 가능한 키워드")
@@ -1190,14 +1214,8 @@ if selected_menu == "Dashboard":
         st.info("기회 키워드가 없습니다. (수집 후 확인 가능)")
 
     # ── 섹션 6: CTR 낮은 키워드 (노출은 되는데 클릭 안 됨) ──────────────────
-    _ctr_data = []
-    if not _today_df.empty and 'ctr' in _today_df.columns:
-        _ctr_kws = _today_df[(_today_df['is_db'].fillna(False) | _today_df['is_bit'].fillna(False)) & (_today_df['ctr'].fillna(0) > 0)] if 'is_db' in _today_df.columns else pd.DataFrame()
-        if not _ctr_kws.empty:
-            _ctr_best = _ctr_kws.groupby('keyword').agg(순위=('rank','min'), CTR=('ctr','max'), 검색량=('vol','max')).reset_index()
-            _ctr_best = _ctr_best[_ctr_best['CTR'] < 2.0].sort_values('검색량', ascending=False)
-            for _, row in _ctr_best.iterrows():
-                _ctr_data.append({"키워드": row['keyword'], "최고 순위": f"{int(row['순위'])}위", "CTR": f"{row['CTR']:.2f}%", "월 검색량": f"{int(row['검색량']):,}"})
+    _ctr_data = [{"키워드": _c.keyword, "최고 순위": f"{_c.rank}위", "CTR": f"{_c.ctr:.2f}%", "월 검색량": f"{_c.vol:,}"}
+                 for _c in _dm.low_ctr.itertuples(index=False)]
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown(f'<div class="km-block"><div class="km-block-head"><span class="km-block-title">📉 CTR 낮은 키워드</span><span class="km-badge km-badge-am">{len(_ctr_data)}개</span></div>', unsafe_allow_html=True)
     st.caption("순위는 있지만 클릭률 2% 미만 — 썸네일·상품명 개선이 필요한 키워드")
@@ -1209,229 +1227,261 @@ if selected_menu == "Dashboard":
 
 # ── 2. 일자별 순위 추이 ────────────────────────────────────────────────────────
 elif selected_menu == "일자별 순위 추이":
+    hist_df, hist_best, hist_weekly = _ctx.hist_df, _ctx.hist_best, _ctx.hist_weekly
+    hist_changes = _ctx.hist_changes
     st.markdown("<div style='font-size:1.5rem;font-weight:800;color:#111;letter-spacing:-0.03em;margin-bottom:0.2rem;'>일자별 순위 추이</div><div style='font-size:0.82rem;color:#AAA;margin-bottom:1.4rem;'>키워드별 날짜 순위 변화 추적</div>", unsafe_allow_html=True)
-    if not hist_df.empty:
-        hist_df['date_obj'] = pd.to_datetime(hist_df['date']).dt.date
-        min_date = hist_df['date_obj'].min()
-        max_date = hist_df['date_obj'].max()
+    # 원본 보존 기간 이전은 주간 요약(history/retention.py)만 있음 -- 기간 선택 범위는 두 단계를 합쳐서
+    _wk_span = weekly_dates(hist_weekly)
+    if not hist_df.empty or _wk_span:
+        # hist_df는 세션 간 공유 프레임(history/cache.py) -- 날짜 컬럼을 추가하지 않고 'YYYY-MM-DD' 그대로 비교
+        _span = ([str(hist_df['date'].min()), str(hist_df['date'].max())] if not hist_df.empty else []) + list(_wk_span or [])
+        min_date = dt.date.fromisoformat(min(_span))
+        max_date = dt.date.fromisoformat(max(_span))
         default_start = max(min_date, max_date - dt.timedelta(days=14))
-        col1, col2 = st.columns([1, 2])
-        with col1:
-            selected_dates = st.date_input("조회할 기간을 선택하세요", value=(default_start, max_date), min_value=min_date, max_value=max_date)
-        with col2:
-            all_kws = sorted(hist_df['keyword'].unique().tolist())
-            selected_kws = st.multiselect("차트에 표시할 키워드 선택/제외", options=all_kws, default=all_kws[:5] if len(all_kws)>5 else all_kws)
-        if len(selected_dates) == 2:
-            start_date, end_date = selected_dates
-            filtered_df = hist_df[(hist_df['date_obj'] >= start_date) & (hist_df['date_obj'] <= end_date)]
-            if selected_kws:
-                filtered_df = filtered_df[filtered_df['keyword'].isin(selected_kws)]
-            if not filtered_df.empty:
-                st.markdown("---")
-                t_db  = [x.strip() for x in my_brand_1.split(',') if x.strip()]
-                t_bit = [x.strip() for x in my_brand_2.split(',') if x.strip()]
-                t_comp_list = [x.strip() for x in competitors.split(',') if x.strip()]
-                all_brands = t_db + t_bit + t_comp_list
-                chart_type = st.selectbox("차트 유형 선택", [
-                    "선그래프 - 일자별 순위 추이",
-                    "바차트 - 회사별 순위 비교",
-                    "버블차트 - 검색량 vs 순위",
-                    "히트맵 - 키워드x날짜",
-                    "파이차트 - 1위 쇼핑몰 점유율",
-                    "스캐터 - 순위 변동 분포",
-                ])
-                _sort_cols = [c for c in ['keyword','mall','title','date_obj'] if c in filtered_df.columns]
-                filtered_df = filtered_df.sort_values(_sort_cols)
+        all_kws = sorted(set(hist_df['keyword'].unique().tolist()) | set(hist_weekly['keyword'].unique().tolist()))
 
-                if "선그래프" in chart_type:
-                    try:
-                        selection = alt.selection_point(fields=['keyword'], bind='legend')
-                    except AttributeError:
-                        selection = alt.selection_multi(fields=['keyword'], bind='legend')
-                    if 'mall' in filtered_df.columns:
-                        lf = filtered_df[filtered_df['mall'].str.contains("|".join(t_db+t_bit), na=False, regex=True)]
-                    else:
-                        lf = filtered_df
-                    _gc = [c for c in ['date','keyword','title','mall'] if c in lf.columns]
-                    line_df = lf.groupby(_gc, as_index=False)['rank'].min()
-                    line_df['데이터유형'] = '실제 수집 데이터'
-                    st.caption("키워드를 1~3개로 좁혀서 보시는 것이 좋습니다.")
-                    use_ai_pred = st.toggle("AI 추세 예측 (향후 5일)", value=False)
-                    if use_ai_pred:
-                        import numpy as np
-                        future_rows = []
-                        _ag = [c for c in ['keyword','title','mall'] if c in line_df.columns]
-                        for gk, grp in line_df.groupby(_ag):
-                            if not isinstance(gk, tuple): gk = (gk,)
-                            kw = gk[0]; ti = gk[1] if len(gk)>1 else ''; ml = gk[2] if len(gk)>2 else ''
-                            if len(grp) >= 2:
-                                gr = grp.tail(7)
-                                poly = np.polyfit(np.arange(len(gr)), gr['rank'].values, 1)
-                                ld2 = pd.to_datetime(gr['date'].iloc[-1])
-                                lr = gr['rank'].iloc[-1]
-                                future_rows.append({'date': ld2.strftime('%Y-%m-%d'), 'keyword': kw, 'title': ti, 'mall': ml, 'rank': lr, '데이터유형': 'AI 예측'})
-                                for i in range(1, 6):
-                                    future_rows.append({'date': (ld2+dt.timedelta(days=i)).strftime('%Y-%m-%d'), 'keyword': kw, 'title': ti, 'mall': ml, 'rank': max(1, min(100, round(poly[0]*(len(gr)-1+i)+poly[1]))), '데이터유형': 'AI 예측'})
-                        if future_rows:
-                            line_df = pd.concat([line_df, pd.DataFrame(future_rows)], ignore_index=True)
-                    if not line_df.empty:
-                        mr = max(int(line_df['rank'].max()+2), 5)
-                        bc2 = alt.Chart(line_df).encode(
-                            x=alt.X('date:O', title='날짜', axis=alt.Axis(labelAngle=-45)),
-                            y=alt.Y('rank:Q', scale=alt.Scale(reverse=True, domain=[mr,1], nice=False), title='순위'),
-                            color=alt.Color('keyword:N', legend=alt.Legend(title="키워드", orient="right")),
+        # fragment: 기간·키워드·차트 유형을 바꾸면 이 영역만 다시 실행 (인증·메뉴·데이터 준비는 건너뜀)
+        @st.fragment
+        def _trend_view(hist_df, hist_best, hist_weekly, hist_changes, min_date, max_date, default_start, all_kws):
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                selected_dates = st.date_input("조회할 기간을 선택하세요", value=(default_start, max_date), min_value=min_date, max_value=max_date)
+            with col2:
+                selected_kws = st.multiselect("차트에 표시할 키워드 선택/제외", options=all_kws, default=all_kws[:5] if len(all_kws)>5 else all_kws)
+            if len(selected_dates) == 2:
+                start_date, end_date = selected_dates
+                filtered_df = hist_df[date_between(hist_df['date'], start_date.isoformat(), end_date.isoformat())]
+                _range_best = hist_best[date_between(hist_best['date'], start_date.isoformat(), end_date.isoformat())]
+                # 자사 최고 순위 추이 -- 원본 단계는 날짜별, 그 이전은 주별 (선그래프·히트맵)
+                _trend = trend_table(hist_best, hist_weekly, MINE_MASK, start_date.isoformat(), end_date.isoformat())
+                if selected_kws:
+                    filtered_df = filtered_df[filtered_df['keyword'].isin(selected_kws)]
+                    _range_best = _range_best[_range_best['keyword'].isin(selected_kws)]
+                    _trend = _trend[_trend['keyword'].isin(selected_kws)]
+                if not filtered_df.empty or not _trend.empty:
+                    st.markdown("---")
+                    t_db  = [x.strip() for x in my_brand_1.split(',') if x.strip()]
+                    t_bit = [x.strip() for x in my_brand_2.split(',') if x.strip()]
+                    t_comp_list = [x.strip() for x in competitors.split(',') if x.strip()]
+                    all_brands = t_db + t_bit + t_comp_list
+                    chart_type = st.selectbox("차트 유형 선택", [
+                        "선그래프 - 일자별 순위 추이",
+                        "바차트 - 회사별 순위 비교",
+                        "버블차트 - 검색량 vs 순위",
+                        "히트맵 - 키워드x날짜",
+                        "파이차트 - 1위 쇼핑몰 점유율",
+                        "스캐터 - 순위 변동 분포",
+                    ])
+                    _sort_cols = [c for c in ['keyword','mall','title','date'] if c in filtered_df.columns]
+                    filtered_df = filtered_df.sort_values(_sort_cols)
+                    if (_trend['tier'] == '주별').any():
+                        st.caption("원본 보존 기간 이전은 주간 최고 순위(주 월요일 날짜)로 표시됩니다. 선그래프·히트맵 외 차트는 원본 보존 기간만 지원합니다.")
+
+                    if filtered_df.empty and not any(k in chart_type for k in ("선그래프", "히트맵")):
+                        st.info("선택한 기간은 주간 요약만 남아 있습니다. 선그래프 또는 히트맵으로 확인하세요.")
+
+                    elif "선그래프" in chart_type:
+                        try:
+                            selection = alt.selection_point(fields=['keyword'], bind='legend')
+                        except AttributeError:
+                            selection = alt.selection_multi(fields=['keyword'], bind='legend')
+                        if 'brand_mask' in filtered_df.columns:
+                            lf = filtered_df[has_brand(filtered_df['brand_mask'], MINE_MASK)]
+                        else:
+                            lf = filtered_df
+                        # 키워드별 자사 최고 순위 -- 일자별 집계(history/daily.py)·주간 요약(history/retention.py)에서 기간·키워드만 골라 씀
+                        line_df = _trend.copy() if 'brand_mask' in filtered_df.columns or filtered_df.empty else \
+                            lf.groupby(['date','keyword'], as_index=False, observed=True)['rank'].min()
+                        line_df['데이터유형'] = '실제 수집 데이터'
+                        st.caption("키워드를 1~3개로 좁혀서 보시는 것이 좋습니다.")
+                        use_ai_pred = st.toggle("AI 추세 예측 (향후 5일)", value=False)
+                        if use_ai_pred:
+                            import numpy as np
+                            future_rows = []
+                            _ag = [c for c in ['keyword','title','mall'] if c in line_df.columns]
+                            for gk, grp in line_df.groupby(_ag, observed=True):
+                                if not isinstance(gk, tuple): gk = (gk,)
+                                kw = gk[0]; ti = gk[1] if len(gk)>1 else ''; ml = gk[2] if len(gk)>2 else ''
+                                if len(grp) >= 2:
+                                    gr = grp.tail(7)
+                                    poly = np.polyfit(np.arange(len(gr)), gr['rank'].values, 1)
+                                    ld2 = pd.to_datetime(gr['date'].iloc[-1])
+                                    lr = gr['rank'].iloc[-1]
+                                    future_rows.append({'date': ld2.strftime('%Y-%m-%d'), 'keyword': kw, 'title': ti, 'mall': ml, 'rank': lr, '데이터유형': 'AI 예측'})
+                                    for i in range(1, 6):
+                                        future_rows.append({'date': (ld2+dt.timedelta(days=i)).strftime('%Y-%m-%d'), 'keyword': kw, 'title': ti, 'mall': ml, 'rank': max(1, min(100, round(poly[0]*(len(gr)-1+i)+poly[1]))), '데이터유형': 'AI 예측'})
+                            if future_rows:
+                                line_df = pd.concat([line_df, pd.DataFrame(future_rows)], ignore_index=True)
+                        if not line_df.empty:
+                            mr = max(int(line_df['rank'].max()+2), 5)
+                            bc2 = alt.Chart(line_df).encode(
+                                x=alt.X('date:O', title='날짜', axis=alt.Axis(labelAngle=-45)),
+                                y=alt.Y('rank:Q', scale=alt.Scale(reverse=True, domain=[mr,1], nice=False), title='순위'),
+                                color=alt.Color('keyword:N', legend=alt.Legend(title="키워드", orient="right")),
+                                tooltip=['date:N','keyword:N','rank:Q']
+                            )
+                            chart = bc2.mark_line(point=True, strokeWidth=2).properties(height=450, background="transparent").interactive()
+                            st.altair_chart(chart, use_container_width=True, theme="streamlit")
+                        else:
+                            st.info("자사 데이터가 없습니다.")
+
+                    elif "바차트" in chart_type:
+                        selected_brands = st.multiselect("비교할 회사 선택", options=all_brands, default=all_brands[:min(4,len(all_brands))])
+                        latest_date2 = filtered_df['date'].max()
+                        ld_df2 = filtered_df[filtered_df['date']==latest_date2]
+                        if 'mall' in ld_df2.columns and selected_brands:
+                            bar_rows = []
+                            for kw in selected_kws:
+                                kd2 = ld_df2[ld_df2['keyword']==kw]
+                                for brand in selected_brands:
+                                    bd2 = kd2[kd2['mall'].str.contains(brand, na=False, case=False)]
+                                    best2 = int(bd2['rank'].min()) if not bd2.empty else None
+                                    if best2:
+                                        bar_rows.append({'키워드': kw, '회사': brand, '순위': best2})
+                            bar_df = pd.DataFrame(bar_rows)
+                            if not bar_df.empty:
+                                chart = alt.Chart(bar_df).mark_bar().encode(
+                                    x=alt.X('키워드:N', axis=alt.Axis(labelAngle=-30)),
+                                    y=alt.Y('순위:Q', scale=alt.Scale(reverse=True, domain=[100,1]), title='순위'),
+                                    color=alt.Color('회사:N'),
+                                    xOffset='회사:N',
+                                    tooltip=['키워드:N','회사:N','순위:Q']
+                                ).properties(height=450, background="transparent", title=f"{latest_date2} 기준").interactive()
+                                st.altair_chart(chart, use_container_width=True, theme="streamlit")
+                            else:
+                                st.info("선택한 회사의 데이터가 없습니다.")
+                        else:
+                            st.info("회사를 선택해주세요.")
+
+                    elif "버블차트" in chart_type:
+                        latest_date3 = filtered_df['date'].max()
+                        bb = filtered_df[filtered_df['date']==latest_date3].copy()
+                        bb['vol'] = pd.to_numeric(bb['vol'] if 'vol' in bb.columns else 0, errors='coerce').fillna(0)
+                        if 'brand_mask' in bb.columns:
+                            bb = bb[has_brand(bb['brand_mask'], MINE_MASK)]
+                        ba = bb.groupby('keyword', as_index=False, observed=True).agg({'rank':'min','vol':'first'})
+                        ba = ba[ba['rank']<=100]
+                        if not ba.empty:
+                            chart = alt.Chart(ba).mark_circle().encode(
+                                x=alt.X('rank:Q', scale=alt.Scale(reverse=True, domain=[100,1]), title='순위'),
+                                y=alt.Y('vol:Q', title='월간 검색량'),
+                                size=alt.Size('vol:Q', scale=alt.Scale(range=[50,1000]), legend=None),
+                                color=alt.Color('keyword:N', legend=None),
+                                tooltip=['keyword:N','rank:Q','vol:Q']
+                            ).properties(height=450, background="transparent").interactive()
+                            st.altair_chart(chart, use_container_width=True, theme="streamlit")
+                            st.caption("오른쪽 위 = 검색량 많고 순위 좋음 (이상적)")
+                        else:
+                            st.info("데이터가 없습니다.")
+
+                    elif "히트맵" in chart_type:
+                        if 'brand_mask' in filtered_df.columns:
+                            hm = filtered_df[has_brand(filtered_df['brand_mask'], MINE_MASK)]
+                        else:
+                            hm = filtered_df
+                        brk = _trend.copy() if 'brand_mask' in filtered_df.columns or filtered_df.empty else \
+                            hm.groupby(['date','keyword'], as_index=False, observed=True)['rank'].min()
+                        brk['rank_display'] = brk['rank'].apply(lambda x: str(int(x)) if x<=10 else "10+")
+                        brk['rank_color']   = brk['rank'].apply(lambda x: x if x<=10 else 11)
+                        base2 = alt.Chart(brk).encode(x=alt.X('date:O', axis=alt.Axis(labelAngle=-45)), y=alt.Y('keyword:N'))
+                        rects2 = base2.mark_rect().encode(
+                            color=alt.Color('rank_color:Q', scale=alt.Scale(domain=[1,3,5,10,11], range=['#00e5ff','#0ea5e9','#3b82f6','#1e3a8a','#374151']), legend=None),
                             tooltip=['date:N','keyword:N','rank:Q']
                         )
-                        chart = bc2.mark_line(point=True, strokeWidth=2).properties(height=450, background="transparent").interactive()
-                        st.altair_chart(chart, use_container_width=True, theme="streamlit")
-                    else:
-                        st.info("자사 데이터가 없습니다.")
-
-                elif "바차트" in chart_type:
-                    selected_brands = st.multiselect("비교할 회사 선택", options=all_brands, default=all_brands[:min(4,len(all_brands))])
-                    latest_date2 = filtered_df['date'].max()
-                    ld_df2 = filtered_df[filtered_df['date']==latest_date2]
-                    if 'mall' in ld_df2.columns and selected_brands:
-                        bar_rows = []
-                        for kw in selected_kws:
-                            kd2 = ld_df2[ld_df2['keyword']==kw]
-                            for brand in selected_brands:
-                                bd2 = kd2[kd2['mall'].str.contains(brand, na=False, case=False)]
-                                best2 = int(bd2['rank'].min()) if not bd2.empty else None
-                                if best2:
-                                    bar_rows.append({'키워드': kw, '회사': brand, '순위': best2})
-                        bar_df = pd.DataFrame(bar_rows)
-                        if not bar_df.empty:
-                            chart = alt.Chart(bar_df).mark_bar().encode(
-                                x=alt.X('키워드:N', axis=alt.Axis(labelAngle=-30)),
-                                y=alt.Y('순위:Q', scale=alt.Scale(reverse=True, domain=[100,1]), title='순위'),
-                                color=alt.Color('회사:N'),
-                                xOffset='회사:N',
-                                tooltip=['키워드:N','회사:N','순위:Q']
-                            ).properties(height=450, background="transparent", title=f"{latest_date2} 기준").interactive()
+                        text2 = base2.mark_text(baseline='middle', color='#fff', fontWeight='bold').encode(text='rank_display:N')
+                        st.altair_chart((rects2+text2).properties(height=max(300, len(selected_kws)*45), background="transparent").interactive(), use_container_width=True, theme="streamlit")
+
+                    elif "파이차트" in chart_type:
+                        latest_date4 = filtered_df['date'].max()
+                        pie_df2 = filtered_df[filtered_df['date']==latest_date4]
+                        if 'mall' in pie_df2.columns:
+                            t1b = pie_df2[pie_df2['rank']==1][['keyword','mall']].drop_duplicates('keyword').copy()
+                            def _lbl(m):
+                                for b in all_brands:
+                                    if b.lower() in str(m).lower(): return b
+                                return '기타'
+                            t1b['브랜드'] = t1b['mall'].apply(_lbl)
+                            pa2 = t1b.groupby('브랜드', as_index=False).size().rename(columns={'size':'키워드수'})
+                            chart = alt.Chart(pa2).mark_arc(innerRadius=60).encode(
+                                theta=alt.Theta('키워드수:Q'),
+                                color=alt.Color('브랜드:N'),
+                                tooltip=['브랜드:N','키워드수:Q']
+                            ).properties(height=380, background="transparent", title=f"{latest_date4} 1위 점유율")
                             st.altair_chart(chart, use_container_width=True, theme="streamlit")
                         else:
-                            st.info("선택한 회사의 데이터가 없습니다.")
-                    else:
-                        st.info("회사를 선택해주세요.")
-
-                elif "버블차트" in chart_type:
-                    latest_date3 = filtered_df['date'].max()
-                    bb = filtered_df[filtered_df['date']==latest_date3].copy()
-                    bb['vol'] = pd.to_numeric(bb['vol'] if 'vol' in bb.columns else 0, errors='coerce').fillna(0)
-                    if 'mall' in bb.columns:
-                        bb = bb[bb['mall'].str.contains("|".join(t_db+t_bit), na=False, regex=True)]
-                    ba = bb.groupby('keyword', as_index=False).agg({'rank':'min','vol':'first'})
-                    ba = ba[ba['rank']<=100]
-                    if not ba.empty:
-                        chart = alt.Chart(ba).mark_circle().encode(
-                            x=alt.X('rank:Q', scale=alt.Scale(reverse=True, domain=[100,1]), title='순위'),
-                            y=alt.Y('vol:Q', title='월간 검색량'),
-                            size=alt.Size('vol:Q', scale=alt.Scale(range=[50,1000]), legend=None),
-                            color=alt.Color('keyword:N', legend=None),
-                            tooltip=['keyword:N','rank:Q','vol:Q']
-                        ).properties(height=450, background="transparent").interactive()
-                        st.altair_chart(chart, use_container_width=True, theme="streamlit")
-                        st.caption("오른쪽 위 = 검색량 많고 순위 좋음 (이상적)")
-                    else:
-                        st.info("데이터가 없습니다.")
-
-                elif "히트맵" in chart_type:
-                    if 'mall' in filtered_df.columns:
-                        hm = filtered_df[filtered_df['mall'].str.contains("|".join(t_db+t_bit), na=False, regex=True)]
-                    else:
-                        hm = filtered_df
-                    brk = hm.groupby(['date','keyword'], as_index=False)['rank'].min()
-                    brk['rank_display'] = brk['rank'].apply(lambda x: str(int(x)) if x<=10 else "10+")
-                    brk['rank_color']   = brk['rank'].apply(lambda x: x if x<=10 else 11)
-                    base2 = alt.Chart(brk).encode(x=alt.X('date:O', axis=alt.Axis(labelAngle=-45)), y=alt.Y('keyword:N'))
-                    rects2 = base2.mark_rect().encode(
-                        color=alt.Color('rank_color:Q', scale=alt.Scale(domain=[1,3,5,10,11], range=['#00e5ff','#0ea5e9','#3b82f6','#1e3a8a','#374151']), legend=None),
-                        tooltip=['date:N','keyword:N','rank:Q']
-                    )
-                    text2 = base2.mark_text(baseline='middle', color='#fff', fontWeight='bold').encode(text='rank_display:N')
-                    st.altair_chart((rects2+text2).properties(height=max(300, len(selected_kws)*45), background="transparent").interactive(), use_container_width=True, theme="streamlit")
-
-                elif "파이차트" in chart_type:
-                    latest_date4 = filtered_df['date'].max()
-                    pie_df2 = filtered_df[filtered_df['date']==latest_date4]
-                    if 'mall' in pie_df2.columns:
-                        t1b = pie_df2[pie_df2['rank']==1][['keyword','mall']].drop_duplicates('keyword').copy()
-                        def _lbl(m):
-                            for b in all_brands:
-                                if b.lower() in str(m).lower(): return b
-                            return '기타'
-                        t1b['브랜드'] = t1b['mall'].apply(_lbl)
-                        pa2 = t1b.groupby('브랜드', as_index=False).size().rename(columns={'size':'키워드수'})
-                        chart = alt.Chart(pa2).mark_arc(innerRadius=60).encode(
-                            theta=alt.Theta('키워드수:Q'),
-                            color=alt.Color('브랜드:N'),
-                            tooltip=['브랜드:N','키워드수:Q']
-                        ).properties(height=380, background="transparent", title=f"{latest_date4} 1위 점유율")
-                        st.altair_chart(chart, use_container_width=True, theme="streamlit")
-                    else:
-                        st.info("mall 컬럼이 있는 데이터가 필요합니다.")
-
-                elif "스캐터" in chart_type:
-                    ds2 = sorted(filtered_df['date'].unique())
-                    if len(ds2) >= 2:
-                        pd_date2, cd_date2 = ds2[-2], ds2[-1]
-                        if 'mall' in filtered_df.columns:
-                            sf2 = filtered_df[filtered_df['mall'].str.contains("|".join(t_db+t_bit), na=False, regex=True)]
+                            st.info("mall 컬럼이 있는 데이터가 필요합니다.")
+
+                    elif "스캐터" in chart_type:
+                        ds2 = sorted(filtered_df['date'].unique())
+                        if len(ds2) >= 2:
+                            pd_date2, cd_date2 = ds2[-2], ds2[-1]
+                            if 'brand_mask' in filtered_df.columns:
+                                sf2 = filtered_df[has_brand(filtered_df['brand_mask'], MINE_MASK)]
+                            else:
+                                sf2 = filtered_df
+                            if 'brand_mask' in filtered_df.columns:
+                                # 두 날짜의 키워드별 자사 최고 순위 변동 -- 연속한 수집일이면 순위 변동 색인(history/changes.py) 행 그대로
+                                _sc_chg = keyword_changes(changes_between(hist_changes, _range_best, str(cd_date2), str(pd_date2)), MINE_MASK)
+                                if selected_kws:
+                                    _sc_chg = _sc_chg[_sc_chg.index.isin(selected_kws)]
+                                pr2 = _sc_chg['prev_rank'].rename('prev')
+                                cr2 = _sc_chg['rank'].rename('curr')
+                            else:
+                                pr2 = sf2[sf2['date']==pd_date2].groupby('keyword', observed=True)['rank'].min().rename('prev')
+                                cr2 = sf2[sf2['date']==cd_date2].groupby('keyword', observed=True)['rank'].min().rename('curr')
+                            sc2 = pd.concat([pr2,cr2],axis=1).dropna().reset_index()
+                            sc2['변동'] = sc2['prev'] - sc2['curr']
+                            sc2['색상'] = sc2['변동'].apply(lambda x: '상승' if x>0 else ('하락' if x<0 else '유지'))
+                            chart = alt.Chart(sc2).mark_circle(size=80).encode(
+                                x=alt.X('prev:Q', scale=alt.Scale(reverse=True), title=f'이전({pd_date2})'),
+                                y=alt.Y('curr:Q', scale=alt.Scale(reverse=True), title=f'현재({cd_date2})'),
+                                color=alt.Color('색상:N', scale=alt.Scale(domain=['상승','유지','하락'], range=['#22c55e','#9ca3af','#ef4444'])),
+                                tooltip=['keyword:N','prev:Q','curr:Q','변동:Q']
+                            ).properties(height=450, background="transparent").interactive()
+                            mx2 = int(max(sc2['prev'].max(), sc2['curr'].max(), 10))
+                            diag2 = alt.Chart(pd.DataFrame({'x':[1,mx2],'y':[1,mx2]})).mark_line(strokeDash=[4,4], color='#aaa').encode(x='x:Q', y='y:Q')
+                            st.altair_chart((chart+diag2).interactive(), use_container_width=True, theme="streamlit")
+                            st.caption("대각선 위 = 순위 상승, 아래 = 순위 하락")
                         else:
-                            sf2 = filtered_df
-                        pr2 = sf2[sf2['date']==pd_date2].groupby('keyword')['rank'].min().rename('prev')
-                        cr2 = sf2[sf2['date']==cd_date2].groupby('keyword')['rank'].min().rename('curr')
-                        sc2 = pd.concat([pr2,cr2],axis=1).dropna().reset_index()
-                        sc2['변동'] = sc2['prev'] - sc2['curr']
-                        sc2['색상'] = sc2['변동'].apply(lambda x: '상승' if x>0 else ('하락' if x<0 else '유지'))
-                        chart = alt.Chart(sc2).mark_circle(size=80).encode(
-                            x=alt.X('prev:Q', scale=alt.Scale(reverse=True), title=f'이전({pd_date2})'),
-                            y=alt.Y('curr:Q', scale=alt.Scale(reverse=True), title=f'현재({cd_date2})'),
-                            color=alt.Color('색상:N', scale=alt.Scale(domain=['상승','유지','하락'], range=['#22c55e','#9ca3af','#ef4444'])),
-                            tooltip=['keyword:N','prev:Q','curr:Q','변동:Q']
-                        ).properties(height=450, background="transparent").interactive()
-                        mx2 = int(max(sc2['prev'].max(), sc2['curr'].max(), 10))
-                        diag2 = alt.Chart(pd.DataFrame({'x':[1,mx2],'y':[1,mx2]})).mark_line(strokeDash=[4,4], color='#aaa').encode(x='x:Q', y='y:Q')
-                        st.altair_chart((chart+diag2).interactive(), use_container_width=True, theme="streamlit")
-                        st.caption("대각선 위 = 순위 상승, 아래 = 순위 하락")
-                    else:
-                        st.info("스캐터 차트는 최소 2일 이상의 데이터가 필요합니다.")
+                            st.info("스캐터 차트는 최소 2일 이상의 데이터가 필요합니다.")
+
+                else:
+                    st.warning("선택한 기간/키워드에 해당하는 데이터가 없습니다.")
 
+                st.markdown("---")
+                st.markdown("#### 📥 Excel 리포트 다운로드")
+                _xl_col1, _xl_col2, _xl_col3 = st.columns(3)
+                with _xl_col1:
+                    if st.button("📊 현재 필터 데이터 Excel", use_container_width=True):
+                        if not filtered_df.empty:
+                            _xls = generate_excel_report(filtered_df, "순위 데이터")
+                            st.download_button("⬇️ 다운로드", data=_xls, file_name=f"키워드맵_{start_date}~{end_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
+                        else:
+                            st.warning("데이터가 없습니다.")
+                with _xl_col2:
+                    if st.button("📅 최근 7일 Excel", use_container_width=True):
+                        _7d_df = hist_df[date_between(hist_df['date'], (max_date - dt.timedelta(days=7)).isoformat())]
+                        if not _7d_df.empty:
+                            st.download_button("⬇️ 주간 다운로드", data=generate_excel_report(_7d_df, "주간 리포트"), file_name=f"키워드맵_주간_{max_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
+                        else:
+                            st.warning("데이터가 없습니다.")
+                with _xl_col3:
+                    if st.button("📆 최근 30일 Excel", use_container_width=True):
+                        _30d_df = hist_df[date_between(hist_df['date'], (max_date - dt.timedelta(days=30)).isoformat())]
+                        if not _30d_df.empty:
+                            st.download_button("⬇️ 월간 다운로드", data=generate_excel_report(_30d_df, "월간 리포트"), file_name=f"키워드맵_월간_{max_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
+                        else:
+                            st.warning("데이터가 없습니다.")
             else:
-                st.warning("선택한 기간/키워드에 해당하는 데이터가 없습니다.")
+                st.info("시작일과 종료일을 모두 선택해주세요.")
 
-            st.markdown("---")
-            st.markdown("#### 📥 Excel 리포트 다운로드")
-            _xl_col1, _xl_col2, _xl_col3 = st.columns(3)
-            with _xl_col1:
-                if st.button("📊 현재 필터 데이터 Excel", use_container_width=True):
-                    if not filtered_df.empty:
-                        _xls = generate_excel_report(filtered_df, "순위 데이터")
-                        st.download_button("⬇️ 다운로드", data=_xls, file_name=f"키워드맵_{start_date}~{end_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-                    else:
-                        st.warning("데이터가 없습니다.")
-            with _xl_col2:
-                if st.button("📅 최근 7일 Excel", use_container_width=True):
-                    _7d_df = hist_df[hist_df['date_obj'] >= max_date - dt.timedelta(days=7)]
-                    if not _7d_df.empty:
-                        st.download_button("⬇️ 주간 다운로드", data=generate_excel_report(_7d_df, "주간 리포트"), file_name=f"키워드맵_주간_{max_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-                    else:
-                        st.warning("데이터가 없습니다.")
-            with _xl_col3:
-                if st.button("📆 최근 30일 Excel", use_container_width=True):
-                    _30d_df = hist_df[hist_df['date_obj'] >= max_date - dt.timedelta(days=30)]
-                    if not _30d_df.empty:
-                        st.download_button("⬇️ 월간 다운로드", data=generate_excel_report(_30d_df, "월간 리포트"), file_name=f"키워드맵_월간_{max_date}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
-                    else:
-                        st.warning("데이터가 없습니다.")
-        else:
-            st.info("시작일과 종료일을 모두 선택해주세요.")
+        _trend_view(hist_df, hist_best, hist_weekly, hist_changes, min_date, max_date, default_start, all_kws)
     else:
         st.warning("과거 데이터가 없습니다. 대시보드에서 데이터 동기화를 먼저 진행해주세요.")
 
 # ── 3. 경쟁사 집중 분석 ────────────────────────────────────────────────────────
 elif selected_menu == "경쟁사 집중 분석":
+    hist_df, hist_best = _ctx.hist_df, _ctx.hist_best
     st.markdown("<div style='font-size:1.5rem;font-weight:800;color:#111;letter-spacing:-0.03em;margin-bottom:0.2rem;'>경쟁사 집중 분석</div><div style='font-size:0.82rem;color:#AAA;margin-bottom:1.4rem;'>1페이지 점유율·순위 혈투·마법 단어 추출</div>", unsafe_allow_html=True)
     if hist_df.empty:
         st.warning("과거 데이터가 없습니다.")
@@ -1456,52 +1506,63 @@ elif selected_menu == "경쟁사 집중 분석":
         st.markdown("---")
         st.subheader("🕵️ 타사 브랜드 X-Ray 정밀 타격")
         all_comp_kws = sorted(hist_df['keyword'].dropna().unique().tolist())
-        target_kw = st.selectbox("전략을 분석할 핵심 타겟 키워드", all_comp_kws)
-        tab1, tab2, tab3 = st.tabs(["🥊 1:1 라이벌 데스매치", "🍰 1페이지 매대 점유율", "🥷 마법 단어 해킹기"])
-
-        with tab1:
-            comp_options = [c for c in t_comp if hist_df[(hist_df['keyword']==target_kw) & (hist_df['mall'].str.contains(c, na=False))].shape[0] > 0] or t_comp
-            rival = st.selectbox("비교할 타겟 경쟁사 선택", comp_options)
-            dm_df = hist_df[(hist_df['keyword']==target_kw) & (hist_df['mall'].str.contains(f"{('|'.join(t_db+t_bit))}|{rival}", na=False, regex=True))].copy()
-            if not dm_df.empty:
-                dm_trend = dm_df.groupby(['date','mall'], as_index=False)['rank'].min().sort_values('date')
-                max_rank_dm = max(int(dm_trend['rank'].max()+2), 5)
-                st.altair_chart(alt.Chart(dm_trend).mark_line(point=True, strokeWidth=4).encode(x=alt.X('date:O',title='날짜',axis=alt.Axis(labelAngle=-45,labelColor="#9ca3af",titleColor="#9ca3af")), y=alt.Y('rank:Q',title='최고 노출 순위',scale=alt.Scale(reverse=True,domain=[max_rank_dm,1],nice=False),axis=alt.Axis(labelColor="#9ca3af",titleColor="#9ca3af")), color=alt.Color('mall:N',title='쇼핑몰',legend=alt.Legend(orient="bottom",labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=[alt.Tooltip('date:N',title='날짜'),alt.Tooltip('mall:N',title='쇼핑몰'),alt.Tooltip('rank:Q',title='최고 랭킹')]).properties(height=450, background="transparent").interactive(), use_container_width=True, theme="streamlit")
-            else:
-                st.info(f"해당 키워드에 대한 타사({rival}) 비교 데이터가 부족합니다.")
-
-        with tab2:
-            share_df = hist_df[(hist_df['date']==latest_date) & (hist_df['keyword']==target_kw) & (hist_df['rank']<=40)].copy()
-            share_df = share_df[share_df['mall'].str.contains("|".join(t_db+t_bit+t_comp), na=False, regex=True)].drop_duplicates(subset=['mall','title'])
-            if not share_df.empty:
-                share_counts = share_df.groupby('mall').size().reset_index(name='1페이지 고유 상품 개수').sort_values(by='1페이지 고유 상품 개수', ascending=False)
-                col1, col2 = st.columns([1,1])
-                with col1:
-                    st.altair_chart(alt.Chart(share_counts).mark_arc(innerRadius=60, cornerRadius=4, stroke="#1e1e2d", strokeWidth=2).encode(theta=alt.Theta(field="1페이지 고유 상품 개수",type="quantitative"), color=alt.Color(field="mall",type="nominal",title="쇼핑몰",legend=alt.Legend(orient="right",labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=['mall:N','1페이지 고유 상품 개수:Q']).properties(height=400, background="transparent"), use_container_width=True, theme="streamlit")
-                with col2:
-                    st.markdown("<br><br>", unsafe_allow_html=True)
-                    st.dataframe(share_counts.reset_index(drop=True), use_container_width=True)
-            else:
-                st.info("1페이지(40위 이내)에 진입한 브랜드 데이터가 없습니다.")
-
-        with tab3:
-            title_df = hist_df[(hist_df['date']==latest_date) & (hist_df['keyword']==target_kw) & (hist_df['rank']<=20)].copy()
-            if not title_df.empty:
-                import re
-                from collections import Counter
-                words = []
-                for title in title_df['title'].dropna():
-                    words.extend([w for w in re.sub(r'[^가-힣a-zA-Z0-9\s]',' ',title).split() if w])
-                stop_words = ["dji","및","등","용","수","할","정품","드론","전용","dji온라인판매점","dji공식판매점", target_kw.split()[0].lower()]
-                filtered_words = [w for w in words if len(w)>1 and w.lower() not in stop_words]
-                word_counts = Counter(filtered_words).most_common(15)
-                if word_counts:
-                    word_df = pd.DataFrame(word_counts, columns=["추출된 마법 단어","Top 20 내 등장 횟수"])
-                    st.altair_chart(alt.Chart(word_df).mark_bar(color="#60a5fa", cornerRadiusTopRight=4, cornerRadiusBottomRight=4).encode(x=alt.X('Top 20 내 등장 횟수:Q',axis=alt.Axis(labelColor="#9ca3af",titleColor="#9ca3af")), y=alt.Y("추출된 마법 단어:N",sort='-x',axis=alt.Axis(labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=["추출된 마법 단어","Top 20 내 등장 횟수"]).properties(height=400, background="transparent"), use_container_width=True, theme="streamlit")
+
+        # fragment: 키워드·라이벌 선택은 이 영역만 다시 실행 -- 이력 프레임은 인자로 받은 것을 그대로 씀
+        @st.fragment
+        def _xray_view(hist_df, hist_best, latest_date, t_comp, all_comp_kws, registry):
+            target_kw = st.selectbox("전략을 분석할 핵심 타겟 키워드", all_comp_kws)
+            kw_df = hist_df[hist_df['keyword'] == target_kw]
+            tab1, tab2, tab3 = st.tabs(["🥊 1:1 라이벌 데스매치", "🍰 1페이지 매대 점유율", "🥷 마법 단어 해킹기"])
+
+            with tab1:
+                comp_options = [c for c in t_comp if kw_df['mall'].str.contains(c, na=False).any()] or t_comp
+                rival = st.selectbox("비교할 타겟 경쟁사 선택", comp_options)
+                # 자사(DB·BI) + 라이벌 브랜드 비트별 최고 순위 -- 일자별 최고 순위 집계(history/daily.py)
+                _dm_entries = [e for e in registry if e.mine or rival in (e.label, *e.aliases)]
+                _dm_label = {e.bit: e.label for e in _dm_entries}
+                dm_trend = hist_best[(hist_best['keyword'] == target_kw) & hist_best['bit'].isin(list(_dm_label))]
+                dm_trend = dm_trend.assign(mall=dm_trend['bit'].map(_dm_label))[['date','mall','best_rank']] \
+                    .rename(columns={'best_rank': 'rank'}).sort_values('date')
+                if not dm_trend.empty:
+                    max_rank_dm = max(int(dm_trend['rank'].max()+2), 5)
+                    st.altair_chart(alt.Chart(dm_trend).mark_line(point=True, strokeWidth=4).encode(x=alt.X('date:O',title='날짜',axis=alt.Axis(labelAngle=-45,labelColor="#9ca3af",titleColor="#9ca3af")), y=alt.Y('rank:Q',title='최고 노출 순위',scale=alt.Scale(reverse=True,domain=[max_rank_dm,1],nice=False),axis=alt.Axis(labelColor="#9ca3af",titleColor="#9ca3af")), color=alt.Color('mall:N',title='쇼핑몰',legend=alt.Legend(orient="bottom",labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=[alt.Tooltip('date:N',title='날짜'),alt.Tooltip('mall:N',title='쇼핑몰'),alt.Tooltip('rank:Q',title='최고 랭킹')]).properties(height=450, background="transparent").interactive(), use_container_width=True, theme="streamlit")
                 else:
-                    st.info("유의미한 단어 추출 결과가 없습니다.")
-            else:
-                st.info("상위 20위 데이터가 없습니다.")
+                    st.info(f"해당 키워드에 대한 타사({rival}) 비교 데이터가 부족합니다.")
+
+            with tab2:
+                share_df = kw_df[(kw_df['date']==latest_date) & (kw_df['rank']<=40)].copy()
+                share_df = share_df[share_df['brand_mask'] != 0].drop_duplicates(subset=['mall','title'])
+                if not share_df.empty:
+                    share_counts = share_df.groupby('mall', observed=True).size().reset_index(name='1페이지 고유 상품 개수').sort_values(by='1페이지 고유 상품 개수', ascending=False)
+                    col1, col2 = st.columns([1,1])
+                    with col1:
+                        st.altair_chart(alt.Chart(share_counts).mark_arc(innerRadius=60, cornerRadius=4, stroke="#1e1e2d", strokeWidth=2).encode(theta=alt.Theta(field="1페이지 고유 상품 개수",type="quantitative"), color=alt.Color(field="mall",type="nominal",title="쇼핑몰",legend=alt.Legend(orient="right",labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=['mall:N','1페이지 고유 상품 개수:Q']).properties(height=400, background="transparent"), use_container_width=True, theme="streamlit")
+                    with col2:
+                        st.markdown("<br><br>", unsafe_allow_html=True)
+                        st.dataframe(share_counts.reset_index(drop=True), use_container_width=True)
+                else:
+                    st.info("1페이지(40위 이내)에 진입한 브랜드 데이터가 없습니다.")
+
+            with tab3:
+                title_df = kw_df[(kw_df['date']==latest_date) & (kw_df['rank']<=20)].copy()
+                if not title_df.empty:
+                    import re
+                    from collections import Counter
+                    words = []
+                    for title in title_df['title'].dropna():
+                        words.extend([w for w in re.sub(r'[^가-힣a-zA-Z0-9\s]',' ',title).split() if w])
+                    stop_words = ["dji","및","등","용","수","할","정품","드론","전용","dji온라인판매점","dji공식판매점", target_kw.split()[0].lower()]
+                    filtered_words = [w for w in words if len(w)>1 and w.lower() not in stop_words]
+                    word_counts = Counter(filtered_words).most_common(15)
+                    if word_counts:
+                        word_df = pd.DataFrame(word_counts, columns=["추출된 마법 단어","Top 20 내 등장 횟수"])
+                        st.altair_chart(alt.Chart(word_df).mark_bar(color="#60a5fa", cornerRadiusTopRight=4, cornerRadiusBottomRight=4).encode(x=alt.X('Top 20 내 등장 횟수:Q',axis=alt.Axis(labelColor="#9ca3af",titleColor="#9ca3af")), y=alt.Y("추출된 마법 단어:N",sort='-x',axis=alt.Axis(labelColor="#d1d5db",titleColor="#9ca3af")), tooltip=["추출된 마법 단어","Top 20 내 등장 횟수"]).properties(height=400, background="transparent"), use_container_width=True, theme="streamlit")
+                    else:
+                        st.info("유의미한 단어 추출 결과가 없습니다.")
+                else:
+                    st.info("상위 20위 데이터가 없습니다.")
+
+        _xray_view(hist_df, hist_best, latest_date, t_comp, all_comp_kws, _matcher_now.registry)
 
 # ── 4. 틈새 키워드 발굴기 ──────────────────────────────────────────────────────
 elif selected_menu == "틈새 키워드 발굴기":
@@ -1523,7 +1584,7 @@ elif selected_menu == "틈새 키워드 발굴기":
                     ts = str(int(time.time() * 1000))
                     sig = base64.b64encode(hmac.new(ad_sec_key.encode(), f"{ts}.GET./keywordstool".encode(), hashlib.sha256).digest()).decode()
                     headers = {**HTTP_HEADERS, "X-Timestamp": ts, "X-API-KEY": ad_api_key, "X-Customer": ad_cus_id, "X-Signature": sig}
-                    res = requests.get(f"https://api.naver.com/keywordstool?hintKeywords={base_kw.replace(' ','')}&showDetail=1", headers=headers, timeout=10)
+                    res = _http.get(f"https://api.naver.com/keywordstool?hintKeywords={base_kw.replace(' ','')}&showDetail=1", headers=headers, timeout=10)
                     res.raise_for_status()
                     results = []
                     for i in res.json().get('keywordList', [])[:300]:
@@ -1543,6 +1604,7 @@ elif selected_menu == "틈새 키워드 발굴기":
 
 # ── 5. SEO태그 생성기 ──────────────────────────────────────────────────────────
 elif selected_menu == "SEO태그 생성기":
+    hist_df = _ctx.hist_df
     st.markdown("<div style='font-size:1.5rem;font-weight:800;color:#111;letter-spacing:-0.03em;margin-bottom:0.2rem;'>SEO 태그 생성기</div><div style='font-size:0.82rem;color:#AAA;margin-bottom:1.4rem;'>AI 기반 제품 메타태그 & GEO 최적화</div>", unsafe_allow_html=True)
     if 'save_target_kw' not in st.session_state: st.session_state.save_target_kw = ""
     if 'save_target_product' not in st.session_state: st.session_state.save_target_product = ""
@@ -1652,7 +1714,7 @@ elif selected_menu == "Run & Sync":
                             import urllib.parse as _up
                             _export_url += f"&sheet={_up.quote(_gs_sheet_name.strip())}"
                         with st.spinner("구글 시트에서 데이터를 불러오는 중..."):
-                            _gs_resp = requests.get(_export_url, timeout=15)
+                            _gs_resp = _http.get(_export_url, timeout=15)
                         if _gs_resp.status_code == 200:
                             _csv_df2 = None
                             for _enc in ["utf-8-sig","utf-8","cp949","euc-kr"]:
@@ -1728,17 +1790,23 @@ elif selected_menu == "Run & Sync":
                     _norm["title"]   = _mapcol(_map_title, "").astype(str).str.strip()
                     _norm["price"]   = pd.to_numeric(_mapcol(_map_price, 0), errors="coerce").fillna(0).astype(int)
                     _norm["ctr"]     = pd.to_numeric(_mapcol(_map_ctr, 0), errors="coerce").fillna(0.0)
-                    _norm["is_mine"] = False
-                    _norm["is_comp"] = False
+                    _norm["brand_mask"] = get_matcher(my_brand_1, my_brand_2, competitors).mask_series(_norm["mall"])
                     _norm["date"] = pd.to_datetime(_norm["date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna(str(_fallback_date))
                     _norm = _norm[_norm["keyword"].str.len() > 0].reset_index(drop=True)
                     if _norm.empty:
                         st.error("❌ 유효한 데이터가 없습니다. 키워드 컬럼 매핑을 확인해주세요.")
                     else:
-                        if not st.session_state.history_df.empty:
-                            st.session_state.history_df = pd.concat([st.session_state.history_df, _norm], ignore_index=True).drop_duplicates(subset=["date","keyword","rank","mall"])
+                        if apps_script_url:
+                            # 저장소에 병합 후 공유 캐시 만료 → 같은 원천을 보는 모든 세션에 반영
+                            apps_script_store(apps_script_url).merge(_norm, source="csv")
+                            invalidate_history(source_key("apps_script", apps_script_url))
+                            st.session_state.history_source = "apps_script"
                         else:
-                            st.session_state.history_df = _norm
+                            # 원천이 없으면 세션 이력에만 추가 -- 범주가 다른 category끼리 합치면 object로 풀리므로 합친 뒤 다시 변환
+                            st.session_state.history_df = coerce_history(
+                                pd.concat([st.session_state.history_df, coerce_history(_norm)], ignore_index=True)
+                                .drop_duplicates(subset=["date","keyword","rank","mall"]))
+                            st.session_state.data_ver = _secrets.token_hex(6)
                         st.success(f"✅ {len(_norm):,}건 데이터가 로드되었습니다!")
                         if _sync_to_notion and notion_token and notion_db_id:
                             with st.spinner("Notion에 저장 중..."):
@@ -1781,6 +1849,10 @@ elif selected_menu == "Run & Sync":
             with open(_KW_FILE, "w", encoding="utf-8") as _f:
                 _f.write(kws_text)
             st.success("✅ keywords.txt 저장!")
+        if st.button("🧹 검색량 캐시 비우기", use_container_width=True, key="_vol_cache_clear",
+                     help="월간 검색량 캐시를 지우고 다음 수집 때 검색광고 API에서 다시 받습니다"):
+            _n = get_volume_cache().invalidate()
+            st.success(f"✅ 검색량 캐시 {_n}건 삭제")
     st.session_state.save_kws_text = kws_text
 
     if st.button("🚀 분석 시작 및 Notion 저장", type="primary"):
@@ -1791,113 +1863,53 @@ elif selected_menu == "Run & Sync":
             prog = st.progress(0)
             status = st.empty()
             results = []
-            completed_count = [0]
-            t_db   = [x.strip() for x in my_brand_1.split(',')]
-            t_bit  = [x.strip() for x in my_brand_2.split(',')]
-            t_comp = [x.strip() for x in competitors.split(',')]
-
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-            import threading
-            results_lock = threading.Lock()
-
-            def fetch_single_kw(kw):
-                vol, clk, ctr = get_vol(kw, ad_api_key, ad_sec_key, ad_cus_id)
-                items = get_rank(kw, naver_cid, naver_csec)
-                return kw, vol, clk, ctr, items
-
-            def process_kw_result(kw, vol, clk, ctr, items):
-                r_db = r_bit = 999
-                local_rows = []
-                if items:
-                    for r, item in enumerate(items, 1):
-                        mn = item['mallName'].replace(" ","").lower()
-                        if any(x.lower().replace(" ","") in mn for x in t_db): r_db = min(r_db, r)
-                        if any(x.lower().replace(" ","") in mn for x in t_bit): r_bit = min(r_bit, r)
-                        if r <= 3 or any(x.lower().replace(" ","") in mn for x in t_db+t_bit+t_comp):
-                            local_rows.append({
-                                "date": TODAY_ISO, "keyword": kw, "vol": vol, "click": clk, "ctr": ctr,
-                                "rank": r, "mall": item['mallName'],
-                                "title": item['title'].replace("<b>","").replace("</b>",""),
-                                "price": item['lprice'], "link": item['link'],
-                                "is_db":  any(x.lower().replace(" ","") in mn for x in t_db),
-                                "is_bit": any(x.lower().replace(" ","") in mn for x in t_bit),
-                                "is_da":  "다다사" in mn,
-                                "is_hr":  "효로로" in mn,
-                                "is_dv":  "드론뷰" in mn,
-                            })
-                else:
-                    # 순위 결과 없어도 검색량 저장 (미노출 키워드 vol 표시용)
-                    local_rows.append({
-                        "date": TODAY_ISO, "keyword": kw, "vol": vol, "click": clk, "ctr": ctr,
-                        "rank": 999, "mall": "", "title": "", "price": 0, "link": "",
-                        "is_db": False, "is_bit": False, "is_da": False, "is_hr": False, "is_dv": False,
-                    })
-                best_rank = min(r_db, r_bit)
-                ai_line = f"- 키워드: {kw} | 자사 최고 순위: {'순위 밖' if best_rank==999 else str(best_rank)+'위'} | 월간 검색수: {vol}회 | 클릭률: {ctr}%\n"
-                with results_lock:
-                    results.extend(local_rows)
-                return ai_line
+            ai_raw_parts = []
+            # 상위 3위 + 자사/경쟁사 행, 미노출 키워드는 rank 999 행으로 검색량 보존 (crawl/core.py)
+            _crawl_cfg = CrawlConfig.from_user_keys(st.session_state.user_keys, placeholder=True,
+                                                    extra_headers=HTTP_HEADERS)
+            _vol_resolver = _crawl_cfg.new_volume_resolver()
 
             status.text(f"🔍 병렬 수집 시작... (총 {len(keywords)}개 키워드)")
-            ai_raw_parts = []
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                future_to_kw = {executor.submit(fetch_single_kw, kw): kw for kw in keywords}
-                for future in as_completed(future_to_kw):
-                    kw = future_to_kw[future]
-                    try:
-                        kw_r, vol, clk, ctr, items = future.result()
-                        ai_raw_parts.append(process_kw_result(kw_r, vol, clk, ctr, items))
-                    except Exception as e:
-                        import logging as _log
-                        _log.warning(f"[P4] '{kw}' 오류: {e}")
-                    completed_count[0] += 1
-                    prog.progress(completed_count[0] / len(keywords))
-                    status.text(f"🔍 수집 중... ({completed_count[0]}/{len(keywords)}) 완료")
+            for _i, _res in enumerate(iter_keyword_results(keywords, _crawl_cfg, _vol_resolver, TODAY_ISO), 1):
+                results.extend(_res.records)
+                if not _res.error:
+                    best_rank = _res.best_rank
+                    ai_raw_parts.append(f"- 키워드: {_res.keyword} | 자사 최고 순위: {'순위 밖' if best_rank==999 else str(best_rank)+'위'} | 월간 검색수: {_res.vol}회 | 클릭률: {_res.ctr}%\n")
+                prog.progress(_i / len(keywords))
+                status.text(f"🔍 수집 중... ({_i}/{len(keywords)}) 완료")
 
             ai_raw = "".join(ai_raw_parts)
-            df = pd.DataFrame(results)
+            st.caption(f"📦 {_vol_resolver.summary()}")
+            df = records_to_df(results)
             st.session_state.crawled_df = df
+            st.session_state.crawled_best = daily_best(df)  # 일자별 최고 순위 -- 수집 직후 1번만 집계
+            st.session_state.data_ver = _secrets.token_hex(6)
+            # Slack 전일 비교용 이력 -- 공유 일자별 최고 순위 집계(history/daily.py)를 그대로 넘김 (저장소 갱신 전 값).
+            # 스레드는 읽기만 하므로 세션 이력 전체를 복사하지 않는다
+            _slack_hist = _ctx.hist_best if slack_webhook_url else None
+            if apps_script_url and not df.empty:
+                _slack_index = bool(slack_webhook_url and _hist_src and _store_aggregates(_ctx.history_base))
+                # 폼에 넣은 키워드만 교체 -- 같은 날 야간 수집분의 다른 키워드 행은 유지
+                apps_script_store(apps_script_url).replace_keywords(df, source="crawl")
+                invalidate_history(source_key("apps_script", apps_script_url))
+                if _slack_index:
+                    # 저장소가 오늘 분을 적재하며 만든 순위 변동 색인(직전 수집일 대비) -- Slack 급변은 이 행을 그대로 읽음
+                    _slack_hist = apps_script_store(apps_script_url).read_changes(TODAY_ISO, TODAY_ISO)
             import threading as _threading
             _sync_status = {"done": False, "success": False, "msg": ""}
-            _history_df_copy = st.session_state.history_df.copy() if not st.session_state.history_df.empty else pd.DataFrame()
 
             def _bg_notion_slack():
-                import logging as _log
-                import requests as _req
-
-                # ── Google Sheets: 전체 데이터 저장 ──────────────────────────
-                if apps_script_url and not df.empty:
-                    try:
-                        _log.warning(f"[SEND] df 행수={len(df)}, 고유키워드={df['keyword'].nunique()}, 컬럼={list(df.columns)}")
-                        _csv = df.to_csv(index=False).encode("utf-8")
-                        _req.post(
-                            apps_script_url,
-                            params={"token": apps_script_token, "type": "auto_daily"},
-                            data=_csv,
-                            headers={"Content-Type": "text/plain; charset=utf-8"},
-                            timeout=30,
-                        )
-                        _log.info(f"[GSheets] 전체 {len(df)}건 전송 완료")
-                    except Exception as _e:
-                        _log.warning(f"[GSheets] 전송 실패: {_e}")
-
-                # ── Notion: 자사 상품(is_mine)만 저장 ───────────────────────
-                if notion_token and notion_db_id:
-                    _df_mine = df[df["is_db"].fillna(False) | df["is_bit"].fillna(False)].copy()
-                    if _df_mine.empty:
-                        _sync_status.update({"done": True, "success": False, "msg": "자사 데이터 없음 (Notion 저장 건너뜀)"})
-                        _log.info("[Notion] 자사 데이터 없음 — 저장 건너뜀")
-                    else:
-                        # 전체 df 전달 → notion_sync 내부에서 is_mine 키워드만 저장하되 Top1Mall은 전체 기준
-                        ok, m = save_to_notion(df, TODAY_ISO, notion_token, notion_db_id)
-                        _sync_status.update({"done": True, "success": ok, "msg": f"자사 {len(_df_mine)}건: {m}"})
-                        _log.info(f"[Notion] {m}")
-                else:
-                    _sync_status.update({"done": True, "success": False, "msg": "Notion 미설정"})
+                # Google Sheets: 전체 데이터 / Notion: 자사 키워드 요약 / Slack: 요약 + 급변 알림
+                _sinks = []
+                if apps_script_url:
+                    _sinks.append(AppsScriptSink(apps_script_url, apps_script_token))
+                _sinks.append(NotionSink(notion_token, notion_db_id))
                 if slack_webhook_url:
-                    s_ok, s_msg = send_slack(slack_webhook_url, df.copy(), _history_df_copy, TODAY_ISO, notion_db_id=notion_db_id, only_on_big_change=False)
-                    _log.info(f"[Slack] {s_msg}")
-                    send_slack(slack_webhook_url, df.copy(), _history_df_copy, TODAY_ISO, notion_db_id=notion_db_id, only_on_big_change=True)
+                    _sinks.append(SlackSink(slack_webhook_url, _slack_hist, notion_db_id=notion_db_id,
+                                            brands=get_matcher(my_brand_1, my_brand_2, competitors)))
+                for _name, _ok, _msg in write_all(_sinks, df, TODAY_ISO):
+                    if _name == "Notion":
+                        _sync_status.update({"done": True, "success": _ok, "msg": _msg})
 
             _threading.Thread(target=_bg_notion_slack, daemon=True).start()
             status.empty()
@@ -1910,26 +1922,41 @@ elif selected_menu == "Run & Sync":
             if not df.empty and 'keyword' in df.columns:
                 st.markdown("---")
                 st.markdown("### 📊 키워드별 광고 ROI 추정")
-                _roi_c1, _roi_c2, _roi_c3 = st.columns(3)
-                with _roi_c1: _aov = st.number_input("평균 주문 금액 (원)", min_value=1000, value=80000, step=1000, key="_roi_aov")
-                with _roi_c2: _cvr = st.number_input("전환율 (%)", min_value=0.1, max_value=100.0, value=2.0, step=0.1, key="_roi_cvr")
-                with _roi_c3: _cpc = st.number_input("평균 CPC (원/클릭)", min_value=10, value=500, step=10, key="_roi_cpc")
-                _roi_rows = []
-                for _, _kr in df.groupby('keyword').agg(vol=('vol','max'), click=('click','max'), ctr=('ctr','max'), rank=('rank','min')).reset_index().iterrows():
-                    _mc = float(_kr['click']) if _kr['click'] else (float(_kr['vol'])*float(_kr['ctr'])/100 if _kr['ctr'] else 0)
+
+                # fragment: 입력값을 바꾸면 이 표만 다시 계산 (전체 재실행이면 수집 버튼이 풀려 표가 사라짐)
+                @st.fragment
+                def _roi_view(_roi_base):
+                    _roi_c1, _roi_c2, _roi_c3 = st.columns(3)
+                    with _roi_c1: _aov = st.number_input("평균 주문 금액 (원)", min_value=1000, value=80000, step=1000, key="_roi_aov")
+                    with _roi_c2: _cvr = st.number_input("전환율 (%)", min_value=0.1, max_value=100.0, value=2.0, step=0.1, key="_roi_cvr")
+                    with _roi_c3: _cpc = st.number_input("평균 CPC (원/클릭)", min_value=10, value=500, step=10, key="_roi_cpc")
+                    _vol, _click, _ctr, _rank = (pd.to_numeric(_roi_base[c], errors='coerce').fillna(0) for c in ('vol', 'click', 'ctr', 'rank'))
+                    _mc = _click.where(_click != 0, _vol * _ctr / 100)
                     _rev = _mc * (_cvr/100) * _aov
                     _cost = _mc * _cpc
-                    _roi = ((_rev-_cost)/_cost*100) if _cost > 0 else 0
-                    _roas = (_rev/_cost) if _cost > 0 else 0
-                    _roi_rows.append({"키워드": _kr['keyword'], "현재 최고순위": f"{int(_kr['rank'])}위" if _kr['rank']<999 else "순위 밖", "월 검색량": f"{int(_kr['vol']):,}", "예상 월 클릭": f"{int(_mc):,}", "예상 월 매출": f"₩{int(_rev):,}", "예상 광고비": f"₩{int(_cost):,}", "ROAS": f"{_roas:.1f}x", "ROI": f"{_roi:+.0f}%", "_roi_raw": _roi})
-                _roi_df = pd.DataFrame(_roi_rows).sort_values("_roi_raw", ascending=False)
-                def _color_roi(val):
-                    if isinstance(val, str) and "%" in val:
-                        n = float(val.replace("%","").replace("+",""))
-                        return "color: #1A7A2A; font-weight:700" if n > 0 else "color: #C0392B; font-weight:700"
-                    return ""
-                st.dataframe(_roi_df.drop(columns=["_roi_raw"]).style.applymap(_color_roi, subset=["ROI"]), use_container_width=True, hide_index=True)
-                st.caption("💡 ROAS > 1이면 광고비 이상 회수.")
+                    _roi = ((_rev-_cost)/_cost*100).where(_cost > 0, 0)
+                    _roas = (_rev/_cost).where(_cost > 0, 0)
+                    _roi_df = pd.DataFrame({
+                        "키워드": _roi_base['keyword'],
+                        "현재 최고순위": _rank.map(lambda r: f"{int(r)}위" if r < 999 else "순위 밖"),
+                        "월 검색량": _vol.map(lambda v: f"{int(v):,}"),
+                        "예상 월 클릭": _mc.map(lambda v: f"{int(v):,}"),
+                        "예상 월 매출": _rev.map(lambda v: f"₩{int(v):,}"),
+                        "예상 광고비": _cost.map(lambda v: f"₩{int(v):,}"),
+                        "ROAS": _roas.map(lambda v: f"{v:.1f}x"),
+                        "ROI": _roi.map(lambda v: f"{v:+.0f}%"),
+                        "_roi_raw": _roi,
+                    }).sort_values("_roi_raw", ascending=False)
+                    def _color_roi(val):
+                        if isinstance(val, str) and "%" in val:
+                            n = float(val.replace("%","").replace("+",""))
+                            return "color: #1A7A2A; font-weight:700" if n > 0 else "color: #C0392B; font-weight:700"
+                        return ""
+                    st.dataframe(_roi_df.drop(columns=["_roi_raw"]).style.applymap(_color_roi, subset=["ROI"]), use_container_width=True, hide_index=True)
+                    st.caption("💡 ROAS > 1이면 광고비 이상 회수.")
+
+                # 키워드별 집계는 수집 직후 1번만 -- fragment 재실행은 이 프레임을 그대로 받음
+                _roi_view(df.groupby('keyword').agg(vol=('vol','max'), click=('click','max'), ctr=('ctr','max'), rank=('rank','min')).reset_index())
 
             if gemini_key:
                 status.text("🤖 AI 리포트 생성 중...")
@@ -1955,12 +1982,12 @@ elif selected_menu == "Run & Sync":
 
 # ── 7. AI Report ───────────────────────────────────────────────────────────────
 elif selected_menu == "AI Report":
+    hist_df = _ctx.hist_df
     st.markdown("<div style='font-size:1.5rem;font-weight:800;color:#111;letter-spacing:-0.03em;margin-bottom:0.2rem;'>AI Report</div><div style='font-size:0.82rem;color:#AAA;margin-bottom:1.4rem;'>일자별 SEO 전략 & AI 액션 플랜 자동 생성</div>", unsafe_allow_html=True)
     if 'ai_reports_cache' not in st.session_state:
         st.session_state.ai_reports_cache = {}
         if st.session_state.ai_report_text:
             st.session_state.ai_reports_cache[TODAY_ISO] = st.session_state.ai_report_text
-    hist_df = st.session_state.history_df
     if hist_df.empty:
         st.warning("과거 데이터가 없습니다. [Run & Sync] 메뉴에서 순위 수집 후 Notion에 저장하거나, [Dashboard]에서 새로고침 해주세요.")
     else:
@@ -2044,12 +2071,26 @@ elif selected_menu == "⚙️ 설정":
         _s_slack       = st.text_input("Slack Webhook URL",  value=_k.get("slack_webhook_url", ""),   type="password", key="s_slack")
         _s_gas_url     = st.text_input("GAS URL (레거시)",   value=_k.get("apps_script_url", ""),     type="password", key="s_gas_url")
         _s_gas_tok     = st.text_input("GAS Token (레거시)", value=_k.get("apps_script_token", ""),   type="password", key="s_gas_tok")
+        if _ctx.history_base.attrs.get("memory"):
+            st.caption("💾 " + format_memory_report(_ctx.history_base.attrs["memory"]))
+        if apps_script_url:
+            _hs = apps_script_store(apps_script_url).stats()
+            st.caption(f"📦 로컬 이력 원본 {_hs['days']}일 · {_hs['rows']:,}행 / 주간 요약 {_hs['weeks']}주 (원본 보존 {raw_days()}일)")
+        for _hc in cache_stats():
+            st.caption(f"🗄️ 공유 이력 캐시 `{_hc['key']}` · {_hc['rows']:,}행 · 화면용 {_hc['views']}벌 · {_hc['age_s']}초 전 적재")
         st.markdown('</div>', unsafe_allow_html=True)
 
         st.markdown('<div class="km-block" style="margin-top:14px;"><div class="km-block-head"><span class="km-block-title">🏪 브랜드 설정</span></div>', unsafe_allow_html=True)
         _s_brand1      = st.text_area("내 브랜드 1 (쉼표 구분)", value=_k.get("my_brand_1", "드론박스, DroneBox"), key="s_brand1")
         _s_brand2      = st.text_area("내 브랜드 2 (쉼표 구분)", value=_k.get("my_brand_2", "빛드론, BitDrone"),   key="s_brand2")
         _s_comp        = st.text_area("경쟁사 (쉼표 구분)",       value=_k.get("competitors", "다다사, 효로로, 드론뷰"), key="s_comp")
+        with st.expander("🔢 브랜드 레지스트리 (brand_mask 비트)"):
+            _s_matcher = get_matcher(_s_brand1, _s_brand2, _s_comp)
+            st.dataframe(_s_matcher.registry_df(), use_container_width=True, hide_index=True)
+            st.caption("DB·BI·DA·HR·DV 비트는 고정, 그 밖의 경쟁사는 C1부터 설정 순서대로 배정됩니다.")
+            _s_stale = int(stale_rows(_ctx.history_base, _s_matcher).sum())
+            st.caption(f"설정 버전 `{_s_matcher.version}` · 저장하면 다음 화면에서 기록 {_s_stale:,}행을 새 설정으로 재분류합니다."
+                       if _s_stale else f"설정 버전 `{_s_matcher.version}` · 모든 기록이 이 설정으로 분류되어 있습니다.")
         st.markdown('</div>', unsafe_allow_html=True)
 
     st.markdown("<div style='height:8px;'></div>", unsafe_allow_html=True)
@@ -2530,8 +2571,8 @@ elif selected_menu == "AI 인용 추적":
         # ── 키워드 입력 (기존 추적 키워드 재사용) ──
         _geo_default_kws = []
         try:
-            if not hist_df.empty and "keyword" in hist_df.columns:
-                _geo_default_kws = list(pd.Series(hist_df["keyword"]).dropna().unique())[:8]
+            if not _ctx.hist_df.empty and "keyword" in _ctx.hist_df.columns:
+                _geo_default_kws = list(pd.Series(_ctx.hist_df["keyword"]).dropna().unique())[:8]
         except Exception:
             pass
         if not _geo_default_kws:
@@ -2577,62 +2618,72 @@ elif selected_menu == "AI 인용 추적":
             if _geo_rows:
                 st.session_state["_geo_today_df"] = pd.DataFrame(_geo_rows)
                 if save_geo_results(_geo_uid, _geo_rows):
+                    st.session_state.pop(f"_geo_hist::{_geo_uid}", None)
                     st.success(f"✅ {len(_geo_rows)}행 기록 완료 — Google Sheets `geo_results` 시트에 저장됐습니다.")
                 else:
                     st.warning("결과는 화면에 표시되지만 시트 저장에 실패했습니다 (GSHEET 설정 확인). 아래 CSV로 백업하세요.")
             else:
                 st.error("수집된 결과가 없습니다. Gemini 키와 쿼터를 확인해주세요.")
 
-        # ── 오늘 결과 표시 ──
-        _geo_today = st.session_state.get("_geo_today_df", pd.DataFrame())
-        if not _geo_today.empty:
-            st.markdown("#### 📊 이번 실행 결과")
-            _geo_share_now = compute_share(_geo_today)
-            _geo_mcols = st.columns(min(len(_geo_share_now), 5) or 1)
-            for _i, (_idx, _r) in enumerate(_geo_share_now.sort_values("share", ascending=False).iterrows()):
-                if _i >= len(_geo_mcols):
-                    break
-                _is_mine = _r["brand"] in list(_geo_groups_preview.keys())[:2]
-                _geo_mcols[_i].metric(
-                    ("🏠 " if _is_mine else "") + str(_r["brand"]),
-                    f"{_r['share']}%",
-                    f"{int(_r['mentions'])}/{int(_r['queries'])} 질의 인용",
-                    delta_color="off",
-                )
+        # ── 오늘 결과 표시 ── fragment: 이 영역의 위젯(다운로드 등)은 이 영역만 다시 실행
+        @st.fragment
+        def _geo_result_view(_geo_today, _geo_mine):
+            if not _geo_today.empty:
+                st.markdown("#### 📊 이번 실행 결과")
+                _geo_share_now = compute_share(_geo_today)
+                _geo_mcols = st.columns(min(len(_geo_share_now), 5) or 1)
+                for _i, (_idx, _r) in enumerate(_geo_share_now.sort_values("share", ascending=False).iterrows()):
+                    if _i >= len(_geo_mcols):
+                        break
+                    _is_mine = _r["brand"] in _geo_mine
+                    _geo_mcols[_i].metric(
+                        ("🏠 " if _is_mine else "") + str(_r["brand"]),
+                        f"{_r['share']}%",
+                        f"{int(_r['mentions'])}/{int(_r['queries'])} 질의 인용",
+                        delta_color="off",
+                    )
 
-            # 키워드 × 브랜드 매트릭스 (언급 순서 표시)
-            _geo_mat = _geo_today[_geo_today["mentioned"] == 1].copy()
-            if not _geo_mat.empty:
-                _geo_mat["표시"] = _geo_mat["mention_order"].apply(lambda o: f"✓ {o}번째")
-                _geo_pivot = _geo_mat.pivot_table(
-                    index=["keyword", "prompt_type"], columns="brand",
-                    values="표시", aggfunc="first", fill_value="—",
+                # 키워드 × 브랜드 매트릭스 (언급 순서 표시)
+                _geo_mat = _geo_today[_geo_today["mentioned"] == 1].copy()
+                if not _geo_mat.empty:
+                    _geo_mat["표시"] = _geo_mat["mention_order"].apply(lambda o: f"✓ {o}번째")
+                    _geo_pivot = _geo_mat.pivot_table(
+                        index=["keyword", "prompt_type"], columns="brand",
+                        values="표시", aggfunc="first", fill_value="—",
+                    )
+                    st.dataframe(_geo_pivot, use_container_width=True)
+                else:
+                    st.caption("이번 실행에서 인용된 브랜드가 없습니다.")
+
+                # 인용 문맥 스니펫
+                _geo_snip = _geo_today[(_geo_today["mentioned"] == 1) & (_geo_today["snippet"] != "")]
+                if not _geo_snip.empty:
+                    with st.expander(f"💬 인용 문맥 보기 ({len(_geo_snip)}건)"):
+                        for _idx, _r in _geo_snip.iterrows():
+                            st.markdown(f"**{_r['brand']}** · {_r['keyword']} [{_r['prompt_type']}]")
+                            st.caption(_r["snippet"])
+
+                st.download_button(
+                    "📥 이번 실행 결과 CSV",
+                    _geo_today.to_csv(index=False).encode("utf-8-sig"),
+                    file_name=f"geo_check_{dt.date.today().isoformat()}.csv",
+                    mime="text/csv", use_container_width=True,
                 )
-                st.dataframe(_geo_pivot, use_container_width=True)
-            else:
-                st.caption("이번 실행에서 인용된 브랜드가 없습니다.")
-
-            # 인용 문맥 스니펫
-            _geo_snip = _geo_today[(_geo_today["mentioned"] == 1) & (_geo_today["snippet"] != "")]
-            if not _geo_snip.empty:
-                with st.expander(f"💬 인용 문맥 보기 ({len(_geo_snip)}건)"):
-                    for _idx, _r in _geo_snip.iterrows():
-                        st.markdown(f"**{_r['brand']}** · {_r['keyword']} [{_r['prompt_type']}]")
-                        st.caption(_r["snippet"])
-
-            st.download_button(
-                "📥 이번 실행 결과 CSV",
-                _geo_today.to_csv(index=False).encode("utf-8-sig"),
-                file_name=f"geo_check_{dt.date.today().isoformat()}.csv",
-                mime="text/csv", use_container_width=True,
-            )
+
+        _geo_result_view(st.session_state.get("_geo_today_df", pd.DataFrame()),
+                         list(_geo_groups_preview.keys())[:2])
 
         # ── 일자별 인용률 추이 ──
         st.markdown("#### 📈 일자별 AI 인용률 추이")
-        try:
-            _geo_hist = load_geo_history(_geo_uid, days=90)
-        except Exception:
-            _geo_hist = pd.DataFrame()
+        # 시트 전체를 읽으므로 세션에 보관 -- 키워드 입력 등으로 재실행될 때마다 다시 읽지 않음 (저장 성공 시 갱신)
+        _geo_hist_key = f"_geo_hist::{_geo_uid}"
+        _geo_hist = st.session_state.get(_geo_hist_key)
+        if _geo_hist is None:
+            try:
+                _geo_hist = load_geo_history(_geo_uid, days=90)
+            except Exception:
+                _geo_hist = pd.DataFrame()
+            st.session_state[_geo_hist_key] = _geo_hist
         if _geo_hist.empty:
             st.caption("아직 누적 이력이 없습니다. 매일(또는 주 2~3회) 실행하면 추이 그래프가 그려집니다.")
         else:
@@ -2922,8 +2973,8 @@ elif selected_menu == "키워드 인텐트":
     else:
         _ic_default = []
         try:
-            if not hist_df.empty and "keyword" in hist_df.columns:
-                _ic_default = list(pd.Series(hist_df["keyword"]).dropna().unique())[:30]
+            if not _ctx.hist_df.empty and "keyword" in _ctx.hist_df.columns:
+                _ic_default = list(pd.Series(_ctx.hist_df["keyword"]).dropna().unique())[:30]
         except Exception:
             pass
         _ic_text = st.text_area("분류할 키워드 (줄바꿈 구분, 최대 60개)",
@@ -2982,8 +3033,8 @@ elif selected_menu == "시즌성 분석":
         st.caption("드론처럼 계절을 타는 카테고리에서 특히 유용합니다. 값은 데이터랩 상대지수(기간 내 최댓값=100)입니다.")
         _sn_default = []
         try:
-            if not hist_df.empty and "keyword" in hist_df.columns:
-                _sn_default = list(pd.Series(hist_df["keyword"]).dropna().unique())[:5]
+            if not _ctx.hist_df.empty and "keyword" in _ctx.hist_df.columns:
+                _sn_default = list(pd.Series(_ctx.hist_df["keyword"]).dropna().unique())[:5]
         except Exception:
             pass
         if not _sn_default:
@@ -3117,3 +3168,6 @@ elif selected_menu == "엔티티 감사":
                 st.download_button("📥 스키마 다운로드", _o_tag.encode("utf-8"),
                     file_name="organization_schema.html", mime="text/html",
                     use_container_width=True, key="_o_dl")
+
+# ── 페이지 데이터 준비 시간 (utils/lazy.py -- 이 페이지가 실제로 만든 항목만) ──────────────
+st.caption(f"⏱️ {selected_menu} 데이터 준비 {_ctx.total():.2f}s · {_ctx.summary()}")
@@ -8,6 +8,16 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
 
 # ── 기본 브랜드 정의 (환경변수/Streamlit secrets로 오버라이드 가능) ──────────
 DEFAULT_MY_BRAND_1 = "드론박스, DroneBox, DJI 정품판매점 드론박스"
@@ -25,6 +35,293 @@ def parse_brand_list(brand_str: str) -> list[str]:
     return [x.strip() for x in brand_str.split(",") if x.strip()]
 
 
+def build_brand_groups(brand1_str: str, brand2_str: str, competitors_str: str) -> dict:
+    """
+    {대표이름: [별칭 리스트]} 형태로 변환.
+    - 자사 2개 브랜드: 쉼표 목록 전체가 한 그룹 (첫 항목이 대표 이름)
+    - 경쟁사: 각각 독립 그룹. 단, 한글 브랜드 바로 뒤에 오는 영문(ASCII) 표기는
+      해당 브랜드의 별칭으로 묶임. 예) "다다사, dadasa, 효로로" → 다다사=[다다사, dadasa]
+    """
+    groups = {}
+    b1 = parse_brand_list(brand1_str)
+    b2 = parse_brand_list(brand2_str)
+    if b1:
+        groups[b1[0]] = b1  # 첫 항목을 대표 이름으로
+    if b2:
+        groups[b2[0]] = b2
+    last_rep = None
+    for comp in parse_brand_list(competitors_str):
+        is_ascii = comp.isascii()
+        if (is_ascii and last_rep is not None and not last_rep.isascii()):
+            groups[last_rep].append(comp)  # 직전 한글 브랜드의 영문 별칭
+        else:
+            groups[comp] = [comp]
+            last_rep = comp
+    return groups
+
+
+BRAND1_LABEL = "드론박스"  # 자사 대표 표시 이름 (설정 별칭과 무관하게 고정)
+BRAND2_LABEL = "빛드론"
+
+# ── 브랜드 ID 비트마스크 ─────────────────────────────────────────────────────
+# 수집 행의 브랜드 소속은 brand_mask 정수 1개로 표현한다 (비트 = 브랜드 레지스트리 항목).
+# 자사 2개와 기존 시트 컬럼(is_da/is_hr/is_dv)의 경쟁사 3개는 비트 위치를 고정해
+# 예전 불리언 컬럼과 손실 없이 오간다. 나머지 경쟁사 그룹은 설정 순서대로 C1, C2, ...
+BIT_DB, BIT_BI, BIT_DA, BIT_HR, BIT_DV = 1 << 0, 1 << 1, 1 << 2, 1 << 3, 1 << 4
+MINE_MASK = BIT_DB | BIT_BI
+LEGACY_FLAGS = (("is_db", BIT_DB), ("is_bit", BIT_BI), ("is_da", BIT_DA), ("is_hr", BIT_HR), ("is_dv", BIT_DV))
+LEGACY_MASK = BIT_DB | BIT_BI | BIT_DA | BIT_HR | BIT_DV
+RESERVED_COMPETITORS = (("DA", "다다사", BIT_DA), ("HR", "효로로", BIT_HR), ("DV", "드론뷰", BIT_DV))
+MAX_BRAND_BITS = 63  # int64 부호 비트 제외
+
+_KIND_BRAND1, _KIND_BRAND2, _KIND_COMP = 1, 2, 3
+
+
+@dataclass(frozen=True)
+class BrandEntry:
+    """브랜드 레지스트리 1행"""
+    code: str           # DB / BI / DA / HR / DV / C1 ...
+    bit: int            # brand_mask에서 이 브랜드의 비트 값
+    brand_id: str       # build_brand_groups 대표 이름 (설정이 비어 있으면 "")
+    label: str          # 표시 이름 (자사는 BRAND1_LABEL / BRAND2_LABEL)
+    mine: bool          # 자사 여부
+    aliases: tuple[str, ...] = ()
+
+
+def has_brand(masks, bits: int) -> pd.Series:
+    """brand_mask 시리즈 & bits != 0 -- 벡터 비트 테스트 (NaN은 0 취급)"""
+    return (pd.Series(masks).fillna(0).astype("int64") & bits) != 0
+
+
+def _truthy(col: pd.Series) -> pd.Series:
+    """시트/JSON에서 온 불리언 컬럼 (True, "TRUE", "true", 1 ...) → bool"""
+    if col.dtype == bool:
+        return col
+    return col.astype(str).str.strip().str.lower().isin(("true", "1", "1.0", "y", "yes"))
+
+
+def brand_mask_series(df: pd.DataFrame, matcher: BrandMatcher | None = None) -> pd.Series:
+    """
+    df의 브랜드 비트마스크 (int64).
+    brand_mask 컬럼 값 우선 → 없는 행은 예전 is_* 컬럼에서 복원 →
+    matcher가 있으면 mall 이름으로 나머지 비트(예전 컬럼에 없던 C1.. 경쟁사)까지 채운다.
+    """
+    if "brand_mask" in df.columns:
+        masks = pd.to_numeric(df["brand_mask"], errors="coerce")
+    else:
+        masks = pd.Series(np.nan, index=df.index)
+    missing = masks.isna()
+    if missing.any():
+        sub = df[missing]
+        derived = pd.Series(0, index=sub.index, dtype="int64")
+        has_legacy = False
+        for col, bit in LEGACY_FLAGS:
+            if col in sub.columns:
+                derived |= np.where(_truthy(sub[col]), bit, 0)
+                has_legacy = True
+        if matcher is not None and "mall" in sub.columns:
+            by_name = matcher.mask_series(sub["mall"])
+            derived |= (by_name & ~LEGACY_MASK) if has_legacy else by_name
+        masks = masks.where(~missing, derived)
+    return masks.fillna(0).astype("int64")
+
+
+class BrandMatcher:
+    """
+    브랜드1/브랜드2/경쟁사 별칭 전체를 Aho-Corasick 자동자 하나로 컴파일한 매처.
+
+    쇼핑몰 이름을 _clean() 후 한 번만 훑어 매칭된 별칭을 모두 찾는다 (별칭 수와 무관한
+    선형 시간). 별칭 목록을 매 호출마다 split/_clean하던 any(x in cm for x in ...) 반복을 대체.
+
+    브랜드 ID = build_brand_groups의 대표 이름 (geo_tracker와 같은 그룹 단위).
+    예) 기본 설정: "드론박스", "빛드론", "다다사"(dadasa 포함), "효로로", "드론뷰"
+    registry = 브랜드별 비트 배정표 (BrandEntry 목록, registry_df()로 표 형태).
+    """
+
+    def __init__(self, brand1_str: str = DEFAULT_MY_BRAND_1, brand2_str: str = DEFAULT_MY_BRAND_2,
+                 competitors_str: str = DEFAULT_COMPETITORS):
+        self.config = (brand1_str or "", brand2_str or "", competitors_str or "")
+        # 브랜드 설정 버전 -- 설정 문자열이 같으면 같은 값
+        self.version = hashlib.sha1("\x1f".join(self.config).encode("utf-8")).hexdigest()[:12]
+        self._alias_memo: dict = {}  # 쇼핑몰 이름 → normalize_series 결과 (이 설정 버전 한정)
+        self._mask_memo: dict = {}   # 쇼핑몰 이름 → mask_series 결과
+        self._label_memo: dict = {}  # 쇼핑몰 이름 → label_series 결과
+        b1, b2, comps = (parse_brand_list(x) for x in self.config)
+        group_of = {}
+        for rep, aliases in build_brand_groups(*self.config).items():
+            for a in aliases:
+                group_of.setdefault(a, rep)
+        comp_groups: dict[str, list[str]] = {}
+        for a in comps:
+            comp_groups.setdefault(group_of.get(a, a), []).append(a)
+        self.registry = self._build_registry(b1, b2, comp_groups)
+        comp_bit = {e.brand_id: e.bit for e in self.registry if not e.mine}
+        # 패턴 목록 (설정 순서 = 우선순위): (정규화 문자열, 원본 별칭, 브랜드 ID, 종류, 비트)
+        self.patterns: list[tuple[str, str, str, int, int]] = []
+        for kind, aliases, bit in ((_KIND_BRAND1, b1, BIT_DB), (_KIND_BRAND2, b2, BIT_BI)):
+            rep = aliases[0] if aliases else ""
+            self.patterns += [(_clean(a), a, rep, kind, bit) for a in aliases]
+        self.patterns += [(_clean(a), a, group_of.get(a, a), _KIND_COMP, comp_bit.get(group_of.get(a, a), 0))
+                          for a in comps]
+        self.brand_ids = list(dict.fromkeys(p[2] for p in self.patterns))
+        self._compile()
+
+    @staticmethod
+    def _build_registry(b1: list[str], b2: list[str], comp_groups: dict) -> list[BrandEntry]:
+        entries = [BrandEntry("DB", BIT_DB, b1[0] if b1 else "", BRAND1_LABEL, True, tuple(b1)),
+                   BrandEntry("BI", BIT_BI, b2[0] if b2 else "", BRAND2_LABEL, True, tuple(b2))]
+        reserved = {_clean(word): (code, bit) for code, word, bit in RESERVED_COMPETITORS}
+        extra, n = [], 0
+        for rep, aliases in comp_groups.items():
+            hit = next((reserved.pop(_clean(a)) for a in aliases if _clean(a) in reserved), None)
+            if hit:
+                entries.append(BrandEntry(hit[0], hit[1], rep, rep, False, tuple(aliases)))
+            else:
+                extra.append((rep, aliases))
+        next_bit = 5
+        for rep, aliases in extra:
+            if next_bit >= MAX_BRAND_BITS:
+                log.warning(f"[brand] 경쟁사 {MAX_BRAND_BITS - 5}개 초과 -- '{rep}' 이후는 비트 미배정")
+                break
+            n += 1
+            entries.append(BrandEntry(f"C{n}", 1 << next_bit, rep, rep, False, tuple(aliases)))
+            next_bit += 1
+        return entries
+
+    def registry_df(self) -> pd.DataFrame:
+        """브랜드 레지스트리 표 (코드 · 비트 · 표시 이름 · 자사 여부 · 별칭)"""
+        return pd.DataFrame([{"code": e.code, "bit": e.bit, "label": e.label, "mine": e.mine,
+                              "aliases": ", ".join(e.aliases)} for e in self.registry])
+
+    def entries(self, mine: bool | None = None) -> list[BrandEntry]:
+        """레지스트리 항목 -- mine=True 자사만, False 경쟁사만 (설정이 빈 항목 제외)"""
+        return [e for e in self.registry if e.aliases and (mine is None or e.mine == mine)]
+
+    # ── 자동자 ───────────────────────────────────────────────────────────────
+    def _compile(self) -> None:
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[int]] = [[]]
+        for i, (text, *_rest) in enumerate(self.patterns):
+            if not text:
+                continue
+            node = 0
+            for ch in text:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(i)
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:  # BFS (깊이 순) -- 루트 자식의 fail은 루트(0)
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._goto, self._fail = goto, fail
+        self._out = [tuple(sorted(set(o))) for o in out]
+
+    def scan(self, mall_name) -> list[int]:
+        """매칭된 패턴 인덱스 (설정 순서). 문자열이 아니면 빈 목록."""
+        if not isinstance(mall_name, str):
+            return []
+        goto, fail, out = self._goto, self._fail, self._out
+        node, hits = 0, set()
+        for ch in _clean(mall_name):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+        return sorted(hits)
+
+    # ── 조회 ─────────────────────────────────────────────────────────────────
+    def match(self, mall_name) -> list[str]:
+        """매칭된 브랜드 ID 전부 (설정 순서, 중복 없음)"""
+        return list(dict.fromkeys(self.patterns[i][2] for i in self.scan(mall_name)))
+
+    def mask(self, mall_name) -> int:
+        """쇼핑몰 이름 → brand_mask"""
+        m = 0
+        for i in self.scan(mall_name):
+            m |= self.patterns[i][4]
+        return m
+
+    def classify(self, mall_name) -> dict:
+        """{mall, mask, tracked, ids} -- 수집 행 1개 분류"""
+        hits = [self.patterns[i] for i in self.scan(mall_name)]
+        kinds = {h[3] for h in hits}
+        comp = next((h[1] for h in hits if h[3] == _KIND_COMP), None)
+        mask = 0
+        for h in hits:
+            mask |= h[4]
+        if _KIND_BRAND1 in kinds:
+            mall = BRAND1_LABEL
+        elif _KIND_BRAND2 in kinds:
+            mall = BRAND2_LABEL
+        else:
+            mall = comp or mall_name
+        return {
+            "mall": mall,
+            "mask": mask,
+            "tracked": bool(hits),
+            "ids": list(dict.fromkeys(h[2] for h in hits)),
+        }
+
+    def first_alias(self, mall_name) -> str | None:
+        """설정 순서(브랜드1 → 브랜드2 → 경쟁사)상 가장 앞서 매칭된 원본 별칭"""
+        return next((self.patterns[i][1] for i in self.scan(mall_name)), None)
+
+    @staticmethod
+    def _map_unique(malls: pd.Series, fn, memo: dict, na, dtype) -> pd.Series:
+        """
+        factorize로 고유 이름만 골라 fn을 한 번씩 적용하고 take로 행에 펼친다.
+        이름별 결과는 memo(매처 = 설정 버전 단위)에 남으므로 같은 이름은 다음 호출부터 조회만 한다.
+        """
+        codes, uniques = pd.factorize(malls, use_na_sentinel=True)
+        mapped = np.empty(len(uniques) + 1, dtype=dtype)
+        for i, name in enumerate(uniques):
+            hit = memo.get(name)
+            if hit is None:
+                hit = memo[name] = fn(name)
+            mapped[i] = hit
+        mapped[-1] = na  # 결측 코드(-1) → 마지막 칸
+        if dtype is object and isinstance(malls.dtype, pd.CategoricalDtype):
+            # category 입력(history/schema.py)은 category로 돌려줌 -- 결과 이름끼리 다시 코드화
+            new_codes, new_names = pd.factorize(mapped[:-1])
+            row_codes = np.append(new_codes, -1).take(codes)
+            return pd.Series(pd.Categorical.from_codes(row_codes, new_names), index=malls.index, name=malls.name)
+        return pd.Series(mapped.take(codes), index=malls.index, name=malls.name)
+
+    def normalize_series(self, malls: pd.Series) -> pd.Series:
+        """mall 컬럼 전체 → first_alias (매칭 없으면 원래 이름, 결측은 NaN / category 입력은 category)"""
+        return self._map_unique(malls, lambda n: self.first_alias(n) or n, self._alias_memo, np.nan, object)
+
+    def mask_series(self, malls: pd.Series) -> pd.Series:
+        """mall 컬럼 전체 → brand_mask (int64, 결측은 0)"""
+        return self._map_unique(malls, self.mask, self._mask_memo, 0, np.int64)
+
+    def label_series(self, malls: pd.Series) -> pd.Series:
+        """원래 쇼핑몰 이름 전체 → 수집 행의 mall 값 (classify()["mall"], 결측은 NaN)"""
+        return self._map_unique(malls, lambda n: self.classify(n)["mall"], self._label_memo, np.nan, object)
+
+    def has_kind(self, mall_name, *kinds: int) -> bool:
+        return any(self.patterns[i][3] in kinds for i in self.scan(mall_name))
+
+
+@functools.lru_cache(maxsize=32)
+def get_matcher(brand1_str: str = DEFAULT_MY_BRAND_1, brand2_str: str = DEFAULT_MY_BRAND_2,
+                competitors_str: str = DEFAULT_COMPETITORS) -> BrandMatcher:
+    """설정 문자열 조합별로 한 번만 컴파일 (Streamlit rerun · 수집 워커 간 공유)"""
+    return BrandMatcher(brand1_str, brand2_str, competitors_str)
+
+
 def normalize_mall_name(
     raw_mall: str,
     brand1_str: str = DEFAULT_MY_BRAND_1,
@@ -40,22 +337,7 @@ def normalize_mall_name(
     """
     if not isinstance(raw_mall, str):
         return raw_mall
-
-    cm = _clean(raw_mall)
-
-    t_db = [_clean(x) for x in parse_brand_list(brand1_str)]
-    t_bit = [_clean(x) for x in parse_brand_list(brand2_str)]
-    t_comp = [_clean(x) for x in parse_brand_list(competitors_str)]
-
-    if any(x in cm for x in t_db):
-        return "드론박스"
-    if any(x in cm for x in t_bit):
-        return "빛드론"
-    # 경쟁사는 원본 문자열에서 키워드 포함 여부로 매핑
-    for comp_raw in parse_brand_list(competitors_str):
-        if _clean(comp_raw) in cm:
-            return comp_raw
-    return raw_mall
+    return get_matcher(brand1_str, brand2_str, competitors_str).classify(raw_mall)["mall"]
 
 
 def is_my_brand(
@@ -64,26 +346,20 @@ def is_my_brand(
     brand2_str: str = DEFAULT_MY_BRAND_2,
 ) -> bool:
     """자사 브랜드(브랜드1 또는 브랜드2) 여부 반환"""
-    cm = _clean(mall_name)
-    t_db = [_clean(x) for x in parse_brand_list(brand1_str)]
-    t_bit = [_clean(x) for x in parse_brand_list(brand2_str)]
-    return any(x in cm for x in t_db + t_bit)
+    return get_matcher(brand1_str, brand2_str, "").has_kind(mall_name, _KIND_BRAND1, _KIND_BRAND2)
 
 
 def is_brand1(mall_name: str, brand1_str: str = DEFAULT_MY_BRAND_1) -> bool:
-    cm = _clean(mall_name)
-    return any(_clean(x) in cm for x in parse_brand_list(brand1_str))
+    return get_matcher(brand1_str, "", "").has_kind(mall_name, _KIND_BRAND1)
 
 
 def is_brand2(mall_name: str, brand2_str: str = DEFAULT_MY_BRAND_2) -> bool:
-    cm = _clean(mall_name)
-    return any(_clean(x) in cm for x in parse_brand_list(brand2_str))
+    return get_matcher("", brand2_str, "").has_kind(mall_name, _KIND_BRAND2)
 
 
 def is_competitor(mall_name: str, competitors_str: str = DEFAULT_COMPETITORS) -> bool:
     """경쟁사 여부 반환"""
-    cm = _clean(mall_name)
-    return any(_clean(x) in cm for x in parse_brand_list(competitors_str))
+    return get_matcher("", "", competitors_str).has_kind(mall_name, _KIND_COMP)
 
 
 def get_mall_label(
@@ -98,10 +374,5 @@ def get_mall_label(
     경쟁사: 해당 이름
     기타: "기타"
     """
-    if is_brand1(mall_name, brand1_str):
-        return "드론박스"
-    if is_brand2(mall_name, brand2_str):
-        return "빛드론"
-    if is_competitor(mall_name, competitors_str):
-        return normalize_mall_name(mall_name, brand1_str, brand2_str, competitors_str)
-    return "기타"
+    c = get_matcher(brand1_str, brand2_str, competitors_str).classify(mall_name)
+    return c["mall"] if c["tracked"] else "기타"
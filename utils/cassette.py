@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] utils/cassette.py -- HTTP 응답 녹화/재생 (오프라인 수집 벤치마크용)
+
+utils/http.request()를 지나는 모든 요청(쇼핑 검색, 검색광고 keywordstool, Apps Script ...)을
+대상으로 한다.
+- record : 실제 요청을 보내고 응답(상태·본문·소요 시간)을 카세트에 쌓아 종료 시 저장
+- replay : 네트워크 없이 카세트 응답을 돌려줌. 지연은 고정 ms 또는 녹화 당시 소요 시간
+           ("recorded")으로 흉내 낸다. 카세트에 없는 요청은 CassetteMiss (재시도 없음)
+
+요청 키 = sha1(메서드 + URL + 쿼리 파라미터 + 본문). 헤더(인증 키·서명 타임스탬프)는
+키에 넣지 않으므로 키가 달라도 같은 요청이면 재생된다. 같은 키 응답이 여러 개면
+녹화 순서대로 돌려주고 마지막 것을 반복 -- 재시도(5xx → 200)까지 같은 순서로 재현된다.
+카세트에는 키 해시와 요약 라벨만 남고, URL 경로(Slack 웹훅)와 REDACT_PARAMS 값은 저장하지 않는다.
+
+파일: gzip JSON (기본 저장소 루트/.http_cassette.json.gz)
+환경변수: HTTP_CASSETTE_MODE(record|replay), HTTP_CASSETTE_PATH, HTTP_CASSETTE_LATENCY_MS
+"""
+
+from __future__ import annotations
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, ".http_cassette.json.gz")
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+LATENCY_RECORDED = "recorded"  # 녹화 당시 응답 시간 그대로 재생
+
+REDACT_PARAMS = frozenset({"token"})  # 라벨에 남기지 않는 쿼리 파라미터
+KEEP_HEADERS = ("Content-Type", "Retry-After")
+
+
+class CassetteMiss(requests.ConnectionError):
+    """재생 모드에서 카세트에 없는 요청"""
+
+
+def _body_bytes(data=None, json_body=None) -> bytes:
+    if json_body is not None:
+        return json.dumps(json_body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    if data is None:
+        return b""
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    if isinstance(data, dict):
+        return urlencode(sorted(data.items())).encode("utf-8")
+    return repr(data).encode("utf-8")
+
+
+def request_key(method: str, url: str, params=None, data=None, json_body=None) -> tuple[str, str]:
+    """요청 → (키 해시, 라벨). URL에 붙은 쿼리와 params를 합쳐 정렬하므로 전달 방식과 무관."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += list(params.items() if isinstance(params, dict) else params)
+    query = sorted((str(k), str(v)) for k, v in query)
+    h = hashlib.sha1()
+    for piece in (method.upper(), parts.netloc, parts.path, urlencode(query)):
+        h.update(piece.encode("utf-8") + b"\0")
+    h.update(_body_bytes(data, json_body))
+    shown = "&".join(f"{k}={v}" for k, v in query if k not in REDACT_PARAMS)
+    label = f"{method.upper()} {parts.netloc}" + (f" ?{shown}" if shown else "")
+    return h.hexdigest(), label
+
+
+def _dump_response(resp: requests.Response, elapsed_ms: float) -> dict:
+    entry = {"status": resp.status_code, "elapsed_ms": round(elapsed_ms, 1),
+             "headers": {k: resp.headers[k] for k in KEEP_HEADERS if k in resp.headers}}
+    try:
+        entry["text"] = resp.content.decode("utf-8")
+    except UnicodeDecodeError:
+        entry["b64"] = base64.b64encode(resp.content).decode("ascii")
+    return entry
+
+
+def _load_response(entry: dict, url: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    resp._content = (entry["text"].encode("utf-8") if "text" in entry
+                     else base64.b64decode(entry.get("b64", "")))
+    resp._content_consumed = True  # stream=True로 요청한 쪽도 iter_content로 본문을 읽을 수 있게
+    resp.encoding = "utf-8"
+    resp.url = url
+    resp.reason = "OK" if resp.status_code < 400 else "Replayed"
+    return resp
+
+
+class Cassette:
+    """녹화/재생 카세트 1개. 스레드 안전 (수집 워커가 동시에 send 해도 됨)."""
+
+    def __init__(self, path: str, mode: str, latency_ms: float | str = 0):
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"카세트 모드는 record/replay 중 하나: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.entries: dict[str, dict] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+        self._cursor: dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == MODE_REPLAY:
+            self.entries = self._read()
+            log.info(f"[cassette] 재생: 요청 {len(self.entries)}종 ({path})")
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            if self.mode == MODE_REPLAY:
+                raise FileNotFoundError(f"카세트 파일 없음: {self.path}")
+            return {}
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            return json.load(f).get("entries", {})
+
+    def send(self, session: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+        key, label = request_key(method, url, kwargs.get("params"), kwargs.get("data"), kwargs.get("json"))
+        if self.mode == MODE_REPLAY:
+            return self._replay(key, label, url)
+        started = time.monotonic()
+        resp = session.request(method, url, **kwargs)
+        dumped = _dump_response(resp, (time.monotonic() - started) * 1000)
+        with self._lock:
+            self.entries.setdefault(key, {"label": label, "responses": []})["responses"].append(dumped)
+            self.stats["recorded"] += 1
+        return resp
+
+    def _replay(self, key: str, label: str, url: str) -> requests.Response:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["missed"] += 1
+                raise CassetteMiss(f"카세트에 없는 요청: {label}")
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            self.stats["replayed"] += 1
+            dumped = entry["responses"][min(i, len(entry["responses"]) - 1)]
+        delay = dumped.get("elapsed_ms", 0) if self.latency_ms == LATENCY_RECORDED else float(self.latency_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return _load_response(dumped, url)
+
+    def save(self) -> None:
+        """녹화분 저장 -- 이번에 녹화한 키는 덮어쓰고, 기존 파일의 나머지 키는 보존"""
+        if self.mode != MODE_RECORD or not self.entries:
+            return
+        with self._lock:
+            merged = {**self._read(), **self.entries}
+            tmp = self.path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"version": 1, "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           "entries": merged}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        log.info(f"[cassette] 녹화 {self.stats['recorded']}건 저장 → {self.path} (요청 {len(merged)}종)")
+
+    def summary(self) -> str:
+        s = self.stats
+        return f"카세트 {self.mode}: 녹화 {s['recorded']} · 재생 {s['replayed']} · 미스 {s['missed']}"
+
+
+_active: Cassette | None = None
+_env_checked = False
+_active_lock = threading.Lock()
+
+
+def _install(cas: Cassette) -> Cassette:
+    global _active, _env_checked
+    _active, _env_checked = cas, True
+    if cas.mode == MODE_RECORD:
+        atexit.register(cas.save)
+    return cas
+
+
+def use_cassette(path: str | None = None, mode: str = MODE_REPLAY,
+                 latency_ms: float | str = 0) -> Cassette:
+    """프로세스 전체에 카세트 적용 (녹화는 종료 시 자동 저장)"""
+    cas = Cassette(path or DEFAULT_PATH, mode, latency_ms)
+    with _active_lock:
+        return _install(cas)
+
+
+def _latency_from_env() -> float | str:
+    raw = os.getenv("HTTP_CASSETTE_LATENCY_MS", "0").strip()
+    if raw == LATENCY_RECORDED:
+        return raw
+    try:
+        return float(raw)
+    except ValueError:
+        return 0.0
+
+
+def active() -> Cassette | None:
+    """현재 카세트 -- 최초 호출 시 HTTP_CASSETTE_MODE 환경변수로 켬 (없으면 None)"""
+    global _env_checked
+    if not _env_checked:
+        with _active_lock:
+            if not _env_checked:
+                mode = os.getenv("HTTP_CASSETTE_MODE", "").strip().lower()
+                if not mode:
+                    _env_checked = True
+                    return None
+                # 락 안에서 생성 -- 동시에 첫 요청을 보낸 워커가 카세트 없이 나가지 않게
+                return _install(Cassette(os.getenv("HTTP_CASSETTE_PATH") or DEFAULT_PATH,
+                                         mode, _latency_from_env()))
+    return _active
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] utils/http.py -- 공유 HTTP 클라이언트 (연결 풀 + 재시도 + 서킷 브레이커)
+
+호출마다 requests.get()으로 새 TCP/TLS 연결을 여는 대신, 프로세스 전체가
+하나의 requests.Session(HTTPAdapter 연결 풀)을 공유한다. urllib3가 호스트별로
+keep-alive 풀을 따로 두므로 검색 API / 검색광고 API / Apps Script 연결이 섞이지 않는다.
+
+request()/get()/post()는 여기에 다음을 더한다.
+- 429 / 5xx / 연결 오류 → 지수 백오프 + full jitter 재시도 (Retry-After 헤더 우선)
+- 호스트별 서킷 브레이커: 연속 실패 HTTP_BREAKER_THRESHOLD회 → HTTP_BREAKER_COOLDOWN초 동안
+  즉시 CircuitOpenError. 쿨다운 후 1건만 시험 호출(half-open), 성공하면 닫힘.
+- POST 등 비멱등 요청은 서버가 처리하지 않은 게 확실한 경우(연결 실패, 429/503)만 재시도.
+  idempotent=True로 명시하면 GET과 같은 규칙을 쓴다.
+- limiter(utils/ratelimit.py TokenBucket)를 넘기면 재시도를 포함한 매 시도 전에 토큰을 받는다.
+
+4xx(429 제외)는 재시도하지 않고 응답을 그대로 돌려준다 -- raise_for_status는 호출 측 몫.
+HTTP_CASSETTE_MODE가 켜져 있으면 실제 전송 대신 utils/cassette.py가 녹화/재생한다.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import cassette
+
+log = logging.getLogger(__name__)
+
+
+def _env_num(name: str, default, cast=float):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+HTTP_POOL_SIZE = max(1, _env_num("HTTP_POOL_SIZE", 16, int))
+HTTP_RETRIES = max(0, _env_num("HTTP_RETRIES", 3, int))
+HTTP_BACKOFF = _env_num("HTTP_BACKOFF", 0.5)            # 첫 재시도 기준 대기(초)
+HTTP_MAX_BACKOFF = _env_num("HTTP_MAX_BACKOFF", 30.0)   # 1회 대기 상한(초)
+HTTP_BREAKER_THRESHOLD = max(1, _env_num("HTTP_BREAKER_THRESHOLD", 5, int))
+HTTP_BREAKER_COOLDOWN = _env_num("HTTP_BREAKER_COOLDOWN", 30.0)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# 비멱등 요청도 안전하게 재시도할 수 있는 상태 코드 (서버가 요청을 처리하지 않음)
+UNPROCESSED_STATUSES = frozenset({429, 503})
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """호스트 서킷이 열려 있어 요청을 보내지 않음"""
+
+
+# ── 서킷 브레이커 ────────────────────────────────────────────────────────────
+class CircuitBreaker:
+    """호스트 1개의 closed → open → half-open 상태. 스레드 안전."""
+
+    def __init__(self, host: str, threshold: int = HTTP_BREAKER_THRESHOLD,
+                 cooldown: float = HTTP_BREAKER_COOLDOWN):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open = False
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self.failures < self.threshold:
+            return "closed"
+        if self.half_open or now - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """요청 허용 여부 -- half-open에서는 시험 호출 1건만 통과"""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.half_open:
+                self.half_open = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.half_open = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.stats["failures"] += 1
+            self.failures += 1
+            if self.half_open or self.failures == self.threshold:
+                log.warning(f"[http] {self.host} 서킷 열림 -- {self.cooldown:.0f}초간 요청 차단")
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.half_open = False
+
+    def release(self) -> None:
+        """시험 호출이 성공/실패 판정 없이 끝남 (카세트 미스 등) -- 다음 호출이 다시 시험할 수 있게"""
+        with self._lock:
+            self.half_open = False
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def breaker_status() -> dict:
+    """{host: {"state", "consecutive", requests, retries, failures, rejected}} -- 로그용"""
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {h: {"state": b.state, "consecutive": b.failures, **b.stats} for h, b in items}
+
+
+# ── 세션 (연결 풀) ───────────────────────────────────────────────────────────
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def _new_session() -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def get_session() -> requests.Session:
+    """프로세스 공유 세션 (최초 호출 시 생성)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+# ── 재시도 요청 ──────────────────────────────────────────────────────────────
+def retry_after_seconds(resp) -> float | None:
+    """Retry-After 헤더(초 또는 HTTP 날짜) → 대기 초. 없거나 해석 불가면 None."""
+    val = (resp.headers or {}).get("Retry-After") if resp is not None else None
+    if not val:
+        return None
+    val = str(val).strip()
+    if val.isdigit():
+        return float(val)
+    try:
+        when = email.utils.parsedate_to_datetime(val)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, resp=None, base: float = HTTP_BACKOFF,
+                  cap: float = HTTP_MAX_BACKOFF) -> float:
+    """attempt번째(0부터) 재시도 전 대기 -- Retry-After 우선, 없으면 full jitter"""
+    ra = retry_after_seconds(resp)
+    if ra is not None:
+        return min(cap, ra)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def request(method: str, url: str, *, retries: int | None = None, idempotent: bool | None = None,
+            limiter=None, **kwargs) -> requests.Response:
+    """
+    공유 세션으로 요청 + 재시도/서킷 브레이커.
+    마지막 시도까지 재시도 대상 오류면 그 응답을 반환하거나 예외를 다시 던진다.
+    limiter: 시도마다 acquire() 할 토큰 버킷 (재시도도 QPS 한도에 포함)
+    """
+    method = method.upper()
+    retries = HTTP_RETRIES if retries is None else max(0, retries)
+    if idempotent is None:
+        idempotent = method in ("GET", "HEAD", "OPTIONS")
+    host = urlsplit(url).netloc
+    breaker = get_breaker(host)
+    session = get_session()
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{host} 서킷 열림 (연속 실패 {breaker.failures}회)")
+        if limiter is not None:
+            limiter.acquire()
+        breaker.count("requests")
+        resp = None
+        cas = cassette.active()
+        try:
+            resp = cas.send(session, method, url, **kwargs) if cas else session.request(method, url, **kwargs)
+        except cassette.CassetteMiss:
+            breaker.release()  # 재생할 응답이 없음 -- 재시도해도 같음, 서버 상태와 무관
+            raise
+        except requests.RequestException as e:
+            breaker.record_failure()
+            safe = isinstance(e, requests.ConnectionError) and not isinstance(e, requests.ReadTimeout)
+            if attempt >= retries or not (idempotent or safe):
+                raise
+            err = f"{type(e).__name__}"
+        else:
+            if resp.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return resp
+            breaker.record_failure()
+            if attempt >= retries or not (idempotent or resp.status_code in UNPROCESSED_STATUSES):
+                return resp
+            err = f"HTTP {resp.status_code}"
+            resp.close()  # stream=True 응답은 닫아야 연결이 풀로 돌아감
+        delay = backoff_delay(attempt, resp)
+        breaker.count("retries")
+        log.info(f"[http] {method} {host} {err} → {delay:.1f}초 후 재시도 ({attempt + 1}/{retries})")
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
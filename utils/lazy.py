@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+[UTILS] utils/lazy.py -- 지연 계산 컨텍스트 (처음 접근할 때 1번만 계산 + 소요 시간 기록)
+
+Streamlit은 재실행마다 스크립트 전체를 다시 돈다. 모든 페이지가 쓰지도 않는 전처리를 메뉴 분기 전에
+미리 하지 않고, 페이지가 실제로 접근한 항목만 그 자리에서 만든다.
+
+    class PageData(LazyContext):
+        @lazy_property
+        def hist_df(self): ...          # 처음 접근할 때 실행, 이후 같은 값
+
+    data = PageData()
+    data.hist_df                        # 계산 + timings["hist_df"] 기록
+    data.summary()                      # "hist_df 0.12s · metric_df 0.01s"
+
+timings는 항목 자신의 시간만 기록한다 -- 계산 중에 다른 lazy_property를 처음 읽으면 그 시간은
+그 항목 몫으로 따로 잡히고 바깥 항목에서는 빠진다 (합계 = 실제 걸린 시간).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+
+class lazy_property:
+    """functools.cached_property + LazyContext.timings 기록 (인스턴스 __dict__에 결과 저장)"""
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        self.name = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.name in obj.__dict__:
+            return obj.__dict__[self.name]
+        obj._child.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            value = self.fn(obj)
+        finally:
+            elapsed = time.perf_counter() - t0
+            nested = obj._child.pop()
+            if obj._child:
+                obj._child[-1] += elapsed
+        obj.timings[self.name] = elapsed - nested
+        obj.__dict__[self.name] = value
+        return value
+
+
+class LazyContext:
+    """lazy_property 항목을 가진 컨텍스트 -- 이번에 계산한 항목과 시간(timings, 계산 순서)"""
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self._child: list[float] = []
+
+    def built(self, name: str) -> bool:
+        """name 항목을 이미 계산했는지 (계산하지 않음)"""
+        return name in self.__dict__
+
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+    def summary(self) -> str:
+        if not self.timings:
+            return "없음"
+        return " · ".join(f"{name} {sec:.2f}s" for name, sec in self.timings.items())
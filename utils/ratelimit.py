@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] utils/ratelimit.py -- API별 토큰 버킷 속도 제한기
+
+무작위 sleep 대신 API마다 허용 속도(초당 요청 수)를 토큰 버킷으로 관리한다.
+네이버 검색 API와 검색광고 API는 서로 다른 버킷을 쓰므로, 동시 실행 시
+두 API를 각자의 허용 속도로 동시에 사용할 수 있다.
+
+스레드 안전 -- ThreadPoolExecutor 워커들이 하나의 버킷을 공유해도 된다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    초당 rate개 토큰이 채워지고 최대 capacity개까지 모이는 버킷.
+
+    acquire()는 토큰이 생길 때까지 블록한다. rate <= 0이면 제한 없음.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """토큰을 소비하고, 기다린 시간(초)을 반환"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# ── 기본 버킷 (환경변수로 조정) ────────────────────────────────────────────────
+# 네이버 검색 API: 일 25,000회 한도 / 초당 10회 내외에서 429 발생 → 여유 있게 5회
+# 네이버 검색광고 API(keywordstool): 초당 호출 제한이 더 빡빡함 → 3회
+NAVER_SEARCH_QPS = _env_float("NAVER_SEARCH_QPS", 5.0)
+NAVER_AD_QPS = _env_float("NAVER_AD_QPS", 3.0)
+
+search_limiter = TokenBucket(NAVER_SEARCH_QPS)
+ad_limiter = TokenBucket(NAVER_AD_QPS)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] utils/vol_cache.py -- 월간 검색량(vol/click/ctr) 디스크 캐시
+
+monthlyPcQcCnt / monthlyMobileQcCnt는 월 단위 수치라 매일 다시 받을 필요가 없다.
+SQLite 파일 하나에 정규화 키워드(공백 제거) 단위로 저장하고, TTL이 지난 값만
+검색광고 API로 다시 조회한다.
+
+- 경로: VOL_CACHE_PATH (기본: 저장소 루트/.vol_cache.sqlite)
+- TTL : VOL_CACHE_TTL_DAYS (기본 7일, 0이면 캐시 비활성)
+- 무효화: invalidate(keywords) / invalidate() (전체)
+
+main_automation.py, streamlit_app.py(get_vol / _sched_run_crawl / Run & Sync)가
+utils/volume.py의 VolumeResolver를 통해 같은 파일을 공유한다.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, ".vol_cache.sqlite")
+
+
+def _env_ttl_days() -> float:
+    try:
+        return float(os.getenv("VOL_CACHE_TTL_DAYS", "7"))
+    except ValueError:
+        return 7.0
+
+
+class VolumeCache:
+    """정규화 키워드 → (vol, click, ctr) TTL 캐시. 스레드 안전."""
+
+    def __init__(self, path: str | None = None, ttl_days: float | None = None):
+        self.path = path or os.getenv("VOL_CACHE_PATH") or DEFAULT_PATH
+        self.ttl_days = _env_ttl_days() if ttl_days is None else float(ttl_days)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            try:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS volume ("
+                    " keyword TEXT PRIMARY KEY, vol INTEGER, click REAL, ctr REAL,"
+                    " fetched_at REAL)")
+                self._conn.commit()
+                self.purge_expired()
+            except sqlite3.Error as e:
+                log.warning(f"[vol_cache] 캐시 열기 실패 -- 캐시 없이 진행: {e}")
+                self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_days > 0
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self.ttl_days * 86400
+
+    def get_many(self, keys) -> dict:
+        """{정규화 키워드: (vol, click, ctr)} -- 만료되지 않은 것만. 적중/미스 집계."""
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if not keys:
+            return {}
+        if self._conn is None:
+            self.misses += len(keys)
+            return {}
+        cutoff = time.time() - self.ttl_seconds
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):  # SQLite 변수 개수 제한
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for kw, vol, click, ctr in self._conn.execute(
+                        f"SELECT keyword, vol, click, ctr FROM volume "
+                        f"WHERE fetched_at >= ? AND keyword IN ({marks})", [cutoff, *chunk]):
+                    found[kw] = (int(vol), click, ctr)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, values: dict) -> None:
+        """{정규화 키워드: (vol, click, ctr)} 저장 (fetched_at = 지금)"""
+        if self._conn is None or not values:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO volume (keyword, vol, click, ctr, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(k, v[0], v[1], v[2], now) for k, v in values.items()])
+            self._conn.commit()
+
+    def invalidate(self, keys=None) -> int:
+        """지정 키워드(없으면 전체) 캐시 삭제 → 삭제 행 수"""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            if keys is None:
+                cur = self._conn.execute("DELETE FROM volume")
+            else:
+                keys = list(keys)
+                if not keys:
+                    return 0
+                cur = self._conn.execute(
+                    f"DELETE FROM volume WHERE keyword IN ({','.join('?' * len(keys))})", keys)
+            self._conn.commit()
+            return cur.rowcount
+
+    def purge_expired(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM volume WHERE fetched_at < ?", [time.time() - self.ttl_seconds])
+            self._conn.commit()
+            return cur.rowcount
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = 0
+
+
+_shared: dict[str, VolumeCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_volume_cache(path: str | None = None) -> VolumeCache:
+    """경로별 공유 인스턴스 (같은 프로세스 안에서 연결 1개만 유지)"""
+    key = path or os.getenv("VOL_CACHE_PATH") or DEFAULT_PATH
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = VolumeCache(key)
+        return _shared[key]
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+[CRAWL] utils/volume.py -- 검색광고 API(keywordstool) 검색량 일괄 조회
+
+키워드 1개당 /keywordstool 1회 호출하던 get_vol을 대체한다.
+- 한 요청에 hintKeywords를 최대 5개까지 묶어서 보냄
+- 응답 keywordList의 relKeyword 전체를 공백 제거 형태로 색인
+  → 이전 응답에 이미 등장한 추적 키워드는 추가 호출 없이 해결
+- utils/vol_cache.py 디스크 캐시(TTL)에 있는 키워드는 아예 호출하지 않음
+
+main_automation.py, streamlit_app.py(_sched_run_crawl / Run & Sync)가 공통 사용.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+import time
+
+from utils import cassette, http
+from utils.ratelimit import ad_limiter
+
+log = logging.getLogger(__name__)
+
+AD_API_BASE = "https://api.naver.com"
+KEYWORDSTOOL_URI = "/keywordstool"
+MAX_HINTS = 5  # keywordstool hintKeywords 최대 개수
+
+EMPTY_VOLUME = (0, 0, 0)
+
+
+def normalize_keyword(kw: str) -> str:
+    """색인 키 -- keywordstool은 공백 없는 형태로 relKeyword를 돌려준다"""
+    return str(kw).replace(" ", "")
+
+
+def _to_int(val) -> int:
+    s = str(val).replace("<", "").strip()
+    return int(s) if s.isdigit() else 0
+
+
+def _to_float(val) -> float:
+    s = str(val).replace("<", "").strip()
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+
+def parse_volume(item: dict) -> tuple:
+    """keywordList 항목 1개 → (월 검색량, 월 평균 클릭수, CTR%)"""
+    v = _to_int(item.get('monthlyPcQcCnt', 0)) + _to_int(item.get('monthlyMobileQcCnt', 0))
+    c = _to_float(item.get('monthlyAvePcClkCnt', 0)) + _to_float(item.get('monthlyAveMobileClkCnt', 0))
+    return v, round(c, 1), round(c / v * 100, 2) if v else 0
+
+
+def ad_headers(api_key: str, secret_key: str, customer_id: str, uri: str = KEYWORDSTOOL_URI) -> dict:
+    """검색광고 API 서명 헤더"""
+    ts = str(int(time.time() * 1000))
+    sig = base64.b64encode(
+        hmac.new(secret_key.encode(), f"{ts}.GET.{uri}".encode(), hashlib.sha256).digest()
+    ).decode()
+    return {"X-Timestamp": ts, "X-API-KEY": api_key, "X-Customer": customer_id, "X-Signature": sig}
+
+
+class VolumeResolver:
+    """
+    keywordstool 응답을 재사용하는 검색량 조회기 (크롤 1회당 1개 생성).
+
+    prime(keywords)로 추적 키워드 목록을 알려두면 아직 해결되지 않은 키워드를 입력 순서대로
+    batch_size개씩 묶어 두고, get(kw)는 kw가 속한 묶음을 한 번에 보낸다. 어느 워커가 먼저
+    부르든 묶음(hintKeywords)이 같으므로 카세트(utils/cassette.py) 재생이 병렬 수집에서도 맞는다.
+    cache(VolumeCache)가 주어지면 TTL 안의 값은 호출 없이 쓰고, 새로 받은 값은 저장한다.
+    스레드 안전 -- 병렬 수집 워커들이 하나의 인스턴스를 공유한다. lock은 배치를 고르고 색인을 갱신할 때만
+    잡고 HTTP 호출은 밖에서 한다. 호출 중인 배치에 든 키워드를 요청한 워커는 그 배치가 끝나길 기다린다.
+    """
+
+    def __init__(self, api_key: str, secret_key: str, customer_id: str,
+                 batch_size: int = MAX_HINTS, extra_headers: dict | None = None,
+                 timeout: float = 10, limiter=ad_limiter, cache=None):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.customer_id = customer_id
+        self.batch_size = max(1, min(int(batch_size), MAX_HINTS))
+        self.extra_headers = extra_headers or {}
+        self.timeout = timeout
+        self.limiter = limiter
+        self.cache = cache
+        self._index: dict[str, tuple] = {}
+        self._tried: set[str] = set()
+        self._batch_of: dict[str, tuple] = {}  # 키워드 → prime에서 정한 배치
+        self._failed: dict[str, Exception] = {}  # 카세트 미스로 끝난 배치의 키워드 → 예외
+        self._inflight: dict[str, threading.Event] = {}  # 호출 중인 배치의 키워드 → 완료 이벤트
+        self._lock = threading.Lock()
+        self._looked_up: set[str] = set()
+        self.stats = {"requests": 0, "errors": 0, "resolved": 0, "reused": 0,
+                      "cache_hits": 0, "cache_misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key and self.secret_key and self.customer_id)
+
+    def prime(self, keywords) -> None:
+        """이번 크롤에서 조회할 추적 키워드 등록 -- 미해결 키워드를 입력 순서대로 배치로 나눔"""
+        with self._lock:
+            keys = [normalize_keyword(kw) for kw in keywords]
+            self._lookup_cache(keys)
+            fresh = [k for k in dict.fromkeys(keys)
+                     if k and k not in self._index and k not in self._tried and k not in self._batch_of]
+            for i in range(0, len(fresh), self.batch_size):
+                batch = tuple(fresh[i:i + self.batch_size])
+                for key in batch:
+                    self._batch_of[key] = batch
+
+    def get(self, kw: str) -> tuple:
+        """키워드 1개 검색량 -- 색인에 있으면 호출 없이 반환"""
+        if not self.enabled:
+            return EMPTY_VOLUME
+        key = normalize_keyword(kw)
+        while True:
+            with self._lock:
+                self._lookup_cache([key])
+                if key in self._index:
+                    self.stats["reused"] += 1
+                    return self._index[key]
+                if key in self._failed:
+                    raise self._failed[key]
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    if key in self._tried:
+                        return EMPTY_VOLUME
+                    batch = list(self._batch_of.get(key, (key,)))
+                    done = self._claim(batch)
+            if waiting is None:
+                break
+            waiting.wait()  # 다른 워커가 이 키워드를 담은 배치를 호출 중 -- 끝나면 색인 다시 확인
+        try:
+            self._fetch(batch)
+        except cassette.CassetteMiss as e:
+            with self._lock:
+                for k in batch:
+                    self._failed[k] = e
+            raise
+        finally:
+            with self._lock:
+                for k in batch:
+                    self._inflight.pop(k, None)
+            done.set()
+        with self._lock:
+            vol = self._index.get(key)
+            if vol is None:
+                return EMPTY_VOLUME
+            self.stats["resolved"] += 1
+            return vol
+
+    def resolve_many(self, keywords) -> dict:
+        """{원본 키워드: (vol, click, ctr)} -- 배치 단위로 한 번에 해결"""
+        self.prime(keywords)
+        return {kw: self.get(kw) for kw in keywords}
+
+    # ── 내부 ─────────────────────────────────────────────────────────────────
+    def _lookup_cache(self, keys) -> None:
+        """아직 확인하지 않은 키워드만 디스크 캐시 조회 (lock 보유 상태에서 호출)"""
+        if self.cache is None:
+            return
+        new = [k for k in dict.fromkeys(keys)
+               if k and k not in self._index and k not in self._looked_up]
+        if not new:
+            return
+        self._looked_up.update(new)
+        found = self.cache.get_many(new)
+        self._index.update(found)
+        self.stats["cache_hits"] += len(found)
+        self.stats["cache_misses"] += len(new) - len(found)
+
+    def _claim(self, batch: list[str]) -> threading.Event:
+        """배치 키워드를 호출 중으로 표시 (lock 보유 상태에서 호출)"""
+        done = threading.Event()
+        for key in batch:
+            self._tried.add(key)
+            self._inflight[key] = done
+        return done
+
+    def _fetch(self, batch: list[str]) -> None:
+        """배치 1회 호출 (lock 없이 호출). 배치 실패 시 1개씩 재시도. 카세트 미스는 호출 측으로 전파."""
+        try:
+            self._request(batch)
+        except cassette.CassetteMiss:
+            raise
+        except Exception as e:
+            self._count("errors")
+            if len(batch) == 1:
+                log.warning(f"[get_vol] '{batch[0]}' 검색량 API 오류: {type(e).__name__}: {e}")
+                return
+            # 잘못된 힌트 키워드 하나 때문에 배치 전체가 400이 나는 경우가 있음
+            log.info(f"[get_vol] 배치({len(batch)}개) 실패 → 개별 재시도: {type(e).__name__}")
+            # 다른 배치 응답으로 이미 해결됐어도 다시 보냄 -- 요청 목록이 실행마다 같아야 재생이 맞음
+            for key in batch:
+                try:
+                    self._request([key])
+                except cassette.CassetteMiss:
+                    raise
+                except Exception as e2:
+                    self._count("errors")
+                    log.warning(f"[get_vol] '{key}' 검색량 API 오류: {type(e2).__name__}: {e2}")
+
+    def _request(self, hints: list[str]) -> None:
+        headers = {**self.extra_headers,
+                   **ad_headers(self.api_key, self.secret_key, self.customer_id)}
+        self._count("requests")
+        res = http.get(
+            f"{AD_API_BASE}{KEYWORDSTOOL_URI}?hintKeywords={','.join(hints)}&showDetail=1",
+            headers=headers, timeout=self.timeout, limiter=self.limiter)
+        res.raise_for_status()
+        fresh = {}
+        for item in res.json().get('keywordList', []):
+            key = normalize_keyword(item.get('relKeyword', ''))
+            if key and key not in fresh:
+                fresh[key] = parse_volume(item)
+        with self._lock:
+            for key, vol in fresh.items():
+                if key not in self._index:
+                    self._index[key] = vol
+        if self.cache is not None:
+            self.cache.put_many(fresh)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def summary(self) -> str:
+        s = self.stats
+        text = (f"검색량 API {s['requests']}회 호출 · 응답 재사용 {s['reused']}건 · "
+                f"오류 {s['errors']}건 · 색인 {len(self._index)}개")
+        if self.cache is not None:
+            text += f" · 캐시 적중 {s['cache_hits']} / 미스 {s['cache_misses']}"
+        return text